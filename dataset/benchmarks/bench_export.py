@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the single-pass export engine against running the summary and
+pseudocode fine-tune scripts one after the other.
+
+Without --input, a synthetic models file is built from the models library, with
+placeholder pseudocode, mappings and summaries for every procedure.
+
+Usage:
+    python3 dataset/benchmarks/bench_export.py [--input FILE] [--base-dir DIR] [--repeat N] [--workers N ...]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import create_finetune_jsonl
+import create_finetune_jsonl_from_pseudocode
+from parsers.discovery import discover_model_files
+from parsers.procedure_extractor import iter_procedures
+from utils.export_engine import PseudocodeEmitter, SummaryEmitter, run_export, run_export_parallel
+
+
+def synthesize_models(base_dir: str) -> List[Dict]:
+    """Build model records for every library file with placeholder LLM output."""
+    models = []
+    paths = discover_model_files(base_dir)
+    for path in paths:
+        procedures = list(iter_procedures(path.read_text(encoding='utf-8')))
+        for procedure in procedures:
+            lines = procedure['originalCode'].split('\n')
+            procedure['pseudoCode'] = [f"{i} | step {i} of {procedure['name']}" for i in range(1, len(lines) + 1)]
+            procedure['codeToPseudoCodeMap'] = [
+                {"lineNumber": i, "originalCode": line, "pseudoCode": f"step {i} of {procedure['name']}"}
+                for i, line in enumerate(lines, 1)
+            ]
+            procedure['summary'] = f"The {procedure['name']} procedure does {len(lines)} things."
+            procedure['variables'] = ['x', 'y']
+        models.append({"modelId": path.stem, "procedures": procedures})
+    return models
+
+
+def time_best(run, repeat: int) -> float:
+    """Return the best wall-clock time of run() with its output silenced."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the shared-pass export engine')
+    parser.add_argument('--input', help='Models JSON file to export (default: synthesize one from --base-dir)')
+    parser.add_argument('--base-dir', default='dataset/models-library',
+                        help='Models library used to synthesize input (default: dataset/models-library)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs; the best is reported (default: 3)')
+    parser.add_argument('--workers', type=int, nargs='*', default=[],
+                        help='Also time the sharded export with each of these worker counts')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        out = Path(temp_dir)
+        input_file = args.input
+        if not input_file:
+            input_file = str(out / 'models.json')
+            models = synthesize_models(args.base_dir)
+            with open(input_file, 'w', encoding='utf-8') as f:
+                json.dump({"models": models, "totalModels": len(models)}, f, indent=2)
+        print(f"Input: {input_file} ({Path(input_file).stat().st_size / 1e6:.1f} MB)")
+
+        def two_scripts():
+            create_finetune_jsonl.process_netlogo_models(input_file, str(out / 'summary.jsonl'))
+            create_finetune_jsonl_from_pseudocode.process_netlogo_models(
+                input_file, str(out / 'pseudocode.jsonl'), str(out / 'pseudocode_validation.jsonl'), 0.05)
+
+        def engine_emitters():
+            return [
+                SummaryEmitter(str(out / 'engine_summary.jsonl')),
+                PseudocodeEmitter(str(out / 'engine_pseudocode.jsonl'), str(out / 'engine_pseudocode_validation.jsonl')),
+            ]
+
+        timings = [("two scripts", time_best(two_scripts, args.repeat))]
+        timings.append(("single pass", time_best(lambda: run_export(input_file, engine_emitters(), 0.05), args.repeat)))
+        for workers in args.workers:
+            timings.append((f"{workers} workers", time_best(
+                lambda: run_export_parallel(input_file, engine_emitters(), workers, 0.05), args.repeat)))
+
+    baseline = timings[0][1]
+    print(f"{'exporter':<14}{'time (s)':>10}{'speedup':>10}")
+    for label, seconds in timings:
+        print(f"{label:<14}{seconds:>10.3f}{baseline / seconds:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the single-pass procedure extractor against the original line-loop
+implementation on every model in the models library.
+
+Usage:
+    python3 dataset/benchmarks/bench_extract_procedures.py [--base-dir DIR] [--repeat N]
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parsers.discovery import discover_model_files
+from parsers.procedure_extractor import iter_procedures
+from utils.netlogo_code import format_code_with_line_numbers
+
+
+def legacy_extract_procedures(content: str) -> List[Dict]:
+    """The extract_procedures line loop as it was before the streaming extractor,
+    kept here as the benchmark baseline."""
+    procedures = []
+    lines = content.split('\n')
+    proc_start_pattern = re.compile(r'^(to(?:-report)?)\s+([^\s\[]+)')
+    comment_pattern = re.compile(r'^\s*;(.+)$')
+
+    i = 0
+    while i < len(lines):
+        preceding_comments = []
+        while i < len(lines) and (comment_match := comment_pattern.match(lines[i])):
+            preceding_comments.append(comment_match.group(1).strip())
+            i += 1
+
+        if i < len(lines) and (proc_match := proc_start_pattern.match(lines[i])):
+            proc_name = proc_match.group(2)
+            proc_lines = []
+            proc_start = i
+            while i < len(lines):
+                proc_lines.append(lines[i])
+                if lines[i].strip() == 'end':
+                    break
+                i += 1
+
+            if i < len(lines):
+                proc_content = '\n'.join(proc_lines)
+                inline_comment = ''
+                inline_match = re.search(r';(.+)$', lines[proc_start])
+                if inline_match:
+                    inline_comment = inline_match.group(1).strip()
+                doc_lines = preceding_comments
+                if inline_comment:
+                    doc_lines.append(inline_comment)
+                procedures.append({
+                    "name": proc_name,
+                    "documentation": '\n'.join(doc_lines) if doc_lines else "",
+                    "originalCode": proc_content.strip(),
+                    "numberedOriginalCode": format_code_with_line_numbers(proc_content.strip()),
+                    "pseudoCode": [],
+                    "codeToPseudoCodeMap": [],
+                    "summary": "",
+                    "variables": []
+                })
+        i += 1
+
+    return procedures
+
+
+def streaming_extract_procedures(content: str) -> List[Dict]:
+    return list(iter_procedures(content))
+
+
+def time_extractor(extractor, contents: List[str], repeat: int) -> float:
+    """Return the best wall-clock time of running extractor over all contents."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in contents:
+            extractor(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark procedure extraction on the models library')
+    parser.add_argument('--base-dir', default='dataset/models-library',
+                        help='Directory containing NetLogo model files (default: dataset/models-library)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed runs; the best is reported (default: 5)')
+    args = parser.parse_args()
+
+    paths = discover_model_files(args.base_dir)
+    contents = [p.read_text(encoding='utf-8') for p in paths]
+    total_bytes = sum(len(c) for c in contents)
+    print(f"Loaded {len(contents)} files ({total_bytes / 1e6:.1f} MB)")
+
+    legacy_time = time_extractor(legacy_extract_procedures, contents, args.repeat)
+    streaming_time = time_extractor(streaming_extract_procedures, contents, args.repeat)
+
+    legacy_count = sum(len(legacy_extract_procedures(c)) for c in contents)
+    streaming_count = sum(len(streaming_extract_procedures(c)) for c in contents)
+
+    print(f"{'extractor':<12}{'time (s)':>10}{'files/s':>10}{'procedures':>12}")
+    print(f"{'legacy':<12}{legacy_time:>10.3f}{len(contents) / legacy_time:>10.0f}{legacy_count:>12}")
+    print(f"{'streaming':<12}{streaming_time:>10.3f}{len(contents) / streaming_time:>10.0f}{streaming_count:>12}")
+    print(f"Speedup: {legacy_time / streaming_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
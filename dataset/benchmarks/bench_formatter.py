@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the pooled formatter client against one plain requests.post per file,
+using a local stand-in for the NetLogo formatter service.
+
+The stand-in strips trailing whitespace after a fixed delay. It can also be run
+on its own, e.g. as --formatter-command for models-library-parser.py:
+
+    python3 dataset/benchmarks/bench_formatter.py --serve 3000
+
+Usage:
+    python3 dataset/benchmarks/bench_formatter.py [--base-dir DIR] [--delay MS] [--workers N] [--recycle-after N]
+"""
+
+import argparse
+import json
+import shlex
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def stand_in_format(code: str) -> str:
+    return '\n'.join(line.rstrip() for line in code.split('\n'))
+
+
+def make_handler(delay: float):
+    class StandInFormatter(BaseHTTPRequestHandler):
+        """Answers /prettify ({"code"}) and /prettify-batch ({"codes"}) like the formatter service."""
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            time.sleep(delay)
+            if self.path.endswith('-batch'):
+                body = {"formatted": [stand_in_format(code) for code in payload["codes"]]}
+            else:
+                body = {"formatted": stand_in_format(payload["code"])}
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return StandInFormatter
+
+
+def serve(port: int, delay: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('localhost', port), make_handler(delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the formatter client against a stand-in formatter')
+    parser.add_argument('--base-dir', default='dataset/models-library',
+                        help='Directory containing NetLogo model files (default: dataset/models-library)')
+    parser.add_argument('--delay', type=float, default=5.0,
+                        help='Stand-in formatter latency per request in milliseconds (default: 5)')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Formatter client workers (default: 8)')
+    parser.add_argument('--recycle-after', type=int, default=100,
+                        help='Files between restarts in the recycling run (default: 100)')
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help='Only run the stand-in formatter on this port')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.delay / 1000).serve_forever()
+        return
+
+    # Imported here so the stand-in formatter process starts quickly when recycled
+    from parsers.discovery import discover_model_files, open_model_file
+    from utils.formatter_client import FormatterClient
+
+    codes = []
+    for path in discover_model_files(args.base_dir):
+        with open_model_file(path) as netlogo_file:
+            codes.append(netlogo_file.code)
+    print(f"Loaded {len(codes)} code sections, {sum(map(len, codes)) / 1e6:.1f} MB")
+
+    server = serve(0, args.delay / 1000)
+    url = f"http://localhost:{server.server_address[1]}/prettify"
+    expected = [stand_in_format(code) for code in codes]
+
+    def plain_posts():
+        return [requests.post(url, json={"code": code, "lineWidth": 80}).json()["formatted"] for code in codes]
+
+    def pooled():
+        with FormatterClient(url, workers=args.workers) as client:
+            return client.format_many(codes)
+
+    def batched():
+        with FormatterClient(url, batch_url=url + '-batch', workers=args.workers) as client:
+            return client.format_many(codes)
+
+    def recycled():
+        # A separate stand-in process, restarted by the client
+        port = server.server_address[1] + 1
+        command = f"{shlex.quote(sys.executable)} {shlex.quote(str(Path(__file__).resolve()))} --serve {port} --delay {args.delay}"
+        with FormatterClient(f"http://localhost:{port}/prettify", workers=args.workers,
+                             server_command=command, recycle_after=args.recycle_after) as client:
+            return client.format_many(codes)
+
+    print(f"{'client':<14}{'time (s)':>10}{'files/s':>10}")
+    for name, run in (("plain posts", plain_posts), ("pooled", pooled), ("batched", batched),
+                      ("recycled", recycled)):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14}{elapsed:>10.2f}{len(codes) / elapsed:>10.0f}")
+        if result != expected:
+            print(f"Warning: {name} returned unformatted code")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
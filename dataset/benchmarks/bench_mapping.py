@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the codeToPseudoCodeMap reconstruction on the largest procedures in
+the models library: the indexed line-number join against the original
+startswith scan, with placeholder pseudocode for every line.
+
+Usage:
+    python3 dataset/benchmarks/bench_mapping.py [--base-dir DIR] [--top N] [--repeat N]
+"""
+
+import argparse
+import contextlib
+import io
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parsers.discovery import discover_model_files
+from parsers.procedure_extractor import iter_procedures
+from utils.llm_pseudocode_generator import LLMPseudocodeGenerator
+
+
+def legacy_join(code_with_line_numbers: List[str], pseudocode_mapping: List[Dict]) -> Tuple[List[Dict], List[str]]:
+    """The mapping loop of _apply_pseudocode before the indexed join, kept here as the baseline."""
+    code_to_pseudo_map = []
+    numbered_pseudocode_lines = []
+    line_number_width = len(str(len(code_with_line_numbers)))
+    for line_data in pseudocode_mapping:
+        line_num, pseudo_text = line_data["line"], line_data["psuedo"]
+        original_line = ""
+        for line in code_with_line_numbers:
+            if line.startswith(f"{line_num:>{line_number_width}} |"):
+                original_line = line
+                break
+        if original_line:
+            orig_code_without_num = re.sub(r'^\s*\d+\s*\|\s?', '', original_line)
+            numbered_pseudocode_lines.append(f"{line_num:>{line_number_width}} | {pseudo_text}")
+            code_to_pseudo_map.append({
+                "lineNumber": line_num,
+                "originalCode": orig_code_without_num,
+                "pseudoCode": pseudo_text
+            })
+    code_to_pseudo_map.sort(key=lambda x: x["lineNumber"])
+    numbered_pseudocode_lines.sort(key=lambda x: int(re.match(r'^\s*(\d+)\s*\|', x).group(1)))
+    return code_to_pseudo_map, numbered_pseudocode_lines
+
+
+def largest_procedures(base_dir: str, top: int) -> List[Tuple[Dict, List[Dict]]]:
+    """Return the top largest procedures with a placeholder response line for each non-blank line."""
+    procedures = []
+    for path in discover_model_files(base_dir):
+        procedures.extend(iter_procedures(path.read_text(encoding='utf-8')))
+    procedures.sort(key=lambda procedure: -len(procedure['numberedOriginalCode']))
+    cases = []
+    for procedure in procedures[:top]:
+        lines = procedure['originalCode'].split('\n')
+        response = [{"line": i, "psuedo": f"step {i}"} for i, line in enumerate(lines, 1) if line.strip()]
+        cases.append((procedure, response))
+    return cases
+
+
+def time_best(run, repeat: int) -> float:
+    """Return the best wall-clock time of run()."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the code-to-pseudocode line join')
+    parser.add_argument('--base-dir', default='dataset/models-library',
+                        help='Directory containing NetLogo model files (default: dataset/models-library)')
+    parser.add_argument('--top', type=int, default=50,
+                        help='Number of largest procedures to use (default: 50)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed runs; the best is reported (default: 5)')
+    args = parser.parse_args()
+
+    cases = largest_procedures(args.base_dir, args.top)
+    total_lines = sum(len(procedure['numberedOriginalCode']) for procedure, _ in cases)
+    print(f"Using {len(cases)} procedures with {total_lines} lines "
+          f"(largest: {len(cases[0][0]['numberedOriginalCode'])} lines)")
+
+    generator = LLMPseudocodeGenerator()
+    for procedure, response in cases:
+        expected = legacy_join(procedure['numberedOriginalCode'], response)
+        if generator._join_response_lines(procedure, response) != expected:
+            print(f"Warning: indexed join differs from the baseline for '{procedure['name']}'")
+
+    legacy_time = time_best(lambda: [legacy_join(procedure['numberedOriginalCode'], response)
+                                     for procedure, response in cases], args.repeat)
+    with contextlib.redirect_stdout(io.StringIO()):
+        indexed_time = time_best(lambda: [generator._join_response_lines(procedure, response)
+                                          for procedure, response in cases], args.repeat)
+
+    print(f"{'join':<10}{'time (ms)':>11}{'lines/s':>12}")
+    print(f"{'legacy':<10}{legacy_time * 1000:>11.1f}{total_lines / legacy_time:>12.0f}")
+    print(f"{'indexed':<10}{indexed_time * 1000:>11.1f}{total_lines / indexed_time:>12.0f}")
+    print(f"Speedup: {legacy_time / indexed_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+Run ModelsLibraryParser end to end over the models library against a local
+stand-in for litellm.completion (see utils/mock_llm.py), so pipeline throughput
+can be measured offline, without an API key or a paid run.
+
+Reports files/s, procedures/s, LLM calls, checkpoint I/O time and peak RSS.
+With --save, the results are written as JSON; with --baseline, a previous
+--save file is compared against and a drop in throughput beyond --tolerance
+makes the script exit with status 1.
+
+Usage:
+    python3 dataset/benchmarks/bench_pipeline.py [--base-dir DIR] [--limit N] [--latency-ms MS]
+        [--error-rate P] [--drift-rate P] [--stream] [--concurrency N] [--batch-tokens N] [--save FILE] [--baseline FILE]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parsers import ModelsLibraryParser
+from utils.llm_pseudocode_generator import PROMPT_MODES
+from utils.mock_llm import mock_completion
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of its finished children (parse workers)."""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        "main": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def run_pipeline(args) -> Dict:
+    """Process the library once with the mock LLM and return the measurements."""
+    with tempfile.TemporaryDirectory() as tmp:
+        parser = ModelsLibraryParser(
+            args.base_dir,
+            concurrency=args.concurrency,
+            initial_concurrency=args.initial_concurrency,
+            parse_workers=args.parse_workers,
+            prompt_mode=args.prompt_mode,
+            batch_tokens=args.batch_tokens,
+            max_retries=args.max_retries,
+            stream=args.stream,
+        )
+        # Keep retries of injected errors quick; real backoff would dominate the timings
+        parser.scheduler.base_delay = parser.scheduler.max_delay = args.retry_delay
+        files = parser.find_netlogo_files()
+        if args.limit:
+            files = files[:args.limit]
+        parser.find_netlogo_files = lambda: files
+        parser.output_file = str(Path(tmp) / f"models{args.output_suffix}")
+
+        with mock_completion(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                             error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                             drift_rate=args.drift_rate, seed=0) as mock, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            parser.process_all_files()
+            parser.save_to_json(parser.output_file)
+            elapsed = time.perf_counter() - start
+
+    procedures = sum(len(model['procedures']) for model in parser.models)
+    checkpoint_seconds = sum(parser.metrics.latency(name).get("total", 0.0)
+                             for name in ("checkpoint_write", "checkpoint_sync", "save_output"))
+    return {
+        "files": len(files),
+        "procedures": procedures,
+        "seconds": elapsed,
+        "filesPerSecond": len(files) / elapsed,
+        "proceduresPerSecond": procedures / elapsed,
+        "parseSeconds": parser.metrics.latency("parse_stage").get("total", 0.0),
+        "checkpointSeconds": checkpoint_seconds,
+        "llmCalls": mock.stats()["calls"],
+        "injectedErrors": mock.stats()["errors"],
+        "streamAborts": parser.metrics.get("stream_aborts"),
+        "failedProcedures": sum(1 for model in parser.models for procedure in model['procedures']
+                                if not procedure.get('pseudoCode')),
+        "peakRssMb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the parser end to end against a mock LLM')
+    parser.add_argument('--base-dir', default='dataset/models-library',
+                        help='Directory containing NetLogo model files (default: dataset/models-library)')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Only process the N largest files (default: all)')
+    parser.add_argument('--latency-ms', type=float, default=50.0,
+                        help='Mock LLM latency per call in milliseconds (default: 50)')
+    parser.add_argument('--jitter-ms', type=float, default=0.0,
+                        help='Extra random latency of up to this many milliseconds (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Probability of a transient service error per call (default: 0)')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help='Probability of a rate limit error per call (default: 0)')
+    parser.add_argument('--drift-rate', type=float, default=0.0,
+                        help='Probability that a response drifts from the code (default: 0)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream responses with early drift detection')
+    parser.add_argument('--retry-delay', type=float, default=0.01,
+                        help='Backoff in seconds before retrying an injected error (default: 0.01)')
+    parser.add_argument('--max-retries', type=int, default=5,
+                        help='Retries per call before a procedure is deferred (default: 5)')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Maximum procedures sent to the mock LLM in parallel (default: 16)')
+    parser.add_argument('--initial-concurrency', type=int, default=None,
+                        help='Concurrency limit to start from (default: a quarter of --concurrency)')
+    parser.add_argument('--parse-workers', type=int, default=1,
+                        help='Processes used to parse model files (default: 1)')
+    parser.add_argument('--prompt-mode', choices=PROMPT_MODES, default='full',
+                        help='Prompt mode of the generator (default: full)')
+    parser.add_argument('--batch-tokens', type=int, default=0,
+                        help='Token budget for batching procedures per request (default: 0, no batching)')
+    parser.add_argument('--output-suffix', choices=('.json', '.sqlite'), default='.json',
+                        help='Output format of the final save (default: .json)')
+    parser.add_argument('--save', metavar='FILE',
+                        help='Write the results to this JSON file')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='Compare with results saved by an earlier --save run')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative drop in procedures/s against the baseline (default: 0.2)')
+    args = parser.parse_args()
+
+    result = run_pipeline(args)
+    rss = result["peakRssMb"]
+    print(f"Processed {result['files']} files, {result['procedures']} procedures "
+          f"in {result['seconds']:.2f}s ({result['parseSeconds']:.2f}s parsing)")
+    print(f"  {result['filesPerSecond']:.1f} files/s, {result['proceduresPerSecond']:.1f} procedures/s")
+    print(f"  {result['llmCalls']} LLM calls, {result['injectedErrors']} injected errors, "
+          f"{result['streamAborts']:.0f} aborted streams, {result['failedProcedures']} procedures without pseudocode")
+    print(f"  Checkpoint and output I/O: {result['checkpointSeconds']:.2f}s, summed over threads")
+    print(f"  Peak RSS: {rss['main']:.0f} MB main, {rss['children']:.0f} MB parse workers")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        ratio = result["proceduresPerSecond"] / baseline["proceduresPerSecond"]
+        print(f"Procedures/s is {ratio:.2f}x the baseline")
+        if ratio < 1 - args.tolerance:
+            print("Throughput regression beyond tolerance")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Compare the pretty-printed JSON models file with the SQLite model store:
+file size, save time and load time.
+
+Without --input, a synthetic models file is built from the models library (see
+bench_export.py).
+
+Usage:
+    python3 dataset/benchmarks/bench_storage.py [--input FILE] [--base-dir DIR] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_export import synthesize_models
+from utils import storage
+
+
+def time_best(run, repeat: int) -> float:
+    """Return the best wall-clock time of run()."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON against the SQLite model store')
+    parser.add_argument('--input', help='Models JSON file (default: synthesize one from --base-dir)')
+    parser.add_argument('--base-dir', default='dataset/models-library',
+                        help='Models library used to synthesize input (default: dataset/models-library)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs; the best is reported (default: 3)')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            models = json.load(f)['models']
+    else:
+        models = synthesize_models(args.base_dir)
+    print(f"{len(models)} models, {sum(len(m['procedures']) for m in models)} procedures")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, 'models.json')
+        store_path = os.path.join(temp_dir, 'models.sqlite')
+
+        def save_json():
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({"models": models, "totalModels": len(models)}, f, indent=2)
+
+        def load_json():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                return json.load(f)['models']
+
+        rows = [
+            ("json", time_best(save_json, args.repeat), time_best(load_json, args.repeat), json_path),
+            ("sqlite", time_best(lambda: storage.save_models(store_path, models), args.repeat),
+             time_best(lambda: storage.load_models(store_path), args.repeat), store_path),
+        ]
+        if storage.load_models(store_path)[0] != load_json():
+            print("Warning: SQLite store does not round-trip the JSON models")
+
+        print(f"{'format':<8}{'size (MB)':>11}{'save (s)':>10}{'load (s)':>10}")
+        for name, save_time, load_time, path in rows:
+            print(f"{name:<8}{os.path.getsize(path) / 1e6:>11.1f}{save_time:>10.3f}{load_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from utils.export_engine import EMITTERS, run_export, run_export_parallel
+
+# Default training output of each emitter
+DEFAULT_OUTPUTS = {
+    "summary": "dataset/netlogo_finetune.jsonl",
+    "pseudocode": "dataset/netlogo_finetune_from_pseudocode.jsonl",
+    "lines": "dataset/netlogo_finetune_lines.jsonl",
+}
+
+def validation_path(output_file: str) -> str:
+    """Return the validation file path next to an emitter's training output."""
+    if output_file.endswith('.jsonl'):
+        return output_file[:-len('.jsonl')] + '_validation.jsonl'
+    return output_file + '_validation'
+
+def main():
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(
+        description='Create all fine-tuning JSONL datasets from NetLogo models in a single pass')
+    parser.add_argument('--input', type=str, default='dataset/netlogo_models.json',
+                        help='Path to input NetLogo models JSON, JSONL or .sqlite/.db model store')
+    parser.add_argument('--emit', nargs='+', choices=sorted(EMITTERS), default=['summary', 'pseudocode'],
+                        help='Dataset formats to create (default: summary pseudocode)')
+    for name, default in DEFAULT_OUTPUTS.items():
+        parser.add_argument(f'--{name}-output', type=str, default=default,
+                            help=f'Path to the {name} training JSONL file (default: {default})')
+    parser.add_argument('--validation-pct', type=float, default=0.05,
+                        help='Fraction of procedures written to <output>_validation.jsonl files instead '
+                             '(default: 0.05 or 5%%, 0 disables the split)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Seed for the hash-based validation split (default: 42)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes building pairs; each writes its own shard (default: 1)')
+    parser.add_argument('--keep-shards', action='store_true',
+                        help='With --workers, keep the per-worker shard files and write a manifest next to each '
+                             'output instead of concatenating them')
+    args = parser.parse_args()
+
+    emitters = []
+    for name in args.emit:
+        output_file = getattr(args, f'{name}_output')
+        validation_file = validation_path(output_file) if args.validation_pct > 0 else None
+        emitters.append(EMITTERS[name](output_file, validation_file))
+
+    print(f"Reading NetLogo models from {args.input}...")
+    if args.workers > 1:
+        model_count = run_export_parallel(args.input, emitters, args.workers, args.validation_pct, args.seed,
+                                          keep_shards=args.keep_shards)
+    else:
+        model_count = run_export(args.input, emitters, args.validation_pct, args.seed)
+    print(f"Read {model_count} models")
+
+    sharded = ' (sharded)' if args.workers > 1 and args.keep_shards else ''
+    for emitter in emitters:
+        print(f"{emitter.name}: {emitter.train_count} training pairs in {emitter.output_file}{sharded}", end='')
+        if emitter.validation_file:
+            print(f", {emitter.valid_count} validation pairs in {emitter.validation_file}{sharded}")
+        else:
+            print()
+
+if __name__ == "__main__":
+    main()
@@ -2,120 +2,10 @@
 
 import json
 import argparse
-import re
 from pathlib import Path
-from typing import List, Dict, Any
 
-def strip_netlogo_comments(code: str) -> str:
-    """
-    Remove comments from NetLogo code.
-    Comments in NetLogo start with semicolons (;).
-    
-    Args:
-        code: Original NetLogo code with comments
-        
-    Returns:
-        Code with comments removed
-    """
-    # Split the code into lines
-    lines = code.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        # Remove everything after a semicolon (;)
-        comment_pos = line.find(';')
-        if comment_pos >= 0:
-            line = line[:comment_pos]
-        
-        # Only include non-empty lines
-        if line.strip():
-            cleaned_lines.append(line)
-    
-    # Join the lines back together
-    return '\n'.join(cleaned_lines)
-
-def clean_summary(summary: str) -> str:
-    """
-    Clean summary text by removing any comment markers.
-    
-    Args:
-        summary: Original summary text
-        
-    Returns:
-        Cleaned summary text without comment markers
-    """
-    # Split the summary into lines
-    lines = summary.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        # Skip entirely comment-only lines
-        if line.strip().startswith(";;") or line.strip().startswith(";"):
-            continue
-        
-        # Remove any comments from the middle or end of the line
-        comment_pos = line.find(';')
-        if comment_pos >= 0:
-            line = line[:comment_pos]
-        
-        # Check for "Comment:" text and remove it
-        comment_text_pos = line.lower().find('comment:')
-        if comment_text_pos >= 0:
-            line = line[:comment_text_pos]
-        
-        # Only include non-empty lines
-        if line.strip():
-            cleaned_lines.append(line)
-    
-    # Join the lines back together
-    return '\n'.join(cleaned_lines)
-
-def create_training_pair(procedure: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Create a training pair for fine-tuning from a procedure.
-    
-    Args:
-        procedure: Dictionary containing procedure data
-        
-    Returns:
-        Dictionary formatted for fine-tuning with messages
-    """
-    # Check if required fields exist
-    if not all(key in procedure for key in ['originalCode', 'summary', 'variables']):
-        return None
-    
-    # Clean the code by removing comments
-    clean_code = strip_netlogo_comments(procedure['originalCode'])
-    
-    # If after removing comments the code is empty, skip this procedure
-    if not clean_code.strip():
-        return None
-    
-    # Clean the summary by removing any comment markers
-    clean_summary_text = clean_summary(procedure['summary'])
-    
-    # If after cleaning the summary is empty, skip this procedure
-    if not clean_summary_text.strip():
-        return None
-    
-    # Format variables as XML-style tag for better recognition by the model
-    variables_text = ""
-    if procedure['variables'] and len(procedure['variables']) > 0:
-        variables_text = f"<variables>{', '.join(procedure['variables'])}</variables>"
-    
-    # Create messages array with user input (summary) and assistant output (code)
-    messages = [
-        {
-            "role": "user",
-            "content": f"Generate NetLogo code that implements the following summary:\n\n{clean_summary_text}\n\n{variables_text}"
-        },
-        {
-            "role": "assistant",
-            "content": f"```netlogo\n{clean_code}\n```"
-        }
-    ]
-    
-    return {"messages": messages}
+from utils import storage
+from utils.export_engine import build_summary_pair as create_training_pair
 
 def process_netlogo_models(input_file: str, output_file: str) -> None:
     """
@@ -127,11 +17,13 @@ def process_netlogo_models(input_file: str, output_file: str) -> None:
     """
     print(f"Reading NetLogo models from {input_file}...")
     
-    # Load input JSON file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    models = data.get('models', [])
+    # Load input JSON file, or a SQLite model store
+    if storage.is_store_path(input_file):
+        models, _ = storage.load_models(input_file)
+    else:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        models = data.get('models', [])
     print(f"Found {len(models)} models")
     
     # Count total procedures
@@ -167,7 +59,7 @@ def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Convert NetLogo models to fine-tuning JSONL format')
     parser.add_argument('--input', type=str, default='dataset/netlogo_models.json',
-                        help='Path to input NetLogo models JSON file')
+                        help='Path to input NetLogo models JSON file (or .sqlite/.db model store)')
     parser.add_argument('--output', type=str, default='dataset/netlogo_finetune.jsonl',
                         help='Path to output JSONL file for fine-tuning')
     args = parser.parse_args()
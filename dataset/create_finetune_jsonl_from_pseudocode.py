@@ -2,133 +2,14 @@
 
 import json
 import argparse
-import re
 import random
+import tempfile
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import Optional, Tuple
 
-def strip_netlogo_comments(code: str) -> str:
-    """
-    Remove comments from NetLogo code.
-    Comments in NetLogo start with semicolons (;).
-    
-    Args:
-        code: Original NetLogo code with comments
-        
-    Returns:
-        Code with comments removed
-    """
-    # Split the code into lines
-    lines = code.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        # Remove everything after a semicolon (;)
-        comment_pos = line.find(';')
-        if comment_pos >= 0:
-            line = line[:comment_pos]
-        
-        # Only include non-empty lines
-        if line.strip():
-            cleaned_lines.append(line)
-    
-    # Join the lines back together
-    return '\n'.join(cleaned_lines)
-
-def strip_line_numbers_and_comments_from_pseudocode(pseudocode: List[str]) -> str:
-    """
-    Remove line numbers and comments from pseudocode while preserving spacing.
-    
-    Args:
-        pseudocode: List of pseudocode lines with line numbers
-    
-    Returns:
-        Pseudocode as a string without line numbers or comments but with preserved spacing
-    """
-    # Process each line
-    processed_lines = []
-    for line in pseudocode:
-        # Skip entirely comment-only lines
-        if line.strip().startswith(";;") or line.strip().startswith(";"):
-            continue
-            
-        # Match the line number pattern (digits followed by |)
-        match = re.match(r'^\s*\d+\s*\|\s?(.*)', line)
-        if match:
-            # Extract the content after the line number
-            content = match.group(1)
-            
-            # Skip if the line is just a comment
-            if content.strip().startswith(";;") or content.strip().startswith(";"):
-                continue
-                
-            # Remove any comments from the middle or end of the line
-            comment_pos = content.find(';')
-            if comment_pos >= 0:
-                content = content[:comment_pos]
-            
-            # Check for "Comment:" text and remove it
-            comment_text_pos = content.lower().find('comment:')
-            if comment_text_pos >= 0:
-                content = content[:comment_text_pos]
-            
-            # Add the line if it's not empty after processing
-            if content.strip():
-                processed_lines.append(content)
-    
-    # Join the processed lines
-    return '\n'.join(processed_lines)
-
-def create_training_pair(procedure: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Create a training pair for fine-tuning from a procedure.
-    
-    Args:
-        procedure: Dictionary containing procedure data
-        
-    Returns:
-        Dictionary formatted for fine-tuning with messages
-    """
-    # Check if required fields exist
-    if not all(key in procedure for key in ['originalCode', 'pseudoCode', 'variables']):
-        return None
-    
-    # Skip if pseudoCode is empty
-    if not procedure['pseudoCode']:
-        return None
-    
-    # Clean the original code by removing comments
-    clean_code = strip_netlogo_comments(procedure['originalCode'])
-    
-    # If after removing comments the code is empty, skip this procedure
-    if not clean_code.strip():
-        return None
-    
-    # Convert pseudoCode list to string without line numbers and comments
-    pseudocode_text = strip_line_numbers_and_comments_from_pseudocode(procedure['pseudoCode'])
-    
-    # If after removing comments the pseudocode is empty, skip this procedure
-    if not pseudocode_text.strip():
-        return None
-    
-    # Format variables as XML-style tag for better recognition by the model
-    variables_text = ""
-    if procedure['variables'] and len(procedure['variables']) > 0:
-        variables_text = f"<variables>{', '.join(procedure['variables'])}</variables>"
-    
-    # Create messages array with user input (pseudocode) and assistant output (code)
-    messages = [
-        {
-            "role": "user",
-            "content": f"Generate NetLogo code based on the following pseudocode:\n\n{pseudocode_text}\n\n{variables_text}"
-        },
-        {
-            "role": "assistant",
-            "content": f"```netlogo\n{clean_code}\n```"
-        }
-    ]
-    
-    return {"messages": messages}
+from utils import storage
+from utils.export_engine import build_pseudocode_pair as create_training_pair, is_validation_procedure
+from utils.json_stream import iter_models
 
 def process_netlogo_models(input_file: str, output_file: str, validation_file: str = None, validation_pct: float = 0.05) -> Tuple[int, int]:
     """
@@ -145,11 +26,13 @@ def process_netlogo_models(input_file: str, output_file: str, validation_file: s
     """
     print(f"Reading NetLogo models from {input_file}...")
     
-    # Load input JSON file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    models = data.get('models', [])
+    # Load input JSON file, or a SQLite model store
+    if storage.is_store_path(input_file):
+        models, _ = storage.load_models(input_file)
+    else:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        models = data.get('models', [])
     print(f"Found {len(models)} models")
     
     # Count total procedures
@@ -214,11 +97,109 @@ def process_netlogo_models(input_file: str, output_file: str, validation_file: s
     print(f"Created {len(train_pairs)} training pairs in {output_file}")
     return len(train_pairs), len(valid_pairs)
 
+def shuffle_external(input_file: str, output_file: str, buckets: int, seed: int) -> None:
+    """
+    Shuffle a JSONL file without holding it in memory.
+    
+    Lines are scattered over random bucket files, then each bucket is shuffled in
+    memory and appended to the output, so memory is about one bucket.
+    
+    Args:
+        input_file: JSONL file to shuffle
+        output_file: Path of the shuffled JSONL file (may not be input_file)
+        buckets: Number of temporary bucket files
+        seed: Random seed for reproducibility
+    """
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory(dir=Path(output_file).parent) as temp_dir:
+        bucket_paths = [Path(temp_dir) / f"bucket-{i}.jsonl" for i in range(buckets)]
+        bucket_files = [open(path, 'w', encoding='utf-8') for path in bucket_paths]
+        try:
+            with open(input_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    bucket_files[rng.randrange(buckets)].write(line)
+        finally:
+            for bucket_file in bucket_files:
+                bucket_file.close()
+        
+        with open(output_file, 'w', encoding='utf-8') as out:
+            for path in bucket_paths:
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()
+                rng.shuffle(lines)
+                out.writelines(lines)
+
+def stream_netlogo_models(input_file: str, output_file: str, validation_file: Optional[str] = None,
+                          validation_pct: float = 0.05, seed: int = 42, shuffle_buckets: int = 0) -> Tuple[int, int]:
+    """
+    Streaming version of process_netlogo_models with O(1) memory in the dataset size.
+    
+    Models are read one at a time, each pair is assigned to training or validation
+    by is_validation_procedure and written out immediately. With shuffle_buckets the
+    training file is shuffled afterwards by shuffle_external.
+    
+    Args:
+        input_file: Path to input models JSON, JSONL or SQLite store file
+        output_file: Path to output JSONL file
+        validation_file: Path to validation JSONL file
+        validation_pct: Percentage of data to use for validation (0.0 to 1.0)
+        seed: Seed for the split hash and the shuffle
+        shuffle_buckets: Number of buckets for the external shuffle (0 disables it)
+        
+    Returns:
+        Tuple of (training_count, validation_count) - number of examples in each set
+    """
+    print(f"Streaming NetLogo models from {input_file}...")
+    
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if not validation_file:
+        validation_pct = 0
+    elif validation_pct > 0:
+        Path(validation_file).parent.mkdir(parents=True, exist_ok=True)
+    
+    # Write training pairs in model order first when they get shuffled afterwards
+    train_file = str(output_path.with_name(output_path.name + '.unshuffled')) if shuffle_buckets else output_file
+    model_count = train_count = valid_count = 0
+    valid_out = open(validation_file, 'w', encoding='utf-8') if validation_pct > 0 else None
+    try:
+        with open(train_file, 'w', encoding='utf-8') as train_out:
+            for model in iter_models(input_file):
+                model_count += 1
+                for procedure in model.get('procedures', []):
+                    # Skip procedures without code or pseudocode
+                    if not procedure.get('originalCode') or not procedure.get('pseudoCode'):
+                        continue
+                    
+                    training_pair = create_training_pair(procedure)
+                    if not training_pair:
+                        continue
+                    if valid_out and is_validation_procedure(procedure, validation_pct, seed):
+                        valid_out.write(json.dumps(training_pair) + '\n')
+                        valid_count += 1
+                    else:
+                        train_out.write(json.dumps(training_pair) + '\n')
+                        train_count += 1
+    finally:
+        if valid_out:
+            valid_out.close()
+    
+    if shuffle_buckets:
+        print(f"Shuffling {train_count} training pairs through {shuffle_buckets} buckets...")
+        shuffle_external(train_file, output_file, shuffle_buckets, seed)
+        Path(train_file).unlink()
+    
+    print(f"Read {model_count} models")
+    if valid_out:
+        print(f"Created {valid_count} validation pairs in {validation_file}")
+    print(f"Created {train_count} training pairs in {output_file}")
+    return train_count, valid_count
+
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Convert NetLogo models to fine-tuning JSONL format using pseudocode')
     parser.add_argument('--input', type=str, default='dataset/netlogo_models.json',
-                        help='Path to input NetLogo models JSON file')
+                        help='Path to input NetLogo models JSON file (or .sqlite/.db model store)')
     parser.add_argument('--output', type=str, default='dataset/netlogo_finetune_from_pseudocode.jsonl',
                         help='Path to output JSONL file for fine-tuning')
     parser.add_argument('--validation', type=str, default='dataset/netlogo_finetune_from_pseudocode_validation.jsonl',
@@ -227,6 +208,12 @@ def main():
                         help='Percentage of data to use for validation (default: 0.05 or 5%%)')
     parser.add_argument('--seed', type=int, default=42,
                         help='Random seed for reproducibility (default: 42)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Read models incrementally and write pairs as they are created, splitting by a hash '
+                             'of each procedure instead of a global shuffle (also accepts JSONL input)')
+    parser.add_argument('--shuffle-buckets', type=int, default=0,
+                        help='With --stream, shuffle the training file out of core using this many temporary '
+                             'bucket files (default: 0, keep model order)')
     args = parser.parse_args()
     
     # Set random seed for reproducibility
@@ -234,7 +221,11 @@ def main():
     
     # Process the models
     validation_file = args.validation if args.validation else None
-    process_netlogo_models(args.input, args.output, validation_file, args.validation_pct)
+    if args.stream:
+        stream_netlogo_models(args.input, args.output, validation_file, args.validation_pct,
+                              seed=args.seed, shuffle_buckets=args.shuffle_buckets)
+    else:
+        process_netlogo_models(args.input, args.output, validation_file, args.validation_pct)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
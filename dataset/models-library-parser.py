@@ -1,6 +1,13 @@
 #!/usr/bin/env python3
 
 from parsers import ModelsLibraryParser
+from utils.build_manifest import BuildManifest
+from utils.checkpoint import CheckpointJournal
+from utils.formatter_client import FormatterClient
+from utils.batch_api import BatchJob, LiteLLMBatchBackend, LocalBatchBackend
+from utils.procedure_index import ProcedureIndex
+from utils.llm_pseudocode_generator import PROMPT_MODES
+from utils.quality import load_work_list, quality_work_list, save_work_list, summarize_work_list
 import os
 import argparse
 from pathlib import Path
@@ -10,35 +17,194 @@ def main():
     parser.add_argument('--base-dir', default='dataset/models-library',
                         help='Directory containing NetLogo model files (default: dataset/models-library)')
     parser.add_argument('--output', default='dataset/netlogo_models.json',
-                        help='Output JSON file path (default: dataset/netlogo_models.json)')
+                        help='Output JSON file path, or a .sqlite/.db path for the compact SQLite model store '
+                             '(default: dataset/netlogo_models.json)')
     parser.add_argument('--resume', action='store_true',
                         help='Resume processing from the existing output file')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Rebuild only models whose files changed since the last build, using the build manifest '
+                             'next to the output; deleted files are dropped')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Maximum number of procedures sent to the LLM in parallel; the limit starts at '
+                             '--initial-concurrency, grows while responses are fast and halves on rate limit '
+                             'errors (default: 1)')
+    parser.add_argument('--initial-concurrency', type=int, default=None,
+                        help='Concurrency limit to start from (default: a quarter of --concurrency, at least 1)')
+    parser.add_argument('--cache', default='dataset/pseudocode_cache.sqlite',
+                        help='SQLite file caching LLM responses by procedure code (default: dataset/pseudocode_cache.sqlite)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always call the LLM, bypassing the response cache')
+    parser.add_argument('--cache-max-mb', type=int, default=256,
+                        help='Maximum size of the response cache before old entries are evicted (default: 256)')
+    parser.add_argument('--prompt-mode', choices=PROMPT_MODES, default='full',
+                        help='"compact" moves instructions to a reusable system prompt and drops the echoed '
+                             'original code from the response, saving completion tokens (default: full)')
+    parser.add_argument('--batch-tokens', type=int, default=0,
+                        help='Pack small procedures of the same model into one request of up to this many '
+                             'code tokens (default: 0, one procedure per request)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream responses and check each line as it arrives, aborting and retrying a '
+                             'response as soon as it drifts from the code')
+    parser.add_argument('--rpm', type=int, default=None,
+                        help='Maximum LLM requests per minute (default: no limit)')
+    parser.add_argument('--tpm', type=int, default=None,
+                        help='Maximum LLM tokens per minute (default: no limit)')
+    parser.add_argument('--max-retries', type=int, default=5,
+                        help='Retries for rate limited or transient LLM errors before a procedure is '
+                             'deferred (default: 5)')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='Periodically write run metrics (tokens, throughput, latency percentiles) '
+                             'to this JSON file')
+    parser.add_argument('--metrics-interval', type=float, default=30.0,
+                        help='Seconds between metrics snapshots (default: 30)')
+    parser.add_argument('--index', metavar='PATH',
+                        help='Update the procedure index at this path with the processed models; with '
+                             '--incremental, models no longer in the output are removed (see query_procedures.py)')
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of processes used to parse model files (default: number of CPUs)')
+    parser.add_argument('--batch-api', metavar='PROVIDER',
+                        help='Send all pending procedures as one provider batch job (e.g. mistral, openai), '
+                             'or "local" for a file-based fake; failed requests fall back to single requests')
+    parser.add_argument('--batch-dir', default='dataset/batch_jobs',
+                        help='Directory for batch input/output files and job state (default: dataset/batch_jobs)')
+    parser.add_argument('--batch-poll-interval', type=float, default=60.0,
+                        help='Seconds between batch job status checks (default: 60)')
+    parser.add_argument('--format-code', action='store_true',
+                        help='Format code with the NetLogo formatter service (NETLOGO_FORMATTER_URL, default '
+                             'http://localhost:3000/prettify) before extracting procedures')
+    parser.add_argument('--formatter-batch-url',
+                        help='Formatter endpoint accepting several files per request (default: one file per request)')
+    parser.add_argument('--formatter-workers', type=int, default=8,
+                        help='Maximum formatter requests in flight (default: 8)')
+    parser.add_argument('--formatter-timeout', type=float, default=30.0,
+                        help='Seconds before a formatter request is abandoned (default: 30)')
+    parser.add_argument('--formatter-command',
+                        help='Start the formatter locally with this command instead of using a running service')
+    parser.add_argument('--formatter-recycle-after', type=int, default=200,
+                        help='Restart the local formatter after this many files to contain its memory leak '
+                             '(default: 200, 0 never)')
+    parser.add_argument('--check-quality', metavar='PATH',
+                        help='Score every procedure of the output locally (line coverage, summary, variables) and '
+                             'write the flagged ones to this JSONL work list; no LLM calls')
+    parser.add_argument('--repair', metavar='WORKLIST', nargs='?', const='',
+                        help='Regenerate only the flagged procedures of the output in place, from a --check-quality '
+                             'work list or, without one, from a fresh check')
+    parser.add_argument('--parse-only', metavar='PATH',
+                        help='Only run the parse stage and write the parsed models (no pseudocode) to this JSONL file')
+    parser.add_argument('--parsed-models', metavar='PATH',
+                        help='Skip parsing and generate pseudocode for the models in this JSONL file from --parse-only')
     args = parser.parse_args()
     
     # Create the NetLogo models parser
-    netlogo_parser = ModelsLibraryParser(args.base_dir)
+    netlogo_parser = ModelsLibraryParser(
+        args.base_dir,
+        concurrency=args.concurrency,
+        initial_concurrency=args.initial_concurrency,
+        cache_path=None if args.no_cache or args.parse_only else args.cache,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        parse_workers=args.parse_workers,
+        prompt_mode=args.prompt_mode,
+        batch_tokens=args.batch_tokens,
+        rpm_limit=args.rpm,
+        tpm_limit=args.tpm,
+        max_retries=args.max_retries,
+        stream=args.stream
+    )
+    if args.format_code:
+        netlogo_parser.formatter = FormatterClient(
+            os.environ.get('NETLOGO_FORMATTER_URL', 'http://localhost:3000/prettify'),
+            batch_url=args.formatter_batch_url,
+            workers=args.formatter_workers,
+            timeout=args.formatter_timeout,
+            server_command=args.formatter_command,
+            recycle_after=args.formatter_recycle_after,
+            metrics=netlogo_parser.metrics
+        )
+    
+    if args.batch_api:
+        backend = (LocalBatchBackend(os.path.join(args.batch_dir, 'local-jobs')) if args.batch_api == 'local'
+                   else LiteLLMBatchBackend(args.batch_api))
+        netlogo_parser.batch_job = BatchJob(backend, netlogo_parser.pseudocode_generator, args.batch_dir,
+                                            poll_interval=args.batch_poll_interval)
+    
+    # Parse stage only: no LLM calls, no API key needed
+    if args.parse_only:
+        parsed_models = netlogo_parser.parse_files(netlogo_parser.find_netlogo_files())
+        netlogo_parser.save_parsed_models(args.parse_only, parsed_models)
+        print(f"Wrote {len(parsed_models)} parsed models to {args.parse_only}")
+        if netlogo_parser.formatter:
+            netlogo_parser.formatter.close()
+        return
+    
+    # Quality check only: score the stored procedures, no LLM calls
+    if args.check_quality:
+        if not netlogo_parser.load_from_json(args.output):
+            return
+        work_list = quality_work_list(netlogo_parser.models)
+        save_work_list(args.check_quality, work_list)
+        total = sum(len(model['procedures']) for model in netlogo_parser.models)
+        print(f"Quality check: {summarize_work_list(work_list, total)}")
+        print(f"Wrote the work list to {args.check_quality}")
+        return
+    
+    if args.metrics:
+        netlogo_parser.metrics.start_snapshots(args.metrics, args.metrics_interval)
+        print(f"Writing metrics snapshots to {args.metrics} every {args.metrics_interval:g}s")
     
     # Set the output file for incremental saves
     output_file = args.output
     netlogo_parser.output_file = output_file
     
-    # Attempt to resume from existing output if requested
-    if args.resume and os.path.exists(output_file):
+    # Attempt to resume from existing output (or its checkpoint journal) if requested
+    if args.resume or args.incremental or args.repair is not None:
         print(f"Attempting to resume from {output_file}...")
         if netlogo_parser.load_from_json(output_file):
             print(f"Successfully loaded {len(netlogo_parser.models)} models from {output_file}")
         else:
             print(f"Could not resume from {output_file}, starting from scratch")
     
-    print(f"Processing NetLogo files from {args.base_dir}...")
-    print(f"Results will be incrementally saved to {output_file}")
+    print(f"Results will be saved to {output_file}, with progress checkpointed to {CheckpointJournal.path_for(output_file)}")
     
-    # Process all files (this will perform incremental saves)
-    netlogo_parser.process_all_files()
+    # Generate pseudocode (this will checkpoint progress as it goes)
+    manifest_path = BuildManifest.path_for(output_file)
+    if args.incremental:
+        print(f"Rebuilding incrementally against {manifest_path}...")
+        manifest = BuildManifest.load(manifest_path)
+        netlogo_parser.process_incremental(manifest)
+    elif args.repair is not None:
+        work_list = load_work_list(args.repair) if args.repair else quality_work_list(netlogo_parser.models)
+        total = sum(len(model['procedures']) for model in netlogo_parser.models)
+        print(f"Repairing: {summarize_work_list(work_list, total)}")
+        remaining = netlogo_parser.regenerate_flagged(work_list)
+        print(f"After repair: {summarize_work_list(remaining, len(work_list))}")
+    elif args.parsed_models:
+        print(f"Loading parsed models from {args.parsed_models}...")
+        netlogo_parser.process_models(netlogo_parser.load_parsed_models(args.parsed_models))
+    else:
+        print(f"Processing NetLogo files from {args.base_dir}...")
+        netlogo_parser.process_all_files()
     
     # Final save
     print(f"Performing final save to {output_file}...")
     netlogo_parser.save_to_json(output_file)
+    if args.incremental:
+        manifest.save(manifest_path)
+        print(f"Updated build manifest {manifest_path}")
+    if args.index:
+        index = ProcedureIndex(args.index)
+        # An incremental build drops models of deleted or renamed files, so the index drops them too
+        if args.incremental:
+            counts = index.sync(netlogo_parser.models)
+        else:
+            counts = index.update(netlogo_parser.models)
+        index.close()
+        print(f"Procedure index {args.index}: {counts['indexed']} models indexed, {counts['unchanged']} unchanged"
+              + (f", {counts['removed']} removed" if 'removed' in counts else ""))
+    netlogo_parser.pseudocode_generator.print_token_usage_summary()
+    netlogo_parser.scheduler.print_summary()
+    netlogo_parser.metrics.stop_snapshots()
+    if netlogo_parser.formatter:
+        netlogo_parser.formatter.close()
     print("Done!")
 
 if __name__ == "__main__":
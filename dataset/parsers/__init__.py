@@ -2,10 +2,16 @@ from .base_parser import NetLogoModelParser
 from .models_library import ModelsLibraryParser
 from .modeling_commons import ModelingCommonsParser
 from .comses import CoMSESParser
+from .netlogo_file import NetLogoFile
+from .discovery import discover_model_files, open_model_file, register_format
 
 __all__ = [
     'NetLogoModelParser',
     'ModelsLibraryParser',
     'ModelingCommonsParser',
     'CoMSESParser',
+    'NetLogoFile',
+    'discover_model_files',
+    'open_model_file',
+    'register_format',
 ] 
\ No newline at end of file
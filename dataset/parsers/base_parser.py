@@ -1,161 +1,192 @@
 #!/usr/bin/env python3
 
 import json
-import re
 import os
-import requests
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
-from utils.llm_pseudocode_generator import LLMPseudocodeGenerator
+from typing import Dict, List, Optional, Tuple
+from utils.llm_pseudocode_generator import LLMPseudocodeGenerator, PseudocodeRetryableError
+from utils.llm_scheduler import AdaptiveScheduler
+from utils.metrics import MetricsRegistry
+from utils.pseudocode_cache import PseudocodeCache
+from utils.checkpoint import CheckpointJournal
+from utils import storage
+from utils.build_manifest import BuildManifest
+from utils.formatter_client import FormatterClient
+from utils.batch_api import BatchJob
+from utils.hashing import content_hash
+from utils.netlogo_code import copy_generated_fields, procedure_fingerprint
+from utils.quality import quality_work_list
+from .procedure_extractor import iter_procedures
+from .discovery import discover_model_files, open_model_file, strip_model_extension
+from .netlogo_file import NetLogoFile
+
+# Parser instances reused by each parse-stage worker process, keyed by (class, base_dir)
+_worker_parsers = {}
+
+def _parse_in_worker(parser_cls: type, base_dir: str, file_path: Path,
+                     code: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+    """Parse one file in a worker process, returning (model_data, error)."""
+    key = (parser_cls, base_dir)
+    if key not in _worker_parsers:
+        _worker_parsers[key] = parser_cls(base_dir)
+    try:
+        return _worker_parsers[key].parse_model_file(file_path, code), None
+    except Exception as e:
+        return None, str(e)
 
 class NetLogoModelParser(ABC):
     """Abstract base class for NetLogo model parsers."""
     
-    def __init__(self, base_dir: str, model_name: str = "mistral/codestral-2501"):
+    # Extra passes over procedures whose generation failed (transient errors past their retries,
+    # drifting, invalid or rejected responses); what still fails is left for --resume
+    RETRY_ROUNDS = 2
+    
+    def __init__(self, base_dir: str, model_name: str = "mistral/codestral-2501", concurrency: int = 1,
+                 cache_path: Optional[str] = None, cache_max_bytes: int = 256 * 1024 * 1024,
+                 parse_workers: int = 1, prompt_mode: str = "full", batch_tokens: int = 0,
+                 rpm_limit: Optional[int] = None, tpm_limit: Optional[int] = None, max_retries: int = 5,
+                 formatter: Optional[FormatterClient] = None, stream: bool = False,
+                 initial_concurrency: Optional[int] = None):
         self.base_dir = Path(base_dir)
         self.models = []
-        # Get the formatter URL from environment variable or use default
-        self.formatter_url = os.environ.get('NETLOGO_FORMATTER_URL', 'http://localhost:3000/prettify')
-        # Initialize the pseudocode generator
-        self.pseudocode_generator = LLMPseudocodeGenerator(model_name)
-        # Output file path for incremental saves
+        # Maximum number of procedures sent to the LLM at the same time; the scheduler
+        # starts lower (initial_concurrency) and grows towards it while calls are healthy
+        self.concurrency = max(1, concurrency)
+        # Number of processes used to parse files before the LLM stage
+        self.parse_workers = max(1, parse_workers)
+        # Token budget for packing several procedures of a model into one request (0 disables)
+        self.batch_tokens = max(0, batch_tokens)
+        # Guards self.models against concurrent appends and incremental saves
+        self._models_lock = threading.RLock()
+        # Client for the NetLogo formatter service; code is extracted unformatted without one
+        self.formatter = formatter
+        # Initialize the pseudocode generator, with an on-disk response cache if requested
+        cache = PseudocodeCache(cache_path, cache_max_bytes) if cache_path else None
+        # Token counts, throughput and latencies of this run (LLM calls, parsing, checkpoint I/O)
+        self.metrics = MetricsRegistry()
+        # All LLM calls share one scheduler enforcing concurrency, rate limits and retries
+        self.scheduler = AdaptiveScheduler(max_concurrency=self.concurrency, initial_concurrency=initial_concurrency,
+                                           rpm_limit=rpm_limit, tpm_limit=tpm_limit, max_retries=max_retries,
+                                           metrics=self.metrics)
+        self.pseudocode_generator = LLMPseudocodeGenerator(model_name, cache=cache, prompt_mode=prompt_mode,
+                                                           scheduler=self.scheduler, metrics=self.metrics,
+                                                           stream=stream)
+        # Output file path; incremental progress goes to a journal next to it
         self.output_file = None
+        self._journal = None
+        # Set by load_from_json so the existing journal is appended to, not truncated
+        self._resuming = False
+        # Resume index: finished procedures keyed by content hash of their code
+        self._completed_procedures = {}
+        # Duplicates of each unique procedure sent to the LLM, keyed by (modelId, index)
+        self._duplicates = {}
+        # (model_data, index) of procedures whose generation failed, for a later round
+        self._retry_queue = []
+        # Provider batch job the work list goes through first, if set (see utils.batch_api)
+        self.batch_job: Optional[BatchJob] = None
     
     def format_netlogo_code(self, content: str) -> str:
-        """Format NetLogo code using the API formatter."""
-        try:
-            print("  Formatting code using API...")
-            response = requests.post(
-                self.formatter_url,
-                json={
-                    "code": content,
-                    "lineWidth": 80
-                },
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                formatted_code = response.json().get("formatted", content)
-                print("  Formatting complete")
-                return formatted_code
-            else:
-                print(f"  Warning: Formatting API returned status {response.status_code}")
-                return content
-                
-        except Exception as e:
-            print(f"  Warning: Code formatting failed: {str(e)}")
-            return content  # Return original content if formatting fails
+        """Format NetLogo code with the formatter service, if one is configured."""
+        return self.formatter.format(content) if self.formatter else content
     
-    def extract_procedures(self, content: str) -> List[Dict]:
-        """Extract procedures from NetLogo file content."""
-        # Format the code first
-        # DISABLED FOR NOW, MEMORY LEAK INSIDE OF THE API
-        #content = self.format_netlogo_code(content)
-        
-        procedures = []
-        # Split content into lines for easier processing
-        lines = content.split('\n')
-        
-        # Pattern to match procedure start
-        proc_start_pattern = re.compile(r'^(to(?:-report)?)\s+([^\s\[]+)')
-        
-        # Pattern to match comments
-        comment_pattern = re.compile(r'^\s*;(.+)$')
-        
-        i = 0
-        while i < len(lines):
-            # Collect preceding comments
-            preceding_comments = []
-            while i < len(lines) and (comment_match := comment_pattern.match(lines[i])):
-                preceding_comments.append(comment_match.group(1).strip())
-                i += 1
-            
-            # Check if next line is a procedure
-            if i < len(lines) and (proc_match := proc_start_pattern.match(lines[i])):
-                proc_name = proc_match.group(2)
-                
-                # Get the full procedure content
-                proc_lines = []
-                proc_start = i
-                
-                # Find the matching 'end'
-                while i < len(lines):
-                    proc_lines.append(lines[i])
-                    if lines[i].strip() == 'end':
-                        break
-                    i += 1
-                
-                if i < len(lines):  # Only if we found the 'end'
-                    proc_content = '\n'.join(proc_lines)
-                    
-                    # Check for inline comment on procedure definition line
-                    inline_comment = ''
-                    inline_match = re.search(r';(.+)$', lines[proc_start])
-                    if inline_match:
-                        inline_comment = inline_match.group(1).strip()
-                    
-                    # Combine documentation
-                    doc_lines = preceding_comments
-                    if inline_comment:
-                        doc_lines.append(inline_comment)
-                    
-                    # Create the procedure object with numbered original code as a list
-                    numbered_code = self.pseudocode_generator.format_code_with_line_numbers(proc_content.strip())
-                    
-                    procedure = {
-                        "name": proc_name,
-                        "documentation": '\n'.join(doc_lines) if doc_lines else "",
-                        "originalCode": proc_content.strip(),
-                        "numberedOriginalCode": numbered_code,
-                        "pseudoCode": [],
-                        "codeToPseudoCodeMap": [],  # Will store the 1:1 mapping
-                        "summary": "",              # Will store the procedure summary
-                        "variables": []             # Will store the non-primitive variables
-                    }
-                    procedures.append(procedure)
-            
-            i += 1
-        
-        return procedures
+    def extract_procedures(self, code: str) -> List[Dict]:
+        """Extract procedures from the code section of a NetLogo file."""
+        return list(iter_procedures(code, code_only=True))
 
     def generate_pseudocode_for_procedure(self, procedure: Dict) -> Dict:
         """Generate pseudocode for a NetLogo procedure using LLM.
         
-        This is a wrapper around the pseudocode generator's method that handles
-        incremental saving.
+        This is a wrapper around the pseudocode generator's method.
         """
-        # Call the generator to create pseudocode
-        procedure = self.pseudocode_generator.generate_pseudocode(procedure)
+        return self.pseudocode_generator.generate_pseudocode(procedure)
+    
+    def _generate_procedure_at(self, model_data: Dict, index: int) -> None:
+        """Generate pseudocode for procedures[index] in place and checkpoint it.
         
-        # Save incremental progress if output_file is set
-        if self.output_file:
-            self._save_incremental_progress()
+        The result is also fanned out to every duplicate of this procedure found
+        by the deduplication pass.
+        """
+        procedures = model_data['procedures']
+        try:
+            procedures[index] = self.generate_pseudocode_for_procedure(procedures[index])
+        except PseudocodeRetryableError:
+            self._queue_retry([(model_data, index)])
+            return
+        self._finish_procedure(model_data, index)
+    
+    def _generate_batch_at(self, batch: List[Tuple[Dict, int]]) -> None:
+        """Generate pseudocode for several procedures in one LLM request and checkpoint them."""
+        retry_ids = set()
+        try:
+            self.pseudocode_generator.generate_pseudocode_batch(
+                [model_data['procedures'][index] for model_data, index in batch])
+        except PseudocodeRetryableError as e:
+            retry_ids = {id(procedure) for procedure in e.procedures}
         
-        return procedure
+        retry = []
+        for model_data, index in batch:
+            if id(model_data['procedures'][index]) in retry_ids:
+                retry.append((model_data, index))
+            else:
+                self._finish_procedure(model_data, index)
+        self._queue_retry(retry)
     
-    def _save_incremental_progress(self):
-        """Save the current state of models to the output file."""
-        if not self.output_file:
+    def _queue_retry(self, items: List[Tuple[Dict, int]]) -> None:
+        """Queue procedures whose generation failed for another round.
+        
+        They are not checkpointed, so an interrupted run retries them on --resume.
+        """
+        if items:
+            with self._models_lock:
+                self._retry_queue.extend(items)
+    
+    def _finish_procedure(self, model_data: Dict, index: int) -> None:
+        """Checkpoint a generated procedure and fan its result out to its duplicates.
+
+        If the procedure failed, its first duplicate takes over as the group's
+        donor and is queued for a retry round, so the group is not dropped.
+        """
+        procedures = model_data['procedures']
+        self._checkpoint_procedure(model_data, index)
+
+        duplicates = self._duplicates.pop((model_data['modelId'], index), [])
+        if not duplicates:
             return
-            
-        try:
-            print(f"Saving incremental progress to {self.output_file}...")
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "models": self.models,
-                    "totalModels": len(self.models),
-                    "generatedAt": datetime.now().isoformat(),
-                    "_incremental": True
-                }, f, indent=2)
-            print("Incremental save completed")
-        except Exception as e:
-            print(f"Warning: Failed to save incremental progress: {str(e)}")
+        if procedures[index].get('pseudoCode'):
+            for duplicate_model, duplicate_index in duplicates:
+                copy_generated_fields(procedures[index], duplicate_model['procedures'][duplicate_index])
+                self._checkpoint_procedure(duplicate_model, duplicate_index)
+        else:
+            donor_model, donor_index = duplicates[0]
+            if len(duplicates) > 1:
+                self._duplicates[(donor_model['modelId'], donor_index)] = duplicates[1:]
+            self._queue_retry([(donor_model, donor_index)])
+    
+    def _checkpoint_procedure(self, model_data: Dict, index: int) -> None:
+        """Record a finished procedure in the journal if output_file is set."""
+        journal = self._get_journal()
+        if journal:
+            with self.metrics.timer("checkpoint_write"):
+                journal.record_procedure(model_data['modelId'], index, model_data['procedures'][index])
+    
+    def _get_journal(self) -> Optional[CheckpointJournal]:
+        """Return the checkpoint journal for the output file, opening it on first use."""
+        if not self.output_file:
+            return None
+        with self._models_lock:
+            if self._journal is None:
+                journal_path = CheckpointJournal.path_for(self.output_file)
+                print(f"Checkpointing progress to {journal_path}")
+                self._journal = CheckpointJournal(journal_path, resume=self._resuming)
+            return self._journal
     
     @abstractmethod
-    def extract_documentation(self, content: str) -> str:
-        """Extract documentation from model content."""
+    def extract_documentation(self, netlogo_file: NetLogoFile) -> str:
+        """Extract documentation from a parsed model file."""
         pass
 
     @abstractmethod
@@ -174,91 +205,542 @@ class NetLogoModelParser(ABC):
         pass
 
     def find_netlogo_files(self) -> List[Path]:
-        """Recursively find all .nlogo files in the base directory."""
-        netlogo_files = []
-        for path in self.base_dir.rglob('*.nlogo'):
-            netlogo_files.append(path)
-        return netlogo_files
+        """Find all model files of every registered format in the base directory.
+        
+        Files are returned largest first, so the longest ones are scheduled first.
+        """
+        return discover_model_files(self.base_dir)
 
     def process_file(self, file_path: Path) -> Dict:
         """Process a single NetLogo file and return its metadata."""
-        relative_path = file_path.relative_to(self.base_dir)
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        model_data = self._parse_model(file_path)
+        
+        # Generate pseudocode for each procedure
+        print(f"Generating pseudocode for {len(model_data['procedures'])} procedures...")
+        self._generate_work(self._plan_deduplication([model_data]))
+        
+        return model_data
+
+    def _parse_model(self, file_path: Path) -> Dict:
+        """Read a NetLogo file, build its model record and register it in self.models."""
+        return self._register_model(self.parse_model_file(file_path))
 
-        # Generate a unique model ID based on the file path
-        model_id = str(relative_path).replace('/', '_').replace('.nlogo', '')
+    def parse_model_file(self, file_path: Path, code: Optional[str] = None) -> Dict:
+        """Read a NetLogo file and build its model record, without pseudocode.
         
+        This is pure CPU work with no LLM calls or shared state, so it is safe
+        to run in a worker process.
+        
+        Args:
+            file_path: The model file.
+            code: Already formatted code section to use instead of the file's;
+                  without it the file's code goes through format_netlogo_code.
+        """
+        relative_path = file_path.relative_to(self.base_dir)
+
         # Extract title from filename or first line of documentation
         title = file_path.stem.replace('-', ' ')
         
-        model_data = {
-            "modelId": model_id,
-            "title": title,
-            "documentation": self.extract_documentation(content),
-            "sourceLink": self.construct_source_link(relative_path),
-            "license": self.get_license(),
-            "sourceType": self.get_source_type(),
-            "collectedAt": datetime.now().isoformat(),
-            "procedures": self.extract_procedures(content)
-        }
+        # Sections are located in one scan; each one is decoded only when used
+        with open_model_file(file_path) as netlogo_file:
+            model_data = {
+                "modelId": self.model_id_for(file_path),
+                "title": title,
+                "documentation": self.extract_documentation(netlogo_file),
+                "sourceLink": self.construct_source_link(relative_path),
+                "license": self.get_license(),
+                "sourceType": self.get_source_type(),
+                "collectedAt": datetime.now().isoformat(),
+                "procedures": self.extract_procedures(
+                    code if code is not None else self.format_netlogo_code(netlogo_file.code))
+            }
+        return model_data
+
+    def _register_model(self, model_data: Dict) -> Dict:
+        """Add a parsed model to self.models and checkpoint it."""
+        # Fill in procedures already finished by a previous run
+        self._reuse_completed_procedures(model_data)
         
-        # Add the model to the models list first so it's included in incremental saves
-        self.models.append(model_data)
+        # Add the model to the models list first so it's included in the final save
+        with self._models_lock:
+            self.models.append(model_data)
         
-        # Save incremental progress when we've added a new model
-        if self.output_file:
-            self._save_incremental_progress()
-        
-        # Generate pseudocode for each procedure
-        print(f"Generating pseudocode for {len(model_data['procedures'])} procedures...")
-        for i, procedure in enumerate(model_data['procedures']):
-            print(f"  Processing procedure {i+1}/{len(model_data['procedures'])}: {procedure['name']}")
-            model_data['procedures'][i] = self.generate_pseudocode_for_procedure(procedure)
+        # Checkpoint the new model before any of its procedures complete
+        journal = self._get_journal()
+        if journal:
+            with self.metrics.timer("checkpoint_write"):
+                journal.record_model(model_data)
         
         return model_data
 
+    def _plan_deduplication(self, models: List[Dict]) -> List[Tuple[Dict, int]]:
+        """Group pending procedures by fingerprint and pick one to send per group.
+        
+        Procedures whose code is identical up to comments and whitespace share a
+        fingerprint; only the first of each group goes to the LLM, and its result
+        is fanned out to the rest when it completes.
+        
+        Returns:
+            The work list of (model_data, procedure index) pairs to generate.
+        """
+        groups = {}
+        for model_data in models:
+            for i in self._pending_procedure_indices(model_data):
+                fingerprint = procedure_fingerprint(model_data['procedures'][i]['originalCode'])
+                groups.setdefault(fingerprint, []).append((model_data, i))
+        
+        work = []
+        for group in groups.values():
+            donor_model, donor_index = group[0]
+            work.append((donor_model, donor_index))
+            if len(group) > 1:
+                self._duplicates[(donor_model['modelId'], donor_index)] = group[1:]
+        
+        total = sum(len(group) for group in groups.values())
+        if total:
+            print(f"Deduplication: {total} procedures, {len(work)} unique "
+                  f"({(total - len(work)) / total * 100:.1f}% duplicates, {total - len(work)} LLM calls saved)")
+        return work
+
+    def _generate_work(self, work: List[Tuple[Dict, int]]) -> None:
+        """Generate pseudocode for each (model_data, index) in the work list.
+        
+        With concurrency above 1 the calls run on a thread pool. Each task writes
+        its result back into its own procedures[i] slot, so the original procedure
+        order is preserved whatever order the calls finish in. With batch_tokens
+        set, small procedures of the same model share a request. Procedures whose
+        generation fails are queued and retried after the main pass.
+        
+        With batch_job set, the work list goes through the provider batch API
+        first and only the procedures it could not answer are sent one by one.
+        """
+        if self.batch_job and work:
+            work = self._generate_with_batch_job(work)
+        self._run_units(self._plan_requests(work))
+        
+        # Procedures that ran out of retries get a few more rounds, one request each
+        for round_number in range(1, self.RETRY_ROUNDS + 1):
+            if not self._retry_queue:
+                break
+            retry, self._retry_queue = self._retry_queue, []
+            print(f"Retry round {round_number}/{self.RETRY_ROUNDS}: {len(retry)} procedures")
+            self._run_units([[item] for item in retry])
+        
+        if self._retry_queue:
+            print(f"Warning: {len(self._retry_queue)} procedures still failing after {self.RETRY_ROUNDS} retry "
+                  f"rounds; they are left without pseudocode and will be retried on --resume")
+            self._retry_queue = []
+
+    def _generate_with_batch_job(self, work: List[Tuple[Dict, int]]) -> List[Tuple[Dict, int]]:
+        """Run the work list as one provider batch job and checkpoint its results.
+        
+        Returns:
+            The items the batch did not fill in, for the regular request path.
+        """
+        items = {f"{model_data['modelId']}::{index}": (model_data, index) for model_data, index in work}
+        done = self.batch_job.run({custom_id: model_data['procedures'][index]
+                                   for custom_id, (model_data, index) in items.items()})
+        for custom_id in done:
+            self._finish_procedure(*items[custom_id])
+        return [item for custom_id, item in items.items() if custom_id not in done]
+
+    def _run_units(self, units: List[List[Tuple[Dict, int]]]) -> None:
+        """Run a list of LLM requests, each a list of (model_data, index) items."""
+        total = len(units)
+        
+        def generate_unit(n: int, unit: List[Tuple[Dict, int]]) -> None:
+            model_data = unit[0][0]
+            names = ', '.join(model_data['procedures'][i]['name'] for _, i in unit)
+            print(f"  Processing request {n}/{total} ({model_data['modelId']}): {names}")
+            if len(unit) == 1:
+                self._generate_procedure_at(model_data, unit[0][1])
+            else:
+                self._generate_batch_at(unit)
+        
+        if self.concurrency > 1:
+            print(f"Dispatching {total} requests with concurrency {self.concurrency}")
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = [executor.submit(generate_unit, n, unit) for n, unit in enumerate(units, 1)]
+                self._wait_for_procedures(futures)
+        else:
+            for n, unit in enumerate(units, 1):
+                try:
+                    generate_unit(n, unit)
+                except Exception as e:
+                    print(f"Error generating pseudocode: {str(e)}")
+
+    def _plan_requests(self, work: List[Tuple[Dict, int]]) -> List[List[Tuple[Dict, int]]]:
+        """Group the work list into LLM requests.
+        
+        Without batching every procedure is its own request. Otherwise each model's
+        procedures are packed into batches of up to batch_tokens code tokens.
+        """
+        if not self.batch_tokens:
+            return [[item] for item in work]
+        
+        by_model = {}
+        for model_data, i in work:
+            by_model.setdefault(id(model_data), []).append((model_data, i))
+        
+        units = []
+        for items in by_model.values():
+            procedures = [model_data['procedures'][i] for model_data, i in items]
+            for batch in self.pseudocode_generator.plan_batches(procedures, self.batch_tokens):
+                units.append([items[k] for k in batch])
+        print(f"Batching: {len(work)} procedures packed into {len(units)} requests")
+        return units
+
+    def _pending_procedure_indices(self, model_data: Dict) -> List[int]:
+        """Return the indices of procedures that still need pseudocode."""
+        return [i for i, procedure in enumerate(model_data['procedures']) if not procedure.get('pseudoCode')]
+
+    def model_id_for(self, file_path: Path) -> str:
+        """Generate a unique model ID based on the file path."""
+        relative_path = file_path.relative_to(self.base_dir)
+        return strip_model_extension(str(relative_path)).replace('/', '_')
+
+    @staticmethod
+    def is_model_complete(model_data: Dict) -> bool:
+        """Return True if every procedure of the model has pseudocode."""
+        return all(procedure.get('pseudoCode') for procedure in model_data.get('procedures', []))
+
+    def _build_resume_index(self, reuse_models: Optional[List[Dict]] = None) -> set:
+        """Index the models loaded for resume.
+        
+        Records finished procedures by content hash so re-parsed models can reuse
+        them, and returns the IDs of models that need no further work.
+        
+        Args:
+            reuse_models: Models outside self.models whose finished procedures may
+                          also be reused, e.g. old versions of changed files.
+        """
+        completed_model_ids = set()
+        self._completed_procedures = {}
+        for model in self.models:
+            if self.is_model_complete(model):
+                completed_model_ids.add(model['modelId'])
+        for model in self.models + (reuse_models or []):
+            for procedure in model.get('procedures', []):
+                if procedure.get('pseudoCode'):
+                    self._completed_procedures[content_hash(procedure['originalCode'])] = procedure
+        return completed_model_ids
+
+    def _reuse_completed_procedures(self, model_data: Dict) -> None:
+        """Copy results of previously finished procedures with identical code."""
+        if not self._completed_procedures:
+            return
+        for procedure in model_data['procedures']:
+            done = self._completed_procedures.get(content_hash(procedure['originalCode']))
+            if done:
+                for key in ('pseudoCode', 'codeToPseudoCodeMap', 'summary', 'variables'):
+                    procedure[key] = done[key]
+
+    def _files_to_process(self, netlogo_files: List[Path]) -> List[Path]:
+        """Drop files whose models are already complete, so they are not re-parsed."""
+        if not self.models:
+            return netlogo_files
+        
+        completed_model_ids = self._build_resume_index()
+        pending_files = [path for path in netlogo_files if self.model_id_for(path) not in completed_model_ids]
+        print(f"Resuming: skipping {len(netlogo_files) - len(pending_files)} completed models, "
+              f"{len(self._completed_procedures)} finished procedures available for reuse")
+        return pending_files
+
+    def _wait_for_procedures(self, futures: List[Future]) -> None:
+        """Wait for queued procedure tasks, reporting any that raised."""
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error generating pseudocode: {str(e)}")
+
     def process_all_files(self) -> List[Dict]:
-        """Process all NetLogo files in the directory."""
+        """Process all NetLogo files in the directory.
+        
+        All files are parsed first so that duplicate procedures across models can
+        be found before any LLM calls are made.
+        """
         netlogo_files = self.find_netlogo_files()
+        print(f"Found {len(netlogo_files)} NetLogo files")
+        netlogo_files = self._files_to_process(netlogo_files)
+        print(f"{len(netlogo_files)} NetLogo files to process")
+        
+        with self.metrics.timer("parse_stage"):
+            parsed_models = self.parse_files(netlogo_files)
+        return self.process_models(parsed_models)
+
+    def parse_files(self, netlogo_files: List[Path]) -> List[Dict]:
+        """Parse stage: build model records with procedures but no pseudocode.
+        
+        With parse_workers above 1 the files are spread over a process pool.
+        Needs no API key. Files that fail to parse are reported and skipped.
+        
+        Returns:
+            The parsed model records, in the order of netlogo_files.
+        """
         total_files = len(netlogo_files)
-        print(f"Found {total_files} NetLogo files to process")
+        codes = self._format_code_sections(netlogo_files) if self.formatter else [None] * total_files
+        if self.parse_workers > 1 and total_files > 1:
+            print(f"Parsing {total_files} files with {self.parse_workers} worker processes...")
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+                results = list(executor.map(
+                    _parse_in_worker,
+                    [type(self)] * total_files,
+                    [str(self.base_dir)] * total_files,
+                    netlogo_files,
+                    codes,
+                    chunksize=max(1, total_files // (self.parse_workers * 4))
+                ))
+        else:
+            results = []
+            for i, (file_path, code) in enumerate(zip(netlogo_files, codes), 1):
+                print(f"Parsing file {i}/{total_files}: {file_path}")
+                try:
+                    results.append((self.parse_model_file(file_path, code), None))
+                except Exception as e:
+                    results.append((None, str(e)))
         
-        for i, file_path in enumerate(netlogo_files, 1):
+        parsed_models = []
+        for file_path, (model_data, error) in zip(netlogo_files, results):
+            if error is not None:
+                print(f"Error processing {file_path}: {error}")
+            else:
+                parsed_models.append(model_data)
+        print(f"Parsed {len(parsed_models)} models with "
+              f"{sum(len(model['procedures']) for model in parsed_models)} procedures")
+        return parsed_models
+
+    def _format_code_sections(self, netlogo_files: List[Path]) -> List[Optional[str]]:
+        """Format the code sections of all files through the formatter's worker pool.
+        
+        Returns:
+            The formatted code of each file, or None for files that cannot be read.
+        """
+        codes = []
+        for file_path in netlogo_files:
             try:
-                print(f"\nProcessing file {i}/{total_files}: {file_path}")
-                model_data = self.process_file(file_path)
-                # Note: model is already added to self.models in process_file
-                print(f"Successfully processed {file_path}")
-                
-            except Exception as e:
-                print(f"Error processing {file_path}: {str(e)}")
-                # Save progress even if we encounter an error
-                if self.output_file:
-                    self._save_incremental_progress()
+                with open_model_file(file_path) as netlogo_file:
+                    codes.append(netlogo_file.code)
+            except Exception:
+                # Left to the parse stage, which reports the error
+                codes.append(None)
+        
+        readable = [code for code in codes if code is not None]
+        print(f"Formatting {len(readable)} files with {self.formatter.workers} formatter workers...")
+        with self.metrics.timer("format_stage"):
+            formatted = iter(self.formatter.format_many(readable))
+        return [next(formatted) if code is not None else None for code in codes]
+
+    def process_models(self, parsed_models: List[Dict], reuse_models: Optional[List[Dict]] = None) -> List[Dict]:
+        """LLM stage: register parsed model records and generate their pseudocode.
+        
+        Models already completed in self.models (e.g. after load_from_json) are
+        skipped; partially processed ones are replaced by the new record, reusing
+        their finished procedures by content hash. Finished procedures of
+        reuse_models are reused the same way.
+        """
+        completed_model_ids = self._build_resume_index(reuse_models)
+        pending_models = [model for model in parsed_models if model['modelId'] not in completed_model_ids]
+        pending_ids = {model['modelId'] for model in pending_models}
+        with self._models_lock:
+            self.models = [model for model in self.models if model['modelId'] not in pending_ids]
         
+        for model_data in pending_models:
+            self._register_model(model_data)
+        
+        self._generate_work(self._plan_deduplication(pending_models))
+        
+        # Make sure all progress is on disk before the final save
+        if self._journal:
+            with self.metrics.timer("checkpoint_sync"):
+                self._journal.sync()
+        
+        return self.models
+
+    def regenerate_flagged(self, work_list: List[Dict]) -> List[Dict]:
+        """Regenerate only the procedures of a quality work list, in place.
+
+        self.models must hold the stored dataset (see load_from_json) and work_list
+        must come from utils.quality.quality_work_list or load_work_list. Each
+        flagged procedure has its generated fields and its cached response
+        dropped and is sent to the LLM again; everything else is left untouched,
+        so a repair costs one request per defective procedure.
+
+        Returns:
+            The work list for the regenerated procedures that are still flagged.
+        """
+        models_by_id = {model['modelId']: model for model in self.models}
+        work = []
+        for entry in work_list:
+            model_data = models_by_id.get(entry['modelId'])
+            procedures = model_data['procedures'] if model_data else []
+            index = entry['index']
+            if index >= len(procedures) or procedures[index]['name'] != entry['name']:
+                print(f"Skipping '{entry['name']}' of {entry['modelId']}: not in the dataset any more")
+                continue
+            self.pseudocode_generator.invalidate(procedures[index])
+            work.append((model_data, index))
+
+        print(f"Regenerating {len(work)} flagged procedures in {len({id(m) for m, _ in work})} models")
+        self._generate_work(work)
+        if self._journal:
+            with self.metrics.timer("checkpoint_sync"):
+                self._journal.sync()
+
+        regenerated = {(model_data['modelId'], index) for model_data, index in work}
+        return [entry for entry in quality_work_list(self.models)
+                if (entry['modelId'], entry['index']) in regenerated]
+
+    def generator_info(self) -> Dict[str, str]:
+        """Identify the LLM and prompt that produce the pseudocode, for the build manifest."""
+        return {
+            "model": self.pseudocode_generator.model_name,
+            "promptVersion": self.pseudocode_generator.prompt_version,
+        }
+
+    def process_incremental(self, manifest: BuildManifest) -> List[Dict]:
+        """Rebuild only what changed since the build recorded in manifest.
+        
+        self.models must hold the previous build's output (see load_from_json).
+        Models of unchanged files are kept as they are. Changed and added files
+        are re-parsed, and only their new or changed procedures go to the LLM;
+        identical procedures reuse the previous results. Models of deleted files
+        are dropped. If the generator model or prompt version differs from the
+        manifest's, nothing is reused and everything is regenerated.
+        
+        The manifest is updated in place; save it after the output is saved.
+        """
+        generator = self.generator_info()
+        reuse_previous = True
+        if manifest.generator and manifest.generator != generator:
+            print(f"Generator changed from {manifest.generator} to {generator}: regenerating all models")
+            manifest.files = {}
+            reuse_previous = False
+        
+        netlogo_files = self.find_netlogo_files()
+        tree_diff = manifest.diff(netlogo_files, self.base_dir)
+        print(f"Incremental rebuild: {tree_diff} files")
+        
+        models_by_id = {model['modelId']: model for model in self.models} if reuse_previous else {}
+        keep_ids = set()
+        rebuild_files = tree_diff.changed + tree_diff.added
+        for path in tree_diff.unchanged:
+            model = models_by_id.get(self.model_id_for(path))
+            if model is not None and self.is_model_complete(model):
+                keep_ids.add(model['modelId'])
+            else:
+                # Missing from the output or unfinished: build it again
+                rebuild_files.append(path)
+        
+        # Old versions of rebuilt models stay available for reuse; deleted ones are dropped
+        previous_models = [model for model in models_by_id.values() if model['modelId'] not in keep_ids]
+        with self._models_lock:
+            self.models = [model for model in self.models if model['modelId'] in keep_ids]
+        
+        with self.metrics.timer("parse_stage"):
+            parsed_models = self.parse_files(rebuild_files)
+        self._report_procedure_changes(manifest, rebuild_files, parsed_models)
+        self.process_models(parsed_models, reuse_models=previous_models)
+        
+        manifest.generator = generator
+        manifest.forget(tree_diff.deleted)
+        current_by_id = {model['modelId']: model for model in self.models}
+        for path in rebuild_files:
+            model = current_by_id.get(self.model_id_for(path))
+            if model is not None and self.is_model_complete(model):
+                manifest.record_file(path, self.base_dir, model)
+        # Touched but identical files keep their models; store their new stat so the next run skips hashing them
+        for path in tree_diff.touched:
+            model = current_by_id.get(self.model_id_for(path))
+            if model is not None and model['modelId'] in keep_ids:
+                manifest.record_file(path, self.base_dir, model)
         return self.models
 
+    def _report_procedure_changes(self, manifest: BuildManifest, rebuild_files: List[Path],
+                                  parsed_models: List[Dict]) -> None:
+        """Print how many procedures of the re-parsed files are unchanged, new or removed."""
+        old_hashes = {}
+        for path in rebuild_files:
+            entry = manifest.files.get(path.relative_to(self.base_dir).as_posix())
+            if entry:
+                old_hashes[entry['modelId']] = entry['procedures']
+        unchanged = new = removed = 0
+        for model in parsed_models:
+            old = set(old_hashes.get(model['modelId'], []))
+            current = {content_hash(procedure['originalCode']) for procedure in model['procedures']}
+            unchanged += len(current & old)
+            new += len(current - old)
+            removed += len(old - current)
+        print(f"Procedures in rebuilt files: {unchanged} unchanged, {new} new or changed, {removed} removed")
+
+    @staticmethod
+    def save_parsed_models(output_file: str, parsed_models: List[Dict]) -> None:
+        """Write parse-stage model records to a JSONL file, one model per line."""
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for model_data in parsed_models:
+                f.write(json.dumps(model_data) + '\n')
+
+    @staticmethod
+    def load_parsed_models(input_file: str) -> List[Dict]:
+        """Read parse-stage model records written by save_parsed_models."""
+        with open(input_file, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
     def save_to_json(self, output_file: str):
-        """Save the processed models to a JSON file.
-        Also sets this as the output file for incremental saves."""
+        """Save the processed models to a JSON file, or to a SQLite model store
+        if the path ends in .sqlite or .db.
+        Also sets this as the output file for incremental saves.
+        
+        This is the single full write of a run: once the models are safely on disk
+        the checkpoint journal is compacted away."""
         self.output_file = output_file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "models": self.models,
-                "totalModels": len(self.models),
-                "generatedAt": datetime.now().isoformat()
-            }, f, indent=2)
+        with self._models_lock, self.metrics.timer("save_output"):
+            if storage.is_store_path(output_file):
+                storage.save_models(output_file, self.models, {
+                    "totalModels": len(self.models),
+                    "generatedAt": datetime.now().isoformat()
+                })
+            else:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        "models": self.models,
+                        "totalModels": len(self.models),
+                        "generatedAt": datetime.now().isoformat()
+                    }, f, indent=2)
+        
+        journal_path = CheckpointJournal.path_for(output_file)
+        if self._journal:
+            self._journal.close(remove=True)
+            self._journal = None
+        elif journal_path.exists():
+            journal_path.unlink()
+        # Anything processed after this point starts a fresh journal
+        self._resuming = False
 
     def load_from_json(self, input_file: str):
-        """Load previously processed models from a JSON file.
-        This allows resuming processing from a previous incremental save."""
+        """Load previously processed models from a JSON file or SQLite model store.
+        This allows resuming processing from a previous run. If a checkpoint
+        journal from an interrupted run exists, it is replayed on top."""
         try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.models = data.get("models", [])
+            if os.path.exists(input_file):
+                if storage.is_store_path(input_file):
+                    self.models, _ = storage.load_models(input_file)
+                else:
+                    with open(input_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                        self.models = data.get("models", [])
                 print(f"Loaded {len(self.models)} models from {input_file}")
-                return True
+            
+            journal_path = CheckpointJournal.path_for(input_file)
+            if journal_path.exists():
+                self.models = CheckpointJournal.replay(journal_path, self.models)
+                print(f"Replayed checkpoint journal {journal_path}: {len(self.models)} models")
+            elif not os.path.exists(input_file):
+                raise FileNotFoundError(input_file)
+            
+            self._resuming = True
+            return True
         except Exception as e:
             print(f"Error loading from {input_file}: {str(e)}")
-            return False
\ No newline at end of file
+            return False
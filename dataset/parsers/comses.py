@@ -4,11 +4,12 @@ from pathlib import Path
 from typing import Dict, List
 
 from .base_parser import NetLogoModelParser
+from .netlogo_file import NetLogoFile
 
 class CoMSESParser(NetLogoModelParser):
     """Parser for CoMSES Computational Models Library."""
 
-    def extract_documentation(self, content: str) -> str:
+    def extract_documentation(self, netlogo_file: NetLogoFile) -> str:
         """Extract documentation from CoMSES format."""
         # Implementation specific to CoMSES format
         # This is a placeholder - implement based on actual format
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from .netlogo_file import NetLogoFile
+
+# Directory names never descended into while discovering model files
+PRUNED_DIRECTORIES = {'__pycache__', 'node_modules'}
+
+
+class ModelFormat:
+    """A NetLogo model file format known to the discovery layer.
+
+    Attributes:
+        extension: File extension including the dot, e.g. ".nlogo3d".
+        opener: Callable taking a path and returning a section reader with the
+                NetLogoFile interface (code, info, section(), close(), context manager).
+    """
+
+    def __init__(self, extension: str, opener: Callable[[Union[str, Path]], NetLogoFile]):
+        self.extension = extension.lower()
+        self.opener = opener
+
+
+# Registered formats by lowercase extension
+FORMATS: Dict[str, ModelFormat] = {}
+
+
+def register_format(extension: str, opener: Callable[[Union[str, Path]], NetLogoFile]) -> None:
+    """Register (or replace) the section parser used for files with the given extension.
+
+    Formats with a different layout, such as the XML-based .nlogox, can be
+    supported by registering an opener that exposes the same sections.
+    """
+    model_format = ModelFormat(extension, opener)
+    FORMATS[model_format.extension] = model_format
+
+
+# .nlogo and .nlogo3d share the @#$#@#$#@ separated section layout
+register_format('.nlogo', NetLogoFile)
+register_format('.nlogo3d', NetLogoFile)
+
+
+def format_for(path: Union[str, Path]) -> Optional[ModelFormat]:
+    """Return the registered format of a file, or None if its extension is unknown."""
+    return FORMATS.get(os.path.splitext(str(path))[1].lower())
+
+
+def open_model_file(path: Union[str, Path]) -> NetLogoFile:
+    """Open a model file with the section parser registered for its extension.
+
+    Raises:
+        ValueError: The file's extension is not registered.
+    """
+    model_format = format_for(path)
+    if model_format is None:
+        raise ValueError(f"No model format registered for {path}")
+    return model_format.opener(path)
+
+
+def strip_model_extension(name: str) -> str:
+    """Remove a registered model extension from the end of a file name or path."""
+    stem, extension = os.path.splitext(name)
+    return stem if extension.lower() in FORMATS else name
+
+
+def discover_model_files(base_dir: Union[str, Path], extensions: Optional[List[str]] = None) -> List[Path]:
+    """Find all model files under base_dir in a single walk.
+
+    The tree is walked with os.scandir, so files are matched by name without a
+    stat call, and hidden directories plus PRUNED_DIRECTORIES are skipped
+    entirely. Only matched files are stat-ed, for their size.
+
+    Args:
+        base_dir: Root directory to search.
+        extensions: Extensions to include (default: all registered formats).
+
+    Returns:
+        Paths sorted by size, largest first, with ties broken by path, so the
+        order is deterministic and the longest files can be scheduled first.
+    """
+    wanted = {extension.lower() for extension in (extensions or FORMATS)}
+    found = []
+    pending = [str(base_dir)]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith('.') and entry.name not in PRUNED_DIRECTORIES:
+                        pending.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in wanted and entry.is_file():
+                    found.append((entry.stat().st_size, entry.path))
+    found.sort(key=lambda item: (-item[0], item[1]))
+    return [Path(path) for _, path in found]
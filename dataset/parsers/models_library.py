@@ -1,20 +1,17 @@
 #!/usr/bin/env python3
 
-import re
 from pathlib import Path
 from typing import Dict, List
 
 from .base_parser import NetLogoModelParser
+from .netlogo_file import NetLogoFile
 
 class ModelsLibraryParser(NetLogoModelParser):
     """Parser for the official NetLogo Models Library."""
 
-    def extract_documentation(self, content: str) -> str:
-        """Extract documentation from NetLogo file content."""
-        doc_match = re.search(r'@#\s*(.*?)\s*#@', content, re.DOTALL)
-        if doc_match:
-            return doc_match.group(1).strip()
-        return ""
+    def extract_documentation(self, netlogo_file: NetLogoFile) -> str:
+        """Extract documentation from the info tab of a NetLogo file."""
+        return netlogo_file.info.strip()
 
     def construct_source_link(self, relative_path: Path) -> str:
         """Construct CCL source link for Models Library."""
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import mmap
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# Separator line between the sections of a .nlogo / .nlogo3d file
+SECTION_SEPARATOR = b'@#$#@#$#@'
+
+# Section order as written by NetLogo
+SECTION_NAMES = (
+    "code",
+    "interface",
+    "info",
+    "turtle_shapes",
+    "version",
+    "preview_commands",
+    "system_dynamics",
+    "behaviorspace",
+    "hubnet_client",
+    "link_shapes",
+    "model_settings",
+    "delta_tick",
+)
+
+
+class NetLogoFile:
+    """A .nlogo / .nlogo3d file split into its sections.
+
+    The file is memory-mapped and scanned once for section separators. Sections
+    are exposed lazily: section_bytes returns a zero-copy memoryview into the
+    mapping, and section decodes (and caches) the text on first access.
+
+    Use as a context manager, or call close() when done, to release the mapping.
+    Views returned by section_bytes must not be kept past close().
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Map the file at path and locate its sections.
+
+        Args:
+            path: Path to a NetLogo model file.
+        """
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mmap = None
+        if self.path.stat().st_size > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._mmap
+        else:
+            data = b''
+        self._buffer = memoryview(data)
+        self._offsets = self._find_sections(data)
+        self._decoded: Dict[str, str] = {}
+
+    @classmethod
+    def from_text(cls, content: str) -> 'NetLogoFile':
+        """Build a NetLogoFile from in-memory content instead of a path."""
+        instance = cls.__new__(cls)
+        instance.path = None
+        instance._file = None
+        instance._mmap = None
+        data = content.encode('utf-8')
+        instance._buffer = memoryview(data)
+        instance._offsets = cls._find_sections(data)
+        instance._decoded = {}
+        return instance
+
+    @staticmethod
+    def _find_sections(data: Union[bytes, mmap.mmap]) -> List[Tuple[int, int]]:
+        """Return (start, end) byte offsets of every section in a single scan.
+
+        Offsets exclude the separator lines themselves and the line break that
+        follows each separator.
+        """
+        offsets = []
+        start = 0
+        length = len(data)
+        while True:
+            separator = data.find(SECTION_SEPARATOR, start)
+            if separator < 0:
+                offsets.append((start, length))
+                return offsets
+            offsets.append((start, separator))
+            start = separator + len(SECTION_SEPARATOR)
+            # Skip the line break after the separator
+            if data[start:start + 2] == b'\r\n':
+                start += 2
+            elif data[start:start + 1] == b'\n':
+                start += 1
+
+    @property
+    def section_count(self) -> int:
+        return len(self._offsets)
+
+    def section_bytes(self, name: str) -> memoryview:
+        """Return a zero-copy view of a section's raw bytes.
+
+        Args:
+            name: One of SECTION_NAMES.
+
+        Returns:
+            A memoryview of the section, empty if the file does not have it.
+        """
+        index = SECTION_NAMES.index(name)
+        if index >= len(self._offsets):
+            return memoryview(b'')
+        start, end = self._offsets[index]
+        return self._buffer[start:end]
+
+    def section(self, name: str) -> str:
+        """Return a section decoded as text, decoding it on first access."""
+        if name not in self._decoded:
+            self._decoded[name] = str(self.section_bytes(name), 'utf-8')
+        return self._decoded[name]
+
+    @property
+    def code(self) -> str:
+        """The NetLogo code (procedures tab)."""
+        return self.section("code")
+
+    @property
+    def info(self) -> str:
+        """The Markdown info tab."""
+        return self.section("info")
+
+    @property
+    def version(self) -> Optional[str]:
+        """The NetLogo version string the model was saved with."""
+        return self.section("version").strip() or None
+
+    def close(self) -> None:
+        """Release the memory mapping and file handle."""
+        self._buffer.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'NetLogoFile':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import re
+from typing import Dict, Iterator, List
+
+from utils.netlogo_code import format_code_with_line_numbers, strip_line_comment
+
+# Separator between the sections of a .nlogo file; the code section comes first
+SECTION_SEPARATOR = '@#$#@#$#@'
+
+# Pattern to match procedure start: `to name` or `to-report name`, any case
+PROC_START_PATTERN = re.compile(r'^\s*(to(?:-report)?)\s+([^\s\[;]+)', re.IGNORECASE)
+
+# Pattern to match a whole-line comment, capturing the text after the semicolons
+COMMENT_LINE_PATTERN = re.compile(r'^\s*;+(.*)$')
+
+
+def code_section(content: str) -> str:
+    """Return the code section of a .nlogo file, i.e. everything before the
+    first section separator. Content without a separator is returned as-is."""
+    end = content.find(SECTION_SEPARATOR)
+    return content if end < 0 else content[:end]
+
+
+def _ends_procedure(code: str) -> bool:
+    """Return True if a comment-free line closes a procedure with `end`.
+
+    Handles both a bare `end` line and a body that ends on the same line,
+    e.g. `ask turtles [ die ] end`.
+    """
+    tokens = code.split()
+    return bool(tokens) and tokens[-1].lower() == 'end'
+
+
+def _build_procedure(name: str, lines: List[str], doc_lines: List[str]) -> Dict:
+    """Create the procedure object with numbered original code as a list."""
+    proc_content = '\n'.join(lines).strip()
+    return {
+        "name": name,
+        "documentation": '\n'.join(doc_lines),
+        "originalCode": proc_content,
+        "numberedOriginalCode": format_code_with_line_numbers(proc_content),
+        "pseudoCode": [],
+        "codeToPseudoCodeMap": [],  # Will store the 1:1 mapping
+        "summary": "",              # Will store the procedure summary
+        "variables": []             # Will store the non-primitive variables
+    }
+
+
+def iter_procedures(content: str, code_only: bool = False) -> Iterator[Dict]:
+    """Extract procedures from NetLogo file content in a single pass.
+
+    Only the code section is scanned. Comment lines directly above a procedure
+    and a comment on its `to`/`to-report` line become its documentation. A
+    procedure is closed by the first line whose code (ignoring any trailing
+    comment) ends with `end`; a procedure left open at the end of the code
+    section is dropped.
+
+    Args:
+        content: Full .nlogo file content, or just its code section.
+        code_only: Set when content is already the code section, to skip
+                   looking for the section separator.
+
+    Yields:
+        Procedure dicts with empty pseudocode fields, in file order.
+    """
+    preceding_comments = []
+    proc_name = None
+    proc_lines = []
+    doc_lines = []
+
+    code = content if code_only else code_section(content)
+    for line in code.split('\n'):
+        if proc_name is not None:
+            # Inside a procedure: collect lines until the matching `end`
+            proc_lines.append(line)
+            if _ends_procedure(strip_line_comment(line)):
+                yield _build_procedure(proc_name, proc_lines, doc_lines)
+                proc_name = None
+            continue
+
+        proc_match = PROC_START_PATTERN.match(line)
+        if proc_match:
+            code = strip_line_comment(line)
+            inline_comment = line[len(code):].lstrip(';').strip()
+
+            proc_name = proc_match.group(2)
+            proc_lines = [line]
+            doc_lines = preceding_comments + ([inline_comment] if inline_comment else [])
+            preceding_comments = []
+
+            # One-line procedures such as `to startup setup end`
+            if len(code.split()) > 2 and _ends_procedure(code):
+                yield _build_procedure(proc_name, proc_lines, doc_lines)
+                proc_name = None
+            continue
+
+        comment_match = COMMENT_LINE_PATTERN.match(line)
+        if comment_match:
+            comment_text = comment_match.group(1).strip()
+            if comment_text:
+                preceding_comments.append(comment_text)
+        else:
+            # Documentation comments must sit directly above the procedure
+            preceding_comments = []
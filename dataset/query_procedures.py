@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+Build and query the procedure index over the parser output.
+
+Examples:
+    python3 dataset/query_procedures.py build --input dataset/netlogo_models.json
+    python3 dataset/query_procedures.py search --primitive hatch --variable energy
+    python3 dataset/query_procedures.py search --name "setup*" --source-type "Models Library" --limit 20
+    python3 dataset/query_procedures.py stats
+"""
+
+import argparse
+import json
+
+from utils.json_stream import iter_models
+from utils.procedure_index import ProcedureIndex
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query the procedure index')
+    parser.add_argument('--index', default='dataset/procedure_index.sqlite',
+                        help='Path to the index database (default: dataset/procedure_index.sqlite)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    build = subparsers.add_parser('build', help='Index new and changed models of a models file')
+    build.add_argument('--input', default='dataset/netlogo_models.json',
+                       help='Models JSON, JSONL or .sqlite/.db store (default: dataset/netlogo_models.json)')
+    build.add_argument('--prune', action='store_true',
+                       help='Also drop indexed models that are no longer in the input')
+    
+    search = subparsers.add_parser('search', help='Find procedures matching all given criteria')
+    search.add_argument('--name', help='Procedure name, case-insensitive; end with * for a prefix match')
+    search.add_argument('--variable', action='append', default=[], help='Variable the procedure uses (repeatable)')
+    search.add_argument('--primitive', action='append', default=[], help='Primitive the procedure uses (repeatable)')
+    search.add_argument('--text', help='Words that must all appear in the summary')
+    search.add_argument('--model', help='modelId or part of it')
+    search.add_argument('--source-type', help='Source type, e.g. "Models Library"')
+    search.add_argument('--limit', type=int, help='Maximum number of results')
+    search.add_argument('--json', action='store_true', help='Print results as JSON lines')
+    
+    subparsers.add_parser('stats', help='Show index statistics')
+    args = parser.parse_args()
+    
+    index = ProcedureIndex(args.index)
+    try:
+        if args.command == 'build':
+            models = iter_models(args.input)
+            counts = index.sync(models) if args.prune else index.update(models)
+            print(f"Indexed {counts['indexed']} models, {counts['unchanged']} unchanged"
+                  + (f", {counts['removed']} removed" if args.prune else ""))
+        elif args.command == 'search':
+            results = index.search(name=args.name, variables=args.variable, primitives=args.primitive,
+                                   text=args.text, model=args.model, source_type=args.source_type, limit=args.limit)
+            for result in results:
+                if args.json:
+                    print(json.dumps(result))
+                else:
+                    print(f"{result['modelId']} #{result['index']} {result['name']}: {result['summary'][:80]}")
+            if not args.json:
+                print(f"{len(results)} procedures found")
+        else:
+            for key, value in index.stats().items():
+                print(f"{key}: {value}")
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    main()
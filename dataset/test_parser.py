@@ -7,13 +7,18 @@ Test script for demonstrating the refactored NetLogo parser with LLM pseudocode
 import os
 import sys
 import json
+import contextlib
 from pathlib import Path
 from parsers.models_library import ModelsLibraryParser
+from utils.mock_llm import mock_completion
 
 def main():
     """Main entry point for the test script."""
-    # Get the base directory from command line or use the current directory
-    base_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    # Get the base directory from command line or use the current directory;
+    # --mock-llm answers with a local stand-in instead of calling the API
+    use_mock = '--mock-llm' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--mock-llm']
+    base_dir = args[0] if args else "."
     
     # Create a parser instance
     parser = ModelsLibraryParser(base_dir)
@@ -28,7 +33,8 @@ def main():
         print(f"\nProcessing {first_file}...")
         
         # Process the file
-        model_data = parser.process_file(first_file)
+        with mock_completion() if use_mock else contextlib.nullcontext():
+            model_data = parser.process_file(first_file)
         
         # Save the result to a JSON file
         output_file = "test_output.json"
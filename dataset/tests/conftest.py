@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# Modules import each other as top-level packages (utils, parsers), as in the scripts
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Use litellm's bundled model cost map instead of fetching it on import
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
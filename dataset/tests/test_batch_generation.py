@@ -0,0 +1,65 @@
+import json
+
+from utils.llm_pseudocode_generator import LLMPseudocodeGenerator
+from utils.mock_llm import MockCompletion, mock_completion
+from utils.pseudocode_cache import PseudocodeCache
+
+
+def make_procedures():
+    return [
+        {"name": "setup", "originalCode": "to setup\n  clear-all\n  reset-ticks\nend"},
+        {"name": "go", "originalCode": "to go\n  ask turtles [ fd 1 ]\n  tick\nend"},
+    ]
+
+
+def test_batched_results_are_not_served_to_single_requests(tmp_path):
+    generator = LLMPseudocodeGenerator(cache=PseudocodeCache(str(tmp_path / "cache.sqlite")))
+    with mock_completion() as mock:
+        generator.generate_pseudocode_batch(make_procedures())
+        assert mock.stats()["calls"] == 1
+
+        procedure = make_procedures()[0]
+        generator.generate_pseudocode(procedure)
+        assert mock.stats()["calls"] == 2
+        assert procedure["pseudoCode"]
+
+        # Both kinds of response are cached, each under its own prompt
+        generator.generate_pseudocode_batch(make_procedures())
+        generator.generate_pseudocode(make_procedures()[0])
+        assert mock.stats()["calls"] == 2
+
+
+def test_batches_reuse_single_procedure_results(tmp_path):
+    generator = LLMPseudocodeGenerator(cache=PseudocodeCache(str(tmp_path / "cache.sqlite")))
+    with mock_completion() as mock:
+        generator.generate_pseudocode(make_procedures()[0])
+        # "setup" is answered from the cache, so "go" is left alone and goes out on its own
+        procedures = generator.generate_pseudocode_batch(make_procedures())
+
+    assert mock.stats()["calls"] == 2
+    assert all(procedure["pseudoCode"] for procedure in procedures)
+    # One lookup per procedure, whichever prompts it accepts
+    assert generator.metrics.get("cache_hits") == 1
+    assert generator.metrics.get("cache_misses") == 2
+
+
+def test_batch_usage_counts_only_applied_procedures():
+    class TruncateSecond(MockCompletion):
+        """Answers batches with no lines for the second procedure."""
+
+        def __call__(self, *args, **kwargs):
+            response = super().__call__(*args, **kwargs)
+            data = json.loads(response.choices[0].message.content)
+            if "procedures" in data:
+                data["procedures"]["go"]["lines"] = []
+                response.choices[0].message.content = json.dumps(data)
+            return response
+
+    generator = LLMPseudocodeGenerator()
+    with mock_completion(TruncateSecond()) as mock:
+        procedures = generator.generate_pseudocode_batch(make_procedures())
+
+    assert mock.stats()["calls"] == 2
+    assert all(procedure["pseudoCode"] for procedure in procedures)
+    # One procedure from the batched response, one from its own request
+    assert generator.metrics.get("procedures") == 2
@@ -0,0 +1,29 @@
+import os
+
+from parsers import ModelsLibraryParser
+from utils.build_manifest import BuildManifest
+from utils.mock_llm import MockCompletion, mock_completion
+
+MODEL = "to go\n  ask turtles [ fd 1 ]\n  tick\nend\n@#$#@#$#@\n@#$#@#$#@\n## WHAT IS IT?\n\nA test model.\n"
+
+
+def test_touched_identical_file_gets_its_stat_refreshed(tmp_path):
+    path = tmp_path / "Test.nlogo"
+    path.write_text(MODEL)
+    parser = ModelsLibraryParser(str(tmp_path))
+    manifest = BuildManifest()
+    with mock_completion(MockCompletion()):
+        parser.process_incremental(manifest)
+    assert parser.models and parser.is_model_complete(parser.models[0])
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manifest.diff([path], tmp_path).touched == [path]
+
+    with mock_completion(MockCompletion()) as mock:
+        parser.process_incremental(manifest)
+    assert mock.stats()["calls"] == 0
+    assert manifest.files["Test.nlogo"]["mtimeNs"] == path.stat().st_mtime_ns
+    # The next run matches on size and mtime alone, without hashing the file again
+    tree_diff = manifest.diff([path], tmp_path)
+    assert tree_diff.unchanged == [path] and tree_diff.touched == []
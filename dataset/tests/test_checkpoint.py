@@ -0,0 +1,62 @@
+import json
+
+from parsers import ModelsLibraryParser
+from utils import checkpoint
+from utils.checkpoint import CheckpointJournal
+
+
+def make_model(model_id, done=False):
+    procedure = {"name": "go", "originalCode": "to go\n  tick\nend"}
+    if done:
+        procedure.update({"pseudoCode": ["1 | define go"], "codeToPseudoCodeMap": [], "summary": "Ticks.",
+                          "variables": []})
+    return {"modelId": model_id, "procedures": [procedure]}
+
+
+def generated(name):
+    return {"name": name, "originalCode": "to go\n  tick\nend", "pseudoCode": ["1 | define go"],
+            "codeToPseudoCodeMap": [], "summary": "Ticks.", "variables": []}
+
+
+def test_replay_ignores_a_torn_final_line(tmp_path):
+    path = tmp_path / "out.journal.jsonl"
+    journal = CheckpointJournal(str(path))
+    journal.record_model(make_model("a"))
+    journal.record_procedure("a", 0, generated("go"))
+    journal.close()
+    # A crash in the middle of writing the next record
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"type": "procedure", "modelId": "a", "index": 0, "procedure": {}})[:30])
+
+    models = CheckpointJournal.replay(str(path))
+    assert models == [{"modelId": "a", "procedures": [generated("go")]}]
+
+
+def test_records_are_fsynced_in_batches(tmp_path, monkeypatch):
+    fsyncs = []
+    monkeypatch.setattr(checkpoint.os, "fsync", lambda fd: fsyncs.append(fd))
+    journal = CheckpointJournal(str(tmp_path / "out.journal.jsonl"), fsync_every=3)
+    for n in range(7):
+        journal.record_model(make_model(f"m{n}"))
+    assert len(fsyncs) == 2
+    journal.close()
+    assert len(fsyncs) == 3
+    # Every record was flushed, synced or not
+    assert len(CheckpointJournal.replay(str(tmp_path / "out.journal.jsonl"))) == 7
+
+
+def test_resume_applies_the_journal_on_top_of_the_output(tmp_path):
+    output = tmp_path / "out.json"
+    output.write_text(json.dumps({"models": [make_model("a", done=True), make_model("b")]}), encoding='utf-8')
+    journal = CheckpointJournal(str(CheckpointJournal.path_for(str(output))), resume=True)
+    journal.record_procedure("b", 0, generated("go"))
+    journal.record_model(make_model("c"))
+    journal.close()
+
+    parser = ModelsLibraryParser(str(tmp_path))
+    assert parser.load_from_json(str(output))
+    assert [model["modelId"] for model in parser.models] == ["a", "b", "c"]
+    assert parser.models[1]["procedures"][0] == generated("go")
+    assert not parser.models[2]["procedures"][0].get("pseudoCode")
+    # Only the models left unfinished go to the LLM again
+    assert parser._build_resume_index() == {"a", "b"}
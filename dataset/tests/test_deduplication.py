@@ -0,0 +1,30 @@
+from parsers import ModelsLibraryParser
+
+CODE = "to go\n  ask turtles [ fd 1 ]\nend"
+
+
+def make_model(model_id):
+    return {"modelId": model_id, "procedures": [{"name": "go", "originalCode": CODE}]}
+
+
+def test_duplicates_of_a_failed_donor_are_generated(tmp_path):
+    parser = ModelsLibraryParser(str(tmp_path))
+    calls = []
+
+    def generate(procedure):
+        calls.append(procedure)
+        failed = len(calls) == 1
+        procedure.update({
+            "pseudoCode": [] if failed else ["move every turtle forward"],
+            "codeToPseudoCodeMap": [],
+            "summary": "" if failed else "Moves turtles.",
+            "variables": [],
+        })
+        return procedure
+
+    parser.pseudocode_generator.generate_pseudocode = generate
+    models = parser.process_models([make_model("a"), make_model("b"), make_model("c")])
+
+    assert len(calls) == 2
+    assert [model["procedures"][0]["pseudoCode"] for model in models] == \
+        [[], ["move every turtle forward"], ["move every turtle forward"]]
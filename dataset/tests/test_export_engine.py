@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from utils.export_engine import EMITTERS, Emitter, SHARD_CHUNK_MODELS, SummaryEmitter, run_export_parallel
+
+
+class FailingEmitter(Emitter):
+    """Raises on the first procedure it gets."""
+
+    name = "failing"
+
+    def pairs(self, procedure):
+        raise ValueError("cannot build a pair")
+
+
+class FailingOpenEmitter(Emitter):
+    """Raises before writing anything."""
+
+    name = "failing-open"
+
+    def pairs(self, procedure):
+        return iter(())
+
+    def open(self):
+        raise OSError("disk full")
+
+
+class ExitingEmitter(Emitter):
+    """Kills its worker process without a result, like a crash."""
+
+    name = "exiting"
+
+    def pairs(self, procedure):
+        os._exit(3)
+
+
+def write_models(path, count):
+    models = [{
+        "modelId": f"model-{n}",
+        "procedures": [{"name": "go", "originalCode": "to go\n  tick\nend", "summary": "Advance the clock.",
+                        "variables": [], "pseudoCode": ["advance the clock"], "codeToPseudoCodeMap": []}],
+    } for n in range(count)]
+    path.write_text(json.dumps({"models": models}), encoding='utf-8')
+
+
+@pytest.mark.parametrize("emitter_class, message", [
+    (FailingEmitter, "ValueError: cannot build a pair"),
+    (FailingOpenEmitter, "OSError: disk full"),
+    (ExitingEmitter, "exited with code 3"),
+])
+def test_failing_worker_raises_instead_of_hanging(tmp_path, monkeypatch, emitter_class, message):
+    monkeypatch.setitem(EMITTERS, emitter_class.name, emitter_class)
+    input_file = tmp_path / "models.json"
+    # Enough chunks to fill a dead worker's queue
+    write_models(input_file, SHARD_CHUNK_MODELS * 20)
+
+    emitters = [SummaryEmitter(str(tmp_path / "summary.jsonl")), emitter_class(str(tmp_path / "out.jsonl"))]
+    with pytest.raises(RuntimeError, match=message):
+        run_export_parallel(str(input_file), emitters, workers=2)
+
+
+def test_parallel_export_counts_pairs(tmp_path):
+    input_file = tmp_path / "models.json"
+    write_models(input_file, SHARD_CHUNK_MODELS * 3)
+
+    emitter = SummaryEmitter(str(tmp_path / "summary.jsonl"))
+    assert run_export_parallel(str(input_file), [emitter], workers=2) == SHARD_CHUNK_MODELS * 3
+    assert emitter.train_count == SHARD_CHUNK_MODELS * 3
+    assert len((tmp_path / "summary.jsonl").read_text().splitlines()) == SHARD_CHUNK_MODELS * 3
@@ -0,0 +1,41 @@
+import json
+
+from utils.llm_pseudocode_generator import LLMPseudocodeGenerator, PseudocodeMapping
+from utils.netlogo_code import format_code_with_line_numbers, index_numbered_lines, strip_netlogo_comments
+from utils.quality import check_procedure
+from utils.stream_parser import ResponseDriftError, StreamingResponseParser
+
+
+def test_semicolons_in_strings_are_not_comments():
+    code = 'to greet\n  print "a;b" ; says a;b\n  ; only a comment\n  print "\\"quoted\\";" ;; done\nend'
+    assert strip_netlogo_comments(code) == 'to greet\n  print "a;b" \n  print "\\"quoted\\";" \nend'
+
+
+def coverage_verdicts(line_numbers):
+    """Whether the batch, stream and quality checks accept pseudocode for line_numbers."""
+    code = "to go\n\n  tick ; next\nend"
+    numbered = format_code_with_line_numbers(code)
+    originals = index_numbered_lines(numbered) + ["end"]
+    lines = [{"line": n, "orig": originals[n], "psuedo": "step"} for n in line_numbers]
+
+    batch = LLMPseudocodeGenerator._covers_all_lines({"originalCode": code}, lines)
+    parser = StreamingResponseParser(numbered, echo=True)
+    try:
+        parser.feed(json.dumps({"lines": lines, "summary": "s", "variables": []}))
+        parser.finish(PseudocodeMapping)
+        stream = True
+    except ResponseDriftError:
+        stream = False
+    quality = not check_procedure({
+        "originalCode": code, "pseudoCode": ["step"], "summary": "s", "variables": [],
+        "codeToPseudoCodeMap": [{"lineNumber": n} for n in line_numbers],
+    })["issues"]
+    return batch, stream, quality
+
+
+def test_coverage_checks_share_one_rule():
+    assert coverage_verdicts([1, 3, 4]) == (True, True, True)
+    # Blank lines may have pseudocode
+    assert coverage_verdicts([1, 2, 3, 4]) == (True, True, True)
+    assert coverage_verdicts([1, 4]) == (False, False, False)
+    assert coverage_verdicts([1, 3, 4, 5]) == (False, False, False)
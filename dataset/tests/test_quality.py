@@ -0,0 +1,35 @@
+from utils.llm_pseudocode_generator import LLMPseudocodeGenerator
+from utils.netlogo_code import format_code_with_line_numbers
+from utils.quality import check_procedure
+
+CODE = "to go\n  ask turtles [ fd 1 ]\n\n  tick\nend"
+
+
+def generated_procedure(lines, generator=None):
+    """A procedure whose generated fields come from a response with the given {line: pseudocode}."""
+    generator = generator or LLMPseudocodeGenerator()
+    procedure = {"name": "go", "originalCode": CODE,
+                 "numberedOriginalCode": format_code_with_line_numbers(CODE)}
+    generator._apply_pseudocode(procedure, [{"line": n, "psuedo": text} for n, text in lines.items()],
+                                "Moves turtles and advances the clock.", ["turtles"])
+    return procedure
+
+
+def test_blank_line_with_pseudocode_passes():
+    generator = LLMPseudocodeGenerator()
+    procedure = generated_procedure({1: "define go", 2: "move turtles", 3: "", 4: "advance the clock", 5: "end"},
+                                    generator)
+    # The checker accepts exactly what the generator accepts
+    assert generator.metrics.get("mapping_mismatches") == 0
+    assert check_procedure(procedure) == {"score": 1.0, "issues": []}
+
+
+def test_defects_are_reported():
+    procedure = generated_procedure({1: "define go", 2: "move turtles", 5: "end"})
+    procedure["summary"] = ""
+    procedure["variables"] = ["energy"]
+    procedure["codeToPseudoCodeMap"].append({"lineNumber": 9, "originalCode": "", "pseudoCode": "extra"})
+
+    result = check_procedure(procedure)
+    assert result["issues"] == ["missing-lines:4", "unknown-lines:9", "empty-summary", "unknown-variables:energy"]
+    assert result["score"] < 0.5
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from parsers import ModelsLibraryParser
+from utils.checkpoint import CheckpointJournal
+from utils.mock_llm import MockCompletion, mock_completion
+
+CODE = "to go\n  ask turtles [ fd 1 ]\n  tick\nend"
+
+
+class InvalidFirst(MockCompletion):
+    """Answers the first `invalid` calls with text that is not JSON, then correctly."""
+
+    def __init__(self, invalid: int):
+        super().__init__()
+        self.invalid = invalid
+
+    def __call__(self, *args, **kwargs):
+        response = super().__call__(*args, **kwargs)
+        if self.calls <= self.invalid:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Sorry, I can't"))],
+                                   usage=response.usage)
+        return response
+
+
+def make_model():
+    return {"modelId": "a", "procedures": [{"name": "go", "originalCode": CODE}]}
+
+
+def test_invalid_response_is_retried_not_stored_empty(tmp_path):
+    parser = ModelsLibraryParser(str(tmp_path))
+    model = make_model()
+    with mock_completion(InvalidFirst(1)) as mock:
+        parser.process_models([model])
+    assert mock.stats()["calls"] == 2
+    assert model["procedures"][0]["pseudoCode"]
+
+
+def test_procedure_failing_every_round_stays_pending(tmp_path):
+    parser = ModelsLibraryParser(str(tmp_path))
+    parser.output_file = str(tmp_path / "out.json")
+    model = make_model()
+    with mock_completion(InvalidFirst(100)) as mock:
+        parser.process_models([model])
+    parser._journal.close()
+
+    assert mock.stats()["calls"] == 1 + parser.RETRY_ROUNDS
+    assert "pseudoCode" not in model["procedures"][0]
+    # Not journaled as finished, so --resume generates it again
+    replayed = CheckpointJournal.replay(str(CheckpointJournal.path_for(parser.output_file)))
+    assert not replayed[0]["procedures"][0].get("pseudoCode")
@@ -0,0 +1,25 @@
+import litellm
+
+from utils.llm_scheduler import AdaptiveScheduler
+
+
+def test_concurrency_grows_from_the_initial_limit_to_the_cap():
+    scheduler = AdaptiveScheduler(max_concurrency=8)
+    assert scheduler.concurrency_limit == 2
+    for _ in range(100):
+        scheduler.run(lambda: "ok")
+    assert scheduler.concurrency_limit == 8
+
+
+def test_rate_limit_halves_the_limit():
+    scheduler = AdaptiveScheduler(max_concurrency=8, initial_concurrency=8, base_delay=0, max_delay=0)
+    errors = [litellm.RateLimitError("slow down", llm_provider="mock", model="mock")]
+
+    def call():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    assert scheduler.run(call) == "ok"
+    assert scheduler.concurrency_limit == 4
+    assert scheduler.metrics.get("llm_rate_limit_errors") == 1
@@ -0,0 +1,60 @@
+import copy
+import sqlite3
+
+from utils import storage
+from utils.netlogo_code import format_code_with_line_numbers
+
+CODE = "to go\n  ask turtles [ fd 1 ]\n  tick\nend"
+
+
+def derived_procedure():
+    """A procedure whose numbered views are exactly what the store derives from its code."""
+    lines = CODE.split('\n')
+    line_map = [{"lineNumber": n, "originalCode": lines[n - 1], "pseudoCode": f"step {n}"} for n in range(1, 5)]
+    return {
+        "name": "go",
+        "documentation": "",
+        "originalCode": CODE,
+        "numberedOriginalCode": format_code_with_line_numbers(CODE),
+        "pseudoCode": storage.numbered_pseudocode(len(lines), line_map),
+        "codeToPseudoCodeMap": line_map,
+        "summary": "Moves turtles.",
+        "variables": ["turtles"],
+    }
+
+
+def edited_procedure():
+    """A procedure whose stored views differ from the derived ones and must survive as they are."""
+    procedure = derived_procedure()
+    procedure["name"] = "go-edited"
+    procedure["pseudoCode"] = ["moved turtles by hand"]
+    procedure["numberedOriginalCode"] = ["1 | to go"]
+    procedure["codeToPseudoCodeMap"][1]["originalCode"] = "ask turtles [ fd 2 ]"
+    procedure["reviewed"] = True
+    return procedure
+
+
+MODELS = [
+    {"modelId": "a", "title": "A", "procedures": [derived_procedure(), edited_procedure()]},
+    {"modelId": "b", "title": "B", "procedures": []},
+]
+
+
+def test_store_round_trip_is_lossless(tmp_path):
+    path = str(tmp_path / "models.sqlite")
+    storage.save_models(path, copy.deepcopy(MODELS), {"generatedAt": "now"})
+
+    assert list(storage.iter_models(path)) == MODELS
+    assert storage.load_models(path) == (MODELS, {"generatedAt": "now"})
+    assert storage.load_model(path, "a") == MODELS[0]
+    assert storage.load_model(path, "missing") is None
+
+
+def test_derived_views_are_rebuilt_on_read(tmp_path):
+    path = str(tmp_path / "models.sqlite")
+    storage.save_models(path, copy.deepcopy(MODELS))
+
+    conn = sqlite3.connect(path)
+    rows = dict(conn.execute("SELECT name, pseudo_code IS NULL AND numbered_code IS NULL FROM procedures"))
+    conn.close()
+    assert rows == {"go": 1, "go-edited": 0}
@@ -0,0 +1,36 @@
+import pytest
+
+from parsers import ModelsLibraryParser
+from utils.llm_pseudocode_generator import DRIFT_RETRIES, LLMPseudocodeGenerator, PseudocodeRetryableError
+from utils.mock_llm import MockCompletion, mock_completion
+
+CODE = "to go\n  ask turtles [ fd 1 ]\n  ask patches [ set pcolor red ]\n  tick\nend"
+
+
+class DriftFirst(MockCompletion):
+    """Drifts on the first `drifting` calls, then answers correctly."""
+
+    def __init__(self, drifting: int):
+        super().__init__()
+        self.drifting = drifting
+
+    def __call__(self, *args, **kwargs):
+        self.drift_rate = 1.0 if self.calls < self.drifting else 0.0
+        return super().__call__(*args, **kwargs)
+
+
+def test_persistent_drift_is_retryable():
+    generator = LLMPseudocodeGenerator(stream=True)
+    procedure = {"name": "go", "originalCode": CODE}
+    with mock_completion(drift_rate=1.0), pytest.raises(PseudocodeRetryableError):
+        generator.generate_pseudocode(procedure)
+    assert "pseudoCode" not in procedure
+
+
+def test_drifted_procedure_is_regenerated_in_a_retry_round(tmp_path):
+    parser = ModelsLibraryParser(str(tmp_path), stream=True)
+    model = {"modelId": "a", "procedures": [{"name": "go", "originalCode": CODE}]}
+    with mock_completion(DriftFirst(DRIFT_RETRIES + 1)) as mock:
+        parser.process_models([model])
+    assert mock.stats()["calls"] == DRIFT_RETRIES + 2
+    assert model["procedures"][0]["pseudoCode"]
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Set, Tuple
+
+import litellm
+
+from .hashing import content_hash
+from .llm_pseudocode_generator import LLMPseudocodeGenerator
+
+# Batch job states; any other state reported by a backend means the job is still running
+COMPLETED = "completed"
+FAILED_STATES = ("failed", "expired", "cancelled")
+
+
+class BatchBackend(ABC):
+    """Submits provider batch-input JSONL files and fetches their results."""
+
+    @abstractmethod
+    def submit(self, input_path: Path) -> str:
+        """Upload a batch-input file and start a job, returning its id."""
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        """Return the job's state, e.g. "in_progress", "completed" or "failed"."""
+
+    @abstractmethod
+    def download(self, job_id: str, output_path: Path) -> None:
+        """Write the output JSONL of a completed job to output_path."""
+
+
+class LiteLLMBatchBackend(BatchBackend):
+    """Batch API of a provider supported by LiteLLM's files and batches API (e.g. mistral, openai)."""
+
+    def __init__(self, provider: str = "mistral"):
+        self.provider = provider
+
+    def submit(self, input_path: Path) -> str:
+        with open(input_path, 'rb') as f:
+            input_file = litellm.create_file(file=f, purpose="batch", custom_llm_provider=self.provider)
+        batch = litellm.create_batch(
+            completion_window="24h",
+            endpoint="/v1/chat/completions",
+            input_file_id=input_file.id,
+            custom_llm_provider=self.provider
+        )
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        return litellm.retrieve_batch(batch_id=job_id, custom_llm_provider=self.provider).status
+
+    def download(self, job_id: str, output_path: Path) -> None:
+        batch = litellm.retrieve_batch(batch_id=job_id, custom_llm_provider=self.provider)
+        content = litellm.file_content(file_id=batch.output_file_id, custom_llm_provider=self.provider)
+        output_path.write_bytes(content.content)
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based stand-in for a provider batch API, for tests and dry runs.
+
+    Each job is a directory under job_dir holding a copy of the input. The job
+    stays "in_progress" for polls_until_done polls, then every request is
+    answered with completion (by default a MockCompletion) and the job turns
+    "completed". Requests whose call raises get an error line, like failed
+    requests in a provider's output file.
+    """
+
+    def __init__(self, job_dir: str, completion: Optional[Callable] = None, polls_until_done: int = 1):
+        if completion is None:
+            from .mock_llm import MockCompletion
+            completion = MockCompletion()
+        self.job_dir = Path(job_dir)
+        self.completion = completion
+        self.polls_until_done = polls_until_done
+        self._polls = {}
+
+    def submit(self, input_path: Path) -> str:
+        job_id = f"local-{uuid.uuid4().hex[:12]}"
+        job_path = self.job_dir / job_id
+        job_path.mkdir(parents=True)
+        (job_path / "input.jsonl").write_bytes(Path(input_path).read_bytes())
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        job_path = self.job_dir / job_id
+        if (job_path / "output.jsonl").exists():
+            return COMPLETED
+        if not (job_path / "input.jsonl").exists():
+            return "failed"
+        self._polls[job_id] = self._polls.get(job_id, 0) + 1
+        if self._polls[job_id] < self.polls_until_done:
+            return "in_progress"
+        self._run(job_path)
+        return COMPLETED
+
+    def _run(self, job_path: Path) -> None:
+        """Answer every request of a job and write its output file."""
+        with open(job_path / "input.jsonl", 'r', encoding='utf-8') as f_in, \
+                open(job_path / "output.part", 'w', encoding='utf-8') as f_out:
+            for line in f_in:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                body = request["body"]
+                result = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                          "response": None, "error": None}
+                try:
+                    response = self.completion(model=body["model"], messages=body["messages"],
+                                               response_format=body.get("response_format"))
+                    usage = response.usage
+                    result["response"] = {"status_code": 200, "body": {
+                        "choices": [{"index": 0, "message": {
+                            "role": "assistant", "content": response.choices[0].message.content}}],
+                        "usage": {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens,
+                                  "total_tokens": usage.total_tokens},
+                    }}
+                except Exception as e:
+                    result["error"] = {"code": type(e).__name__, "message": str(e)}
+                f_out.write(json.dumps(result) + '\n')
+        (job_path / "output.part").rename(job_path / "output.jsonl")
+
+    def download(self, job_id: str, output_path: Path) -> None:
+        output_path.write_bytes((self.job_dir / job_id / "output.jsonl").read_bytes())
+
+
+class BatchJob:
+    """One bulk pseudocode run through a provider batch API.
+
+    run() goes through three steps, keeping its files in work_dir:
+      1. serialize the prompts of all pending procedures to batch-input JSONL,
+         keyed by procedure id,
+      2. submit the file and poll the job until it finishes,
+      3. merge the output back into the procedures by id.
+
+    The job id is saved in work_dir as soon as the job is submitted. If the run
+    is interrupted while polling, the next run with the same requests picks the
+    job up again instead of paying for a second one.
+    """
+
+    def __init__(self, backend: BatchBackend, generator: LLMPseudocodeGenerator, work_dir: str,
+                 poll_interval: float = 60.0):
+        self.backend = backend
+        self.generator = generator
+        self.work_dir = Path(work_dir)
+        self.poll_interval = poll_interval
+        self.input_path = self.work_dir / "batch_input.jsonl"
+        self.output_path = self.work_dir / "batch_output.jsonl"
+        self.state_path = self.work_dir / "batch_state.json"
+
+    def run(self, procedures: Dict[str, Dict]) -> Set[str]:
+        """Generate pseudocode for procedures, keyed by procedure id, in one batch job.
+
+        Procedures found in the generator's cache are filled in without being sent.
+
+        Returns:
+            The ids of the procedures that were filled in. The others failed in the
+            batch and are left unchanged, for the regular per-request path.
+        """
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        done, requests = self.write_input(procedures)
+        if not requests:
+            return done
+        job_id = self.submit()
+        if not self.wait(job_id):
+            return done
+        self.backend.download(job_id, self.output_path)
+        done |= self.merge(procedures)
+        self.state_path.unlink()
+        print(f"Batch job {job_id}: {len(procedures) - len(done)} procedures left for single requests")
+        return done
+
+    def write_input(self, procedures: Dict[str, Dict]) -> Tuple[Set[str], int]:
+        """Step 1: write batch_input.jsonl.
+
+        Returns:
+            (ids answered from the cache, number of requests written)
+        """
+        cached = set()
+        requests = 0
+        with open(self.input_path, 'w', encoding='utf-8') as f:
+            for custom_id, procedure in procedures.items():
+                request = self.generator.batch_request(procedure, custom_id)
+                if request is None:
+                    cached.add(custom_id)
+                else:
+                    f.write(json.dumps(request) + '\n')
+                    requests += 1
+        print(f"Batch input: {requests} requests written to {self.input_path}, {len(cached)} answered from cache")
+        return cached, requests
+
+    def submit(self) -> str:
+        """Step 2a: submit the input, or reattach to the job already running for the same input."""
+        input_hash = content_hash(self.input_path.read_text(encoding='utf-8'))
+        if self.state_path.exists():
+            state = json.loads(self.state_path.read_text(encoding='utf-8'))
+            if state.get("inputHash") == input_hash:
+                print(f"Resuming batch job {state['jobId']}")
+                return state["jobId"]
+        job_id = self.backend.submit(self.input_path)
+        self.state_path.write_text(json.dumps({"jobId": job_id, "inputHash": input_hash}), encoding='utf-8')
+        print(f"Submitted batch job {job_id}")
+        return job_id
+
+    def wait(self, job_id: str) -> bool:
+        """Step 2b: poll the job until it finishes. Returns True if it completed."""
+        while True:
+            status = self.backend.status(job_id)
+            if status == COMPLETED:
+                return True
+            if status in FAILED_STATES:
+                print(f"Batch job {job_id} ended as {status}")
+                self.state_path.unlink()
+                return False
+            print(f"Batch job {job_id} is {status}, checking again in {self.poll_interval:g}s")
+            time.sleep(self.poll_interval)
+
+    def merge(self, procedures: Dict[str, Dict]) -> Set[str]:
+        """Step 3: apply the downloaded output to the procedures by id."""
+        done = set()
+        for result in self._read_output():
+            procedure = procedures.get(result.get("custom_id"))
+            if procedure is not None and self.generator.apply_batch_result(procedure, result):
+                done.add(result["custom_id"])
+        print(f"Batch output: merged {len(done)} procedures")
+        return done
+
+    def _read_output(self) -> Iterator[Dict]:
+        with open(self.output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .hashing import content_hash
+
+# Bumped when the manifest layout changes; older manifests are ignored
+MANIFEST_VERSION = 1
+
+
+def file_hash(path: Path) -> str:
+    """Return the sha256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TreeDiff:
+    """Result of comparing a source tree with a build manifest.
+
+    Attributes:
+        unchanged: Files whose content is the same as in the manifest.
+        touched: The unchanged files whose size or mtime differ from the manifest,
+            found unchanged by hash; their manifest entries need a new stat.
+        changed: Files whose content differs from the manifest.
+        added: Files not in the manifest.
+        deleted: Relative paths in the manifest that no longer exist.
+    """
+
+    def __init__(self):
+        self.unchanged: List[Path] = []
+        self.touched: List[Path] = []
+        self.changed: List[Path] = []
+        self.added: List[Path] = []
+        self.deleted: List[str] = []
+
+    def __str__(self) -> str:
+        return (f"{len(self.unchanged)} unchanged, {len(self.changed)} changed, "
+                f"{len(self.added)} added, {len(self.deleted)} deleted")
+
+
+class BuildManifest:
+    """Record of what a build was made from, used to rebuild only what changed.
+
+    For every source file it keeps the modelId, size, mtime, a content hash and
+    the content hash of each procedure, along with the generator model and
+    prompt version. Results are only reusable when the generator matches.
+    """
+
+    def __init__(self, generator: Optional[Dict] = None, files: Optional[Dict[str, Dict]] = None):
+        self.generator = generator or {}
+        self.files = files or {}
+
+    @staticmethod
+    def path_for(output_file: str) -> Path:
+        """Return the manifest path used alongside the given output file."""
+        return Path(output_file).with_suffix('.build-manifest.json')
+
+    @classmethod
+    def load(cls, path: Path) -> 'BuildManifest':
+        """Load a manifest, or return an empty one if it is missing or outdated."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            print(f"Ignoring build manifest {path} with unsupported version {data.get('version')}")
+            return cls()
+        return cls(data.get("generator"), data.get("files"))
+
+    def save(self, path: Path) -> None:
+        """Write the manifest atomically."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "generator": self.generator, "files": self.files}, f, indent=2)
+        os.replace(temp_path, path)
+
+    def diff(self, files: List[Path], base_dir: Path) -> TreeDiff:
+        """Compare files under base_dir with the manifest.
+
+        Size and mtime are checked first; files whose stat changed are hashed,
+        so a touched but identical file still counts as unchanged (and is
+        listed in touched).
+        """
+        result = TreeDiff()
+        seen = set()
+        for path in files:
+            key = path.relative_to(base_dir).as_posix()
+            seen.add(key)
+            entry = self.files.get(key)
+            if entry is None:
+                result.added.append(path)
+                continue
+            stat = path.stat()
+            if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtimeNs"]:
+                result.unchanged.append(path)
+            elif file_hash(path) == entry["hash"]:
+                result.unchanged.append(path)
+                result.touched.append(path)
+            else:
+                result.changed.append(path)
+        result.deleted = sorted(key for key in self.files if key not in seen)
+        return result
+
+    def record_file(self, path: Path, base_dir: Path, model_data: Dict) -> None:
+        """Store the current state of a source file and the procedures of its model."""
+        stat = path.stat()
+        self.files[path.relative_to(base_dir).as_posix()] = {
+            "modelId": model_data["modelId"],
+            "size": stat.st_size,
+            "mtimeNs": stat.st_mtime_ns,
+            "hash": file_hash(path),
+            "procedures": [content_hash(procedure["originalCode"]) for procedure in model_data.get("procedures", [])],
+        }
+
+    def forget(self, relative_paths: List[str]) -> None:
+        """Drop files from the manifest."""
+        for key in relative_paths:
+            self.files.pop(key, None)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class CheckpointJournal:
+    """Append-only JSONL journal of parser progress.
+
+    Every completed model or procedure is appended as a single JSON record, so the
+    cost of a checkpoint depends only on the size of that record and not on how much
+    of the dataset has been processed so far. Records are flushed immediately and
+    fsynced in batches. The journal can be replayed to rebuild the models list after
+    a crash, and is compacted into the final JSON file once at the end of a run.
+
+    Record formats:
+        {"type": "model", "model": {...}}
+        {"type": "procedure", "modelId": "...", "index": 3, "procedure": {...}}
+    """
+
+    def __init__(self, path: str, resume: bool = False, fsync_every: int = 25):
+        """Open the journal for appending.
+
+        Args:
+            path: Path to the JSONL journal file.
+            resume: Keep existing records instead of truncating the journal.
+            fsync_every: Number of records written between fsync calls.
+        """
+        self.path = Path(path)
+        self.fsync_every = max(1, fsync_every)
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+    @staticmethod
+    def path_for(output_file: str) -> Path:
+        """Return the journal path used alongside the given output file."""
+        return Path(output_file).with_suffix('.journal.jsonl')
+
+    def record_model(self, model_data: Dict) -> None:
+        """Append a newly parsed model, including its procedures."""
+        self._append({"type": "model", "model": model_data})
+
+    def record_procedure(self, model_id: str, index: int, procedure: Dict) -> None:
+        """Append a procedure whose pseudocode generation has finished."""
+        self._append({
+            "type": "procedure",
+            "modelId": model_id,
+            "index": index,
+            "procedure": procedure
+        })
+
+    def _append(self, record: Dict) -> None:
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    def sync(self) -> None:
+        """Force all pending records to disk."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self, remove: bool = False) -> None:
+        """Sync and close the journal, optionally deleting it afterwards."""
+        self.sync()
+        with self._lock:
+            self._file.close()
+        if remove and self.path.exists():
+            self.path.unlink()
+
+    @staticmethod
+    def replay(path: str, models: Optional[List[Dict]] = None) -> List[Dict]:
+        """Rebuild a models list from a journal.
+
+        Args:
+            path: Path to the JSONL journal file.
+            models: Optional list of already loaded models to apply the journal on top of.
+                    Models recorded in the journal replace entries with the same modelId.
+
+        Returns:
+            The list of models with all journaled procedures applied.
+        """
+        models = list(models or [])
+        index_by_id = {model["modelId"]: i for i, model in enumerate(models)}
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; everything before it is intact
+                    continue
+
+                if record.get("type") == "model":
+                    model = record["model"]
+                    if model["modelId"] in index_by_id:
+                        models[index_by_id[model["modelId"]]] = model
+                    else:
+                        index_by_id[model["modelId"]] = len(models)
+                        models.append(model)
+                elif record.get("type") == "procedure":
+                    position = index_by_id.get(record["modelId"])
+                    if position is None:
+                        continue
+                    procedures = models[position]["procedures"]
+                    if 0 <= record["index"] < len(procedures):
+                        procedures[record["index"]] = record["procedure"]
+
+        return models
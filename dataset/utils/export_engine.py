@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+
+import json
+import multiprocessing
+import queue as queue_module
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .hashing import content_hash
+from .json_stream import iter_models
+from .netlogo_code import (clean_comment_text, clean_summary, strip_line_numbers_and_comments_from_pseudocode,
+                           strip_netlogo_comments)
+
+
+def _variables_tag(procedure: Dict[str, Any]) -> str:
+    """Format variables as XML-style tag for better recognition by the model."""
+    if procedure['variables']:
+        return f"<variables>{', '.join(procedure['variables'])}</variables>"
+    return ""
+
+
+def _messages(prompt: str, code: str) -> Dict[str, Any]:
+    """Create messages array with user input (prompt) and assistant output (code)."""
+    return {
+        "messages": [
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": f"```netlogo\n{code}\n```"}
+        ]
+    }
+
+
+def build_summary_pair(procedure: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Create a summary-to-code training pair from a procedure.
+
+    Args:
+        procedure: Dictionary containing procedure data
+
+    Returns:
+        Dictionary formatted for fine-tuning with messages, or None if the
+        procedure has no usable code or summary
+    """
+    if not all(key in procedure for key in ['originalCode', 'summary', 'variables']):
+        return None
+
+    clean_code = strip_netlogo_comments(procedure['originalCode'])
+    if not clean_code.strip():
+        return None
+
+    clean_summary_text = clean_summary(procedure['summary'])
+    if not clean_summary_text.strip():
+        return None
+
+    return _messages(
+        f"Generate NetLogo code that implements the following summary:\n\n{clean_summary_text}\n\n"
+        f"{_variables_tag(procedure)}",
+        clean_code)
+
+
+def build_pseudocode_pair(procedure: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Create a pseudocode-to-code training pair from a procedure.
+
+    Args:
+        procedure: Dictionary containing procedure data
+
+    Returns:
+        Dictionary formatted for fine-tuning with messages, or None if the
+        procedure has no usable code or pseudocode
+    """
+    if not all(key in procedure for key in ['originalCode', 'pseudoCode', 'variables']):
+        return None
+    if not procedure['pseudoCode']:
+        return None
+
+    clean_code = strip_netlogo_comments(procedure['originalCode'])
+    if not clean_code.strip():
+        return None
+
+    pseudocode_text = strip_line_numbers_and_comments_from_pseudocode(procedure['pseudoCode'])
+    if not pseudocode_text.strip():
+        return None
+
+    return _messages(
+        f"Generate NetLogo code based on the following pseudocode:\n\n{pseudocode_text}\n\n"
+        f"{_variables_tag(procedure)}",
+        clean_code)
+
+
+def build_line_pairs(procedure: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Create one pseudocode-to-code training pair per mapped line of a procedure.
+
+    Lines that are empty or comment-only on either side are skipped.
+
+    Args:
+        procedure: Dictionary containing procedure data
+
+    Yields:
+        Dictionaries formatted for fine-tuning with messages
+    """
+    for entry in procedure.get('codeToPseudoCodeMap') or []:
+        code = strip_netlogo_comments(entry.get('originalCode', '')).strip()
+        pseudocode = clean_comment_text(entry.get('pseudoCode', '')).strip()
+        if code and pseudocode:
+            yield _messages(f"Translate this pseudocode line to a line of NetLogo code:\n\n{pseudocode}", code)
+
+
+def is_validation_procedure(procedure: Dict[str, Any], validation_pct: float, seed: int) -> bool:
+    """
+    Decide train/validation membership from a hash of the procedure's code.
+
+    The decision depends only on the code and the seed, so the split is reproducible
+    without a global shuffle, and identical procedures always land in the same set.
+
+    Args:
+        procedure: Dictionary containing procedure data
+        validation_pct: Fraction of procedures to put in the validation set
+        seed: Seed mixed into the hash to pick a different split
+
+    Returns:
+        True if the procedure belongs to the validation set
+    """
+    digest = content_hash(str(seed), procedure['originalCode'])
+    return int(digest[:16], 16) / 16 ** 16 < validation_pct
+
+
+class Emitter(ABC):
+    """Turns procedures into training pairs of one format and writes them to its own files.
+
+    Subclasses implement pairs(). Procedures are assigned to the training or
+    validation output by is_validation_procedure, so every pair of a procedure
+    lands in the same set.
+    """
+
+    # Name used on the command line and in reports
+    name = ""
+
+    def __init__(self, output_file: str, validation_file: Optional[str] = None):
+        """
+        Args:
+            output_file: Path to the training JSONL file
+            validation_file: Path to the validation JSONL file, or None for no split
+        """
+        self.output_file = output_file
+        self.validation_file = validation_file
+        self.train_count = 0
+        self.valid_count = 0
+        self._train_out = None
+        self._valid_out = None
+
+    @abstractmethod
+    def pairs(self, procedure: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yield the training pairs of one procedure (none if it lacks the fields)."""
+        pass
+
+    def open(self) -> None:
+        for path in (self.output_file, self.validation_file):
+            if path:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._train_out = open(self.output_file, 'w', encoding='utf-8')
+        if self.validation_file:
+            self._valid_out = open(self.validation_file, 'w', encoding='utf-8')
+
+    def emit(self, procedure: Dict[str, Any], validation: bool) -> None:
+        """Write the procedure's pairs to the training or validation output."""
+        out = self._valid_out if validation and self._valid_out else self._train_out
+        for pair in self.pairs(procedure):
+            out.write(json.dumps(pair) + '\n')
+            if out is self._train_out:
+                self.train_count += 1
+            else:
+                self.valid_count += 1
+
+    def close(self) -> None:
+        for f in (self._train_out, self._valid_out):
+            if f:
+                f.close()
+        self._train_out = self._valid_out = None
+
+
+class SummaryEmitter(Emitter):
+    """Summary-to-code pairs, as written by create_finetune_jsonl.py."""
+
+    name = "summary"
+
+    def pairs(self, procedure: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        pair = build_summary_pair(procedure)
+        if pair:
+            yield pair
+
+
+class PseudocodeEmitter(Emitter):
+    """Pseudocode-to-code pairs, as written by create_finetune_jsonl_from_pseudocode.py."""
+
+    name = "pseudocode"
+
+    def pairs(self, procedure: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        pair = build_pseudocode_pair(procedure)
+        if pair:
+            yield pair
+
+
+class LineEmitter(Emitter):
+    """Line-level pseudocode-to-code pairs from codeToPseudoCodeMap."""
+
+    name = "lines"
+
+    def pairs(self, procedure: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        return build_line_pairs(procedure)
+
+
+# Emitter classes by name, for command line selection
+EMITTERS = {emitter.name: emitter for emitter in (SummaryEmitter, PseudocodeEmitter, LineEmitter)}
+
+
+def _emit_model(model: Dict[str, Any], emitters: List[Emitter], validation_pct: float, seed: int) -> None:
+    """Feed every procedure of a model to all emitters."""
+    for procedure in model.get('procedures', []):
+        if not procedure.get('originalCode'):
+            continue
+        validation = validation_pct > 0 and is_validation_procedure(procedure, validation_pct, seed)
+        for emitter in emitters:
+            emitter.emit(procedure, validation)
+
+
+def run_export(input_file: str, emitters: List[Emitter], validation_pct: float = 0.0, seed: int = 42) -> int:
+    """
+    Read the models file once and feed every procedure to all emitters.
+
+    Args:
+        input_file: Path to input models JSON or JSONL file
+        emitters: Emitters to run in the shared pass
+        validation_pct: Fraction of procedures routed to the emitters' validation files
+        seed: Seed for the validation split hash
+
+    Returns:
+        Number of models read
+    """
+    model_count = 0
+    for emitter in emitters:
+        emitter.open()
+    try:
+        for model in iter_models(input_file):
+            model_count += 1
+            _emit_model(model, emitters, validation_pct, seed)
+    finally:
+        for emitter in emitters:
+            emitter.close()
+    return model_count
+
+
+# Models handed to a worker at a time by run_export_parallel
+SHARD_CHUNK_MODELS = 32
+# Seconds run_export_parallel waits on a worker before checking that it is still alive
+WORKER_POLL_SECONDS = 1.0
+
+
+def shard_path(path: str, shard: int, shards: int) -> str:
+    """Return the path of one shard of an output file, e.g. out.shard-00001-of-00004.jsonl."""
+    base = Path(path)
+    suffix = base.suffix or '.jsonl'
+    return str(base.with_name(f"{base.stem}.shard-{shard:05d}-of-{shards:05d}{suffix}"))
+
+
+def _export_worker(shard: int, shards: int, emitter_specs: List[Tuple[str, str, Optional[str]]],
+                   queue: Any, results: Any, validation_pct: float, seed: int) -> None:
+    """Worker process: run the emitters over model chunks from queue into this worker's shards.
+
+    Puts (shard, pair counts per emitter, None) on results when done, or
+    (shard, None, error message) if anything raised.
+    """
+    emitters = []
+    try:
+        emitters = [
+            EMITTERS[name](shard_path(output_file, shard, shards),
+                           shard_path(validation_file, shard, shards) if validation_file else None)
+            for name, output_file, validation_file in emitter_specs
+        ]
+        for emitter in emitters:
+            emitter.open()
+        while True:
+            models = queue.get()
+            if models is None:
+                break
+            for model in models:
+                _emit_model(model, emitters, validation_pct, seed)
+    except Exception as e:
+        results.put((shard, None, f"{type(e).__name__}: {e}"))
+        return
+    finally:
+        for emitter in emitters:
+            emitter.close()
+    results.put((shard, [(emitter.train_count, emitter.valid_count) for emitter in emitters], None))
+
+
+def _raise_worker_failure(results: Any, shard: int, process: Any) -> None:
+    """Raise with the error a failed worker reported, or with its exit code if it reported none."""
+    try:
+        while True:
+            failed_shard, _, error = results.get(timeout=WORKER_POLL_SECONDS)
+            if error is not None:
+                raise RuntimeError(f"Export worker {failed_shard} failed: {error}")
+    except queue_module.Empty:
+        pass
+    raise RuntimeError(f"Export worker {shard} exited with code {process.exitcode}")
+
+
+def _put_to_worker(queue: Any, results: Any, process: Any, shard: int, item: Any) -> None:
+    """Put item on a worker's bounded queue, raising instead of blocking if the worker has exited."""
+    while True:
+        try:
+            queue.put(item, timeout=WORKER_POLL_SECONDS)
+            return
+        except queue_module.Full:
+            if not process.is_alive():
+                _raise_worker_failure(results, shard, process)
+
+
+def _collect_results(results: Any, processes: List[Any]) -> Dict[int, List[Tuple[int, int]]]:
+    """Wait for every worker's pair counts, raising on the first worker that failed or died."""
+    shard_counts = {}
+    while len(shard_counts) < len(processes):
+        try:
+            shard, counts, error = results.get(timeout=WORKER_POLL_SECONDS)
+        except queue_module.Empty:
+            # A worker that exited cleanly has already sent its result; one that crashed never will
+            for shard, process in enumerate(processes):
+                if shard not in shard_counts and not process.is_alive() and process.exitcode != 0:
+                    _raise_worker_failure(results, shard, process)
+            continue
+        if error is not None:
+            raise RuntimeError(f"Export worker {shard} failed: {error}")
+        shard_counts[shard] = counts
+    return shard_counts
+
+
+def _merge_shards(path: str, shards: int) -> None:
+    """Concatenate the shards of an output file into it, in shard order, and delete them."""
+    with open(path, 'wb') as out:
+        for shard in range(shards):
+            part = shard_path(path, shard, shards)
+            with open(part, 'rb') as f:
+                shutil.copyfileobj(f, out)
+            Path(part).unlink()
+
+
+def _write_manifest(emitter: Emitter, shards: int, shard_counts: List[Tuple[int, int]]) -> str:
+    """Write <output>.manifest.json listing an emitter's shards (relative to it) and their pair counts."""
+    manifest = {
+        "format": emitter.name,
+        "shards": [
+            {
+                "train": Path(shard_path(emitter.output_file, shard, shards)).name,
+                "trainPairs": train_count,
+                "validation": (Path(shard_path(emitter.validation_file, shard, shards)).name
+                               if emitter.validation_file else None),
+                "validationPairs": valid_count,
+            }
+            for shard, (train_count, valid_count) in enumerate(shard_counts)
+        ],
+        "trainPairs": emitter.train_count,
+        "validationPairs": emitter.valid_count,
+    }
+    manifest_path = f"{emitter.output_file}.manifest.json"
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest_path
+
+
+def run_export_parallel(input_file: str, emitters: List[Emitter], workers: int, validation_pct: float = 0.0,
+                        seed: int = 42, keep_shards: bool = False) -> int:
+    """
+    Sharded version of run_export spreading the pair building over worker processes.
+
+    The parent streams models from the input and deals them round-robin, in chunks
+    of SHARD_CHUNK_MODELS, to the workers. Each worker runs its own copy of the
+    emitters and writes its own shard files. Afterwards the shards are concatenated
+    into the emitters' output files, or kept with a manifest next to each output.
+
+    Shard contents depend only on the input and the number of workers, and the
+    validation split is the same as with run_export. Pair counts are stored on the
+    emitters passed in.
+
+    Args:
+        input_file: Path to input models JSON or JSONL file
+        emitters: Emitters describing the formats and output files; they are not opened
+        workers: Number of worker processes (and shards)
+        validation_pct: Fraction of procedures routed to the validation files
+        seed: Seed for the validation split hash
+        keep_shards: Keep the shard files and write manifests instead of concatenating
+
+    Returns:
+        Number of models read
+
+    Raises:
+        RuntimeError: A worker raised or died; the other workers are stopped.
+    """
+    for emitter in emitters:
+        for path in (emitter.output_file, emitter.validation_file):
+            if path:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+    emitter_specs = [(emitter.name, emitter.output_file, emitter.validation_file) for emitter in emitters]
+
+    # Bounded queues keep at most a few chunks per worker in memory
+    queues = [multiprocessing.Queue(maxsize=4) for _ in range(workers)]
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_export_worker,
+                                args=(shard, workers, emitter_specs, queues[shard], results, validation_pct, seed))
+        for shard in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    model_count = 0
+    chunk = []
+    chunk_index = 0
+    try:
+        for model in iter_models(input_file):
+            model_count += 1
+            chunk.append(model)
+            if len(chunk) == SHARD_CHUNK_MODELS:
+                shard = chunk_index % workers
+                _put_to_worker(queues[shard], results, processes[shard], shard, chunk)
+                chunk_index += 1
+                chunk = []
+        if chunk:
+            shard = chunk_index % workers
+            _put_to_worker(queues[shard], results, processes[shard], shard, chunk)
+        for shard in range(workers):
+            _put_to_worker(queues[shard], results, processes[shard], shard, None)
+        shard_counts = _collect_results(results, processes)
+    except BaseException:
+        # Stop the remaining workers instead of leaving them blocked on their queues
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+
+    for i, emitter in enumerate(emitters):
+        counts = [shard_counts[shard][i] for shard in range(workers)]
+        emitter.train_count = sum(train_count for train_count, _ in counts)
+        emitter.valid_count = sum(valid_count for _, valid_count in counts)
+        if keep_shards:
+            print(f"Wrote {workers} {emitter.name} shards, manifest in {_write_manifest(emitter, workers, counts)}")
+        else:
+            _merge_shards(emitter.output_file, workers)
+            if emitter.validation_file:
+                _merge_shards(emitter.validation_file, workers)
+    return model_count
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import shlex
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import MetricsRegistry
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while.
+
+    After failure_threshold consecutive failures the breaker opens and allow()
+    returns False for reset_after seconds. Then a single trial call is let
+    through: a success closes the breaker, a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Return True if a call may be made now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class FormatterClient:
+    """Client for the NetLogo formatter service.
+
+    Requests go through one pooled requests.Session with keep-alive, a timeout
+    and a circuit breaker: while the service keeps failing, code is returned
+    unformatted without waiting on it. format_many() spreads its work over a
+    bounded thread pool and, if batch_url is set, sends several files per
+    request to the batch endpoint, which takes {"codes": [...], "lineWidth": n}
+    and answers {"formatted": [...]} in the same order.
+
+    With server_command the client starts the formatter itself, and restarts it
+    after every recycle_after formatted files to contain the service's memory
+    leak. Restarts wait for in-flight requests to finish.
+
+    Formatting never raises: on any error the original code is returned.
+    """
+
+    def __init__(self, url: str = 'http://localhost:3000/prettify', batch_url: Optional[str] = None,
+                 workers: int = 4, batch_size: int = 16, timeout: float = 30.0, line_width: int = 80,
+                 failure_threshold: int = 5, reset_after: float = 30.0,
+                 server_command: Optional[str] = None, recycle_after: int = 0,
+                 startup_timeout: float = 30.0, metrics: Optional[MetricsRegistry] = None):
+        """Create a client.
+
+        Args:
+            url: Endpoint formatting one file, taking {"code": ..., "lineWidth": n}.
+            batch_url: Optional endpoint formatting several files per request.
+            workers: Maximum number of requests in flight; also the connection pool size.
+            batch_size: Files per request to batch_url.
+            timeout: Seconds before a request is abandoned.
+            line_width: Line width passed to the formatter.
+            failure_threshold: Consecutive failures that open the circuit breaker.
+            reset_after: Seconds the breaker stays open before a trial request.
+            server_command: Command starting a local formatter listening on url.
+            recycle_after: Restart the local formatter after this many files (0 never).
+            startup_timeout: Seconds to wait for the local formatter to accept connections.
+            metrics: Registry receiving "format_request" latencies and format counters.
+        """
+        self.url = url
+        self.batch_url = batch_url
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.line_width = line_width
+        self.server_command = server_command
+        self.recycle_after = max(0, recycle_after)
+        self.startup_timeout = startup_timeout
+        self.metrics = metrics or MetricsRegistry()
+        self.breaker = CircuitBreaker(failure_threshold, reset_after)
+        self._session = self._new_session()
+        self._executor = None
+        self._process = None
+        # In-flight request count and files served since the last (re)start of the local formatter
+        self._server_condition = threading.Condition()
+        self._in_flight = 0
+        self._served = 0
+        self._recycling = False
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def format(self, code: str) -> str:
+        """Format one file's code, returning it unchanged if formatting fails."""
+        return self._format_chunk([code])[0]
+
+    def format_many(self, codes: List[str]) -> List[str]:
+        """Format several files' code concurrently, in order.
+
+        Identical inputs are only sent once.
+        """
+        unique = list(dict.fromkeys(codes))
+        if self.batch_url:
+            chunks = [unique[i:i + self.batch_size] for i in range(0, len(unique), self.batch_size)]
+        else:
+            chunks = [[code] for code in unique]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='formatter')
+        formatted = {}
+        for chunk, results in zip(chunks, self._executor.map(self._format_chunk, chunks)):
+            formatted.update(zip(chunk, results))
+        return [formatted[code] for code in codes]
+
+    def _format_chunk(self, codes: List[str]) -> List[str]:
+        """Format a chunk in one request, falling back to the original code on failure."""
+        if not self.breaker.allow():
+            self.metrics.increment("format_skipped", len(codes))
+            return codes
+        self._begin_request()
+        try:
+            with self.metrics.timer("format_request"):
+                if len(codes) > 1:
+                    results = self._post(self.batch_url, {"codes": codes, "lineWidth": self.line_width})
+                    if not isinstance(results, list) or len(results) != len(codes):
+                        raise ValueError("batch response does not match the request")
+                else:
+                    results = [self._post(self.url, {"code": codes[0], "lineWidth": self.line_width})]
+        except Exception as e:
+            self.breaker.record_failure()
+            self.metrics.increment("format_errors")
+            print(f"  Warning: Code formatting failed: {str(e)}")
+            return codes
+        finally:
+            self._end_request(len(codes))
+        self.breaker.record_success()
+        self.metrics.increment("format_files", len(codes))
+        return [result if isinstance(result, str) else code for result, code in zip(results, codes)]
+
+    def _post(self, url: str, payload: dict):
+        """POST to the formatter and return the "formatted" field of its response."""
+        response = self._session.post(url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["formatted"]
+
+    def _begin_request(self) -> None:
+        """Wait out a restart of the local formatter, starting it if needed."""
+        with self._server_condition:
+            while self._recycling:
+                self._server_condition.wait()
+            if self.server_command and (self._process is None or self._process.poll() is not None):
+                self._start_server()
+            self._in_flight += 1
+
+    def _end_request(self, files: int) -> None:
+        """Count served files and restart the local formatter once it is due and idle."""
+        with self._server_condition:
+            self._in_flight -= 1
+            self._served += files
+            if self.server_command and self.recycle_after and self._served >= self.recycle_after:
+                self._recycling = True
+            if self._recycling and self._in_flight == 0:
+                print(f"  Recycling formatter after {self._served} files")
+                self._stop_server()
+                self._start_server()
+                self._recycling = False
+                self._server_condition.notify_all()
+
+    def _start_server(self) -> None:
+        """Start the local formatter and wait until it accepts connections."""
+        self._process = subprocess.Popen(shlex.split(self.server_command),
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._served = 0
+        address = urlparse(self.url)
+        port = address.port or (443 if address.scheme == 'https' else 80)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline and self._process.poll() is None:
+            try:
+                socket.create_connection((address.hostname, port), timeout=1.0).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        print(f"  Warning: Formatter '{self.server_command}' did not start listening on {address.netloc}")
+
+    def _stop_server(self) -> None:
+        """Stop the local formatter and drop connections to it."""
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+        self._session.close()
+        self._session = self._new_session()
+
+    def close(self) -> None:
+        """Shut down the thread pool, the session and any local formatter."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        with self._server_condition:
+            self._stop_server()
+
+    def __enter__(self) -> "FormatterClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
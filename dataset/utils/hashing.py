@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+
+import hashlib
+
+
+def content_hash(*parts: str) -> str:
+    """Return a stable SHA-256 hex digest of one or more strings.
+
+    Parts are separated by a NUL byte so that ("ab", "c") and ("a", "bc")
+    hash differently.
+
+    Args:
+        parts: The strings to hash, e.g. a procedure's original code.
+
+    Returns:
+        The hex digest of the combined parts.
+    """
+    digest = hashlib.sha256()
+    for i, part in enumerate(parts):
+        if i:
+            digest.update(b'\0')
+        digest.update(part.encode('utf-8'))
+    return digest.hexdigest()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import json
+from typing import Any, Dict, Iterator, TextIO
+
+from . import storage
+
+# Bytes read per chunk while scanning a models file
+CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _JsonChunkReader:
+    """A window over a text file that decodes JSON values one at a time.
+
+    Only the unconsumed tail of the file is kept in memory, so memory stays at
+    roughly one value (plus a chunk) whatever the file size.
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _read_more(self) -> bool:
+        """Append the next chunk to the buffer, dropping the consumed part. False at EOF."""
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it ('' at EOF)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read_more():
+                return ''
+
+    def expect(self, char: str) -> None:
+        """Consume the next non-whitespace character, which must be char."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in models file, found '{found or 'end of file'}'")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode and consume the next JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Most likely the value continues in the next chunk
+                if not self._read_more():
+                    raise
+                continue
+            # A number at the end of the buffer may be cut short
+            if end == len(self._buffer) and isinstance(value, (int, float)) and self._read_more():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_models(input_file: str) -> Iterator[Dict]:
+    """Yield the models of a models file one at a time without loading the whole file.
+
+    Accepts the JSON written by save_to_json (an object with a "models" array;
+    other top-level keys are skipped), JSONL with one model per line such as the
+    output of --parse-only, or a SQLite model store (.sqlite / .db).
+
+    Args:
+        input_file: Path to a .json, .jsonl, .sqlite or .db models file.
+
+    Yields:
+        Model dicts in file order.
+    """
+    if storage.is_store_path(input_file):
+        yield from storage.iter_models(input_file)
+        return
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        if input_file.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        reader = _JsonChunkReader(f)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key == 'models':
+                reader.expect('[')
+                if reader.peek() != ']':
+                    while True:
+                        yield reader.value()
+                        if reader.peek() != ',':
+                            break
+                        reader.expect(',')
+                reader.expect(']')
+            else:
+                reader.value()
+            if reader.peek() != ',':
+                break
+            reader.expect(',')
+        reader.expect('}')
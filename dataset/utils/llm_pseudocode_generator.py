@@ -2,11 +2,47 @@
 
 import re
 import json
-from typing import Dict, List
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from textwrap import dedent
 import litellm
 from pydantic import BaseModel, Field, RootModel
 from .env import MISTRAL_API_KEY
+from .pseudocode_cache import PseudocodeCache
+from .netlogo_code import format_code_with_line_numbers, index_numbered_lines, pseudocode_line_numbers
+from .llm_scheduler import AdaptiveScheduler
+from .metrics import MetricsRegistry
+from .stream_parser import ResponseDriftError, StreamingResponseParser
+
+# Bump whenever the prompt or response schema changes so cached responses are not reused
+PROMPT_VERSION = "1"
+COMPACT_PROMPT_VERSION = "compact-1"
+# Multi-procedure requests (BATCH_SYSTEM_PROMPT) are cached apart from single-procedure ones
+BATCH_PROMPT_VERSION = "batch-1"
+
+# Prompt modes: "full" sends the complete instructions with every procedure and has the
+# model echo each original line; "compact" keeps the instructions in a reusable system
+# prompt and drops the echo, which is reconstructed locally from numberedOriginalCode
+PROMPT_MODES = ("full", "compact")
+
+# Streamed responses that drift from the code are retried this many times, at a
+# non-zero temperature since a greedy retry would most likely drift the same way
+DRIFT_RETRIES = 1
+DRIFT_RETRY_TEMPERATURE = 0.3
+
+class PseudocodeRetryableError(Exception):
+    """Raised when procedures could not be generated: transient LLM errors that
+    outlasted their retries, streamed responses that kept drifting, unparsable or
+    invalid responses, or requests the provider rejected.
+    
+    The procedures are left untouched (not written as empty) so they can be queued
+    and retried later.
+    """
+    
+    def __init__(self, procedures: List[Dict], cause: Exception):
+        super().__init__(f"{len(procedures)} procedure(s) need a retry: {cause}")
+        self.procedures = procedures
+        self.cause = cause
 
 class PseudocodeLine(BaseModel):
     """Pydantic model for a single line of pseudocode mapping."""
@@ -27,6 +63,61 @@ class PseudocodeMapping(RootModel):
     """Pydantic model for the entire pseudocode response."""
     root: PseudocodeResponse
 
+class CompactPseudocodeLine(BaseModel):
+    """Pydantic model for a single line of pseudocode, without the original code echo."""
+    line: int = Field(description="The line number from the original code")
+    psuedo: str = Field(description="English pseudocode translation of the NetLogo code at this line, keeping its indentation")
+
+class CompactPseudocodeResponse(BaseModel):
+    """Pydantic model for a compact-mode response."""
+    variables: List[str] = Field(
+        description="List of important non-primitive variable names used in this procedure",
+    )
+    lines: List[CompactPseudocodeLine] = Field(description="Array of line-by-line pseudocode mappings")
+    summary: str = Field(description="EXAMPLE SUMMARY: First, setup the globals and patches. Then, clear the output and all plots.")
+
+class CompactPseudocodeMapping(RootModel):
+    """Pydantic model for the entire compact-mode response."""
+    root: CompactPseudocodeResponse
+
+class BatchPseudocodeResponse(BaseModel):
+    """Pydantic model for a response covering several procedures at once."""
+    procedures: Dict[str, CompactPseudocodeResponse] = Field(
+        description="Pseudocode for each procedure in the request, keyed by procedure name"
+    )
+
+class BatchPseudocodeMapping(RootModel):
+    """Pydantic model for the entire batched response."""
+    root: BatchPseudocodeResponse
+
+# Static instructions for compact mode, sent once per request as the system prompt
+COMPACT_SYSTEM_PROMPT = dedent("""
+    You are a NetLogo expert who translates NetLogo code into clear, concise pseudocode.
+
+    The user sends numbered NetLogo code inside <netlogo-code> tags. For each numbered line,
+    write one line of English pseudocode explaining what it does, using the same line number
+    (a strict 1:1 mapping) and keeping the original indentation.
+
+    Respond with a JSON object:
+    - lines: an array of {"line": <number>, "psuedo": <pseudocode>} for every line
+    - summary: a concise, step by step, detailed summary of the intent of the code. Maximum 1 paragraph.
+      Example: "First, setup the globals and patches. Then, clear the output and all plots."
+    - variables: the names of custom variables (globals, turtle/patch/link variables,
+      breed-specific variables, functions) used in the code, e.g. ["energy", "reproduce-threshold"].
+      DO NOT include standard NetLogo primitives or commands.
+
+    DO NOT MENTION THE PROCEDURE ITSELF OR ANY SPECIFIC VARIABLES IN THE SUMMARY. THE SUMMARY IS HIGH LEVEL.
+    WE CARE MORE ABOUT MOTIVATION THAN THE IMPLEMENTATION DETAILS.
+""").strip()
+
+# Extra instructions when several procedures are sent in one request
+BATCH_SYSTEM_PROMPT = COMPACT_SYSTEM_PROMPT + "\n\n" + dedent("""
+    The user may send several procedures, each in its own <netlogo-code name="..."> block with
+    its own line numbering. Respond with a JSON object {"procedures": {...}} that maps each
+    procedure name to an object with the lines, summary and variables fields described above.
+    Include every procedure, and every line of each procedure.
+""").strip()
+
 class LLMPseudocodeGenerator:
     """Class for generating pseudocode from NetLogo code using LLM.
     
@@ -36,45 +127,64 @@ class LLMPseudocodeGenerator:
     original code and generated pseudocode.
     """
     
-    # Class variable to track total tokens used
-    total_tokens_used = 0
-    total_prompt_tokens = 0
-    total_completion_tokens = 0
-    processed_procedures_count = 0
-    
-    @classmethod
-    def reset_token_counter(cls):
-        """Reset all token counters to zero."""
-        cls.total_tokens_used = 0
-        cls.total_prompt_tokens = 0
-        cls.total_completion_tokens = 0
-        cls.processed_procedures_count = 0
+    def reset_token_counter(self):
+        """Reset all token counters and latencies of this generator's metrics."""
+        self.metrics.reset()
         print("Token counters have been reset to zero.")
     
-    @classmethod
-    def print_token_usage_summary(cls):
-        """Print a summary of token usage."""
-        if cls.processed_procedures_count == 0:
+    def print_token_usage_summary(self):
+        """Print a summary of token usage and call latencies."""
+        metrics = self.metrics
+        processed = metrics.get("procedures")
+        cache_hits = metrics.get("cache_hits")
+        if processed == 0 and cache_hits == 0:
             print("No procedures have been processed yet.")
             return
             
-        avg_tokens = cls.total_tokens_used / cls.processed_procedures_count
         print("\n===== TOKEN USAGE SUMMARY =====")
-        print(f"Total procedures processed: {cls.processed_procedures_count}")
-        print(f"Total prompt tokens: {cls.total_prompt_tokens}")
-        print(f"Total completion tokens: {cls.total_completion_tokens}")
-        print(f"Total tokens used: {cls.total_tokens_used}")
-        print(f"Average tokens per procedure: {avg_tokens:.2f}")
+        print(f"Total procedures processed: {processed}")
+        print(f"Total prompt tokens: {metrics.get('prompt_tokens')}")
+        print(f"Total completion tokens: {metrics.get('completion_tokens')}")
+        print(f"Total tokens used: {metrics.get('total_tokens')}")
+        if processed:
+            avg_tokens = metrics.get("total_tokens") / processed
+            print(f"Average tokens per procedure: {avg_tokens:.2f}")
+        cache_misses = metrics.get("cache_misses")
+        lookups = cache_hits + cache_misses
+        if lookups:
+            print(f"Cache hits: {cache_hits} / {lookups} ({cache_hits / lookups * 100:.1f}%), misses: {cache_misses}")
+        if metrics.get("prompt_tokens_saved") or metrics.get("completion_tokens_saved"):
+            print(f"Compact prompt savings (estimated): {metrics.get('prompt_tokens_saved')} prompt + "
+                  f"{metrics.get('completion_tokens_saved')} completion tokens")
+        metrics.print_latency_summary()
         print("===============================\n")
     
-    def __init__(self, model_name: str = "mistral/codestral-2501"):
+    def __init__(self, model_name: str = "mistral/codestral-2501", cache: Optional[PseudocodeCache] = None,
+                 prompt_mode: str = "full", scheduler: Optional[AdaptiveScheduler] = None,
+                 metrics: Optional[MetricsRegistry] = None, stream: bool = False):
         """Initialize the pseudocode generator with the specified LLM model.
         
         Args:
             model_name: The name of the LLM model to use for pseudocode generation.
                        Defaults to "mistral/codestral-2501".
+            cache: Optional on-disk response cache. Procedures found in it are
+                   answered without calling the LLM.
+            prompt_mode: "full" (default) or "compact"; see PROMPT_MODES.
+            scheduler: Scheduler every LLM call goes through for rate limiting and
+                       retries. Defaults to one with a single call in flight.
+            metrics: Registry receiving token counts and cache statistics. Defaults
+                     to the scheduler's registry, so one run shares one registry.
+            stream: Stream single-procedure responses and validate their lines as
+                    they arrive, aborting a response as soon as it drifts.
         """
+        if prompt_mode not in PROMPT_MODES:
+            raise ValueError(f"Unknown prompt mode '{prompt_mode}', expected one of {PROMPT_MODES}")
         self.model_name = model_name
+        self.cache = cache
+        self.prompt_mode = prompt_mode
+        self.stream = stream
+        self.scheduler = scheduler or AdaptiveScheduler(metrics=metrics)
+        self.metrics = metrics or self.scheduler.metrics
         # Set up LiteLLM with Mistral API key
         litellm.api_key = MISTRAL_API_KEY
         # Enable JSON schema validation
@@ -90,20 +200,7 @@ class LLMPseudocodeGenerator:
         Returns:
             A list of formatted lines with line numbers.
         """
-        lines = code.split('\n')
-        formatted_lines = []
-        
-        # Calculate the width needed for line numbers (depends on number of lines)
-        line_number_width = len(str(len(lines)))
-        
-        for i, line in enumerate(lines, 1):
-            if line.strip():  # Skip empty lines
-                # Format: {line_number} | {code with preserved indentation}
-                formatted_lines.append(f"{i:>{line_number_width}} | {line}")
-            else:
-                formatted_lines.append(f"{i:>{line_number_width}} |")
-        
-        return formatted_lines
+        return format_code_with_line_numbers(code)
     
     def _prepare_structured_input(self, code_with_line_numbers: List[str]) -> List[Dict[str, any]]:
         """Prepare structured input for the LLM from code with line numbers.
@@ -217,6 +314,273 @@ class LLMPseudocodeGenerator:
         """)
         return prompt
     
+    @property
+    def prompt_version(self) -> str:
+        """Version of the prompt template in use, part of the response cache key."""
+        return COMPACT_PROMPT_VERSION if self.prompt_mode == "compact" else PROMPT_VERSION
+    
+    def _build_messages(self, code_with_line_numbers: List[str], prompt_mode: Optional[str] = None) -> List[Dict]:
+        """Build the chat messages for a procedure in the given (or configured) prompt mode."""
+        if (prompt_mode or self.prompt_mode) == "compact":
+            joined_code = '\n'.join(code_with_line_numbers)
+            return [{
+                "role": "system",
+                "content": COMPACT_SYSTEM_PROMPT
+            }, {
+                "role": "user",
+                "content": f"<netlogo-code>\n{joined_code}\n</netlogo-code>"
+            }]
+        return [{
+            "role": "system",
+            "content": "You are a NetLogo expert who translates NetLogo code into clear pseudocode."
+        }, {
+            "role": "user",
+            "content": self._generate_structured_prompt(code_with_line_numbers)
+        }]
+    
+    def _response_format(self) -> type:
+        """Return the Pydantic response schema for the configured prompt mode."""
+        return CompactPseudocodeMapping if self.prompt_mode == "compact" else PseudocodeMapping
+    
+    def _estimate_compact_savings(self, code_with_line_numbers: List[str], messages: List[Dict]) -> None:
+        """Estimate and record the tokens compact mode saves for one procedure.
+        
+        Prompt savings compare the full-format prompt with the compact one;
+        completion savings are the tokens the `orig` echo would have cost.
+        """
+        try:
+            full_prompt_tokens = litellm.token_counter(
+                model=self.model_name, messages=self._build_messages(code_with_line_numbers, "full"))
+            compact_prompt_tokens = litellm.token_counter(model=self.model_name, messages=messages)
+            original_lines = [re.sub(r'^\s*\d+\s*\|\s?', '', line) for line in code_with_line_numbers]
+            echo_tokens = litellm.token_counter(
+                model=self.model_name, text=json.dumps([{"orig": line} for line in original_lines]))
+        except Exception as e:
+            print(f"  Could not estimate token savings: {str(e)}")
+            return
+        
+        prompt_saved = full_prompt_tokens - compact_prompt_tokens
+        self.metrics.increment("prompt_tokens_saved", prompt_saved)
+        self.metrics.increment("completion_tokens_saved", echo_tokens)
+        print(f"  Compact prompt saved ~{prompt_saved} prompt tokens ({full_prompt_tokens} -> {compact_prompt_tokens}) "
+              f"and ~{echo_tokens} completion tokens")
+    
+    def _complete(self, messages: List[Dict], response_format: type) -> Any:
+        """Call litellm.completion through the scheduler, retrying transient errors.
+        
+        Raises:
+            RetriesExhaustedError: The request kept failing with transient errors.
+        """
+        return self.scheduler.run(
+            lambda: litellm.completion(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=4096,
+                temperature=0.0,
+                response_format=response_format
+            ),
+            estimated_tokens=self._estimate_request_tokens(messages)
+        )
+    
+    def _estimate_request_tokens(self, messages: List[Dict]) -> int:
+        """Prompt plus a completion of similar size, for the tokens-per-minute budget."""
+        try:
+            return 2 * litellm.token_counter(model=self.model_name, messages=messages)
+        except Exception:
+            return 0
+    
+    def _cache_key(self, procedure: Dict, prompt_version: Optional[str] = None) -> Optional[str]:
+        """Cache key of a procedure's response to a prompt (default: self.prompt_version), or None without a cache."""
+        if self.cache is None:
+            return None
+        return PseudocodeCache.make_key(self.model_name, prompt_version or self.prompt_version,
+                                        procedure["numberedOriginalCode"])
+    
+    def _check_cache(self, procedure: Dict, prompt_versions: Sequence[str] = ()) -> Tuple[Optional[str], bool]:
+        """Answer a procedure from the response cache if its exact code has been seen before.
+        
+        Args:
+            procedure: The procedure to look up.
+            prompt_versions: Prompts whose responses are accepted, in order of preference
+                (default: self.prompt_version only). Counts as one cache hit or miss.
+        
+        Returns:
+            Tuple of (cache_key, hit), with the key of the first prompt version.
+            cache_key is None when no cache is configured. On a hit the cached
+            fields have been copied into the procedure.
+        """
+        if self.cache is None:
+            return None, False
+        cache_keys = [self._cache_key(procedure, version) for version in prompt_versions or (self.prompt_version,)]
+        for cache_key in cache_keys:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.metrics.increment("cache_hits")
+                procedure.update(cached)
+                print(f"  Pseudocode for '{procedure['name']}' served from cache")
+                return cache_keys[0], True
+        self.metrics.increment("cache_misses")
+        return cache_keys[0], False
+    
+    def _store_in_cache(self, cache_key: Optional[str], procedure: Dict) -> None:
+        """Cache a procedure's results. Only usable responses are cached so failures are retried next time."""
+        if cache_key and procedure["pseudoCode"]:
+            self.cache.put(cache_key, procedure)
+    
+    def invalidate(self, procedure: Dict) -> None:
+        """Forget a procedure's generated fields and its cached response, so it is regenerated from scratch."""
+        if self.cache is not None:
+            self._ensure_numbered_code(procedure)
+            for prompt_version in (self.prompt_version, BATCH_PROMPT_VERSION):
+                if self.cache.delete(self._cache_key(procedure, prompt_version)):
+                    self.metrics.increment("cache_invalidations")
+        procedure["pseudoCode"] = []
+        procedure["codeToPseudoCodeMap"] = []
+        procedure["summary"] = ""
+        procedure["variables"] = []
+    
+    def _ensure_numbered_code(self, procedure: Dict) -> List[str]:
+        """Use the already stored numbered original code or generate it if needed."""
+        if "numberedOriginalCode" not in procedure or not procedure["numberedOriginalCode"]:
+            procedure["numberedOriginalCode"] = self.format_code_with_line_numbers(procedure["originalCode"])
+        return procedure["numberedOriginalCode"]
+    
+    def _record_usage(self, response: Any, label: str, procedure_count: int = 1) -> None:
+        """Track and print token usage of a completion covering procedure_count procedures."""
+        if hasattr(response, 'usage') and response.usage:
+            prompt_tokens = response.usage.prompt_tokens or 0
+            completion_tokens = response.usage.completion_tokens or 0
+            total_tokens = response.usage.total_tokens or 0
+            
+            # Update the run's counters
+            self.metrics.increment("prompt_tokens", prompt_tokens)
+            self.metrics.increment("completion_tokens", completion_tokens)
+            self.metrics.increment("total_tokens", total_tokens)
+            self.metrics.increment("procedures", procedure_count)
+            
+            print(f"  Token usage for {label}: {prompt_tokens} prompt + {completion_tokens} completion = {total_tokens} total")
+            print(f"  Running total tokens used: {self.metrics.get('total_tokens')}")
+    
+    @staticmethod
+    def _unpack_response_data(data: Any) -> Tuple[Any, str, List[str]]:
+        """Split a parsed response (Pydantic model or plain JSON) into (lines, summary, variables)."""
+        # Access the root attribute if it's a PseudocodeMapping
+        if isinstance(data, (PseudocodeMapping, CompactPseudocodeMapping)):
+            data = data.root
+        if hasattr(data, 'lines'):
+            return data.lines, getattr(data, 'summary', ""), getattr(data, 'variables', [])
+        if isinstance(data, dict):
+            return data.get('lines', []), data.get('summary', ""), data.get('variables', [])
+        # If it's a direct array without the expected structure
+        return data, "", []
+    
+    def _response_payload(self, response: Any, response_format: type) -> Any:
+        """Return the parsed response if LiteLLM provided one, otherwise the decoded JSON content.
+        
+        Raises:
+            ValueError: The content is not JSON or does not match response_format
+                (pydantic's ValidationError is a ValueError).
+        """
+        message = response.choices[0].message
+        if hasattr(message, 'parsed'):
+            return message.parsed
+        try:
+            data = json.loads(message.content.strip())
+        except (json.JSONDecodeError, AttributeError) as e:
+            raise ValueError(f"response is not valid JSON: {str(message.content)[:80]!r}") from e
+        response_format.model_validate(data)
+        return data
+    
+    def _apply_pseudocode(self, procedure: Dict, pseudocode_mapping: Any, procedure_summary: str,
+                          procedure_variables: List[str]) -> Dict:
+        """Build codeToPseudoCodeMap and the numbered pseudocode and store them in the procedure."""
+        # Create a mapping between code and pseudocode from the structured response,
+        # plus the numbered pseudocode lines for the old format
+        code_to_pseudo_map, numbered_pseudocode_lines = self._join_response_lines(procedure, pseudocode_mapping)
+        
+        # Store the results
+        procedure["pseudoCode"] = numbered_pseudocode_lines
+        procedure["codeToPseudoCodeMap"] = code_to_pseudo_map
+        procedure["summary"] = procedure_summary
+        procedure["variables"] = procedure_variables
+        
+        print(f"  Pseudocode generated successfully for '{procedure['name']}'")
+        print(f"  Summary: {procedure_summary[:100]}..." if len(procedure_summary) > 100 else f"  Summary: {procedure_summary}")
+        
+        # Print the number of variables identified
+        var_count = len(procedure_variables)
+        if var_count > 0:
+            print(f"  Identified {var_count} important variables: {', '.join(procedure_variables[:5])}")
+            if var_count > 5:
+                print(f"    - ... and {var_count - 5} more")
+        else:
+            print("  No custom variables identified")
+            
+        print("----------------------------------------------------------\n")
+        
+        return procedure
+    
+    def _join_response_lines(self, procedure: Dict, pseudocode_mapping: Any) -> Tuple[List[Dict], List[str]]:
+        """Join the response lines to the procedure's original lines by line number.
+        
+        The original lines are indexed by number once per procedure, so each
+        response line is matched with a list lookup. Response lines whose number
+        is not in the procedure and repeated numbers are dropped; they and
+        non-blank code lines left without pseudocode are reported as mismatches.
+        
+        Returns:
+            Tuple of (codeToPseudoCodeMap entries, numbered pseudocode lines), in line order.
+        """
+        code_with_line_numbers = procedure["numberedOriginalCode"]
+        originals = index_numbered_lines(code_with_line_numbers)
+        required, allowed = pseudocode_line_numbers(originals)
+        line_number_width = len(str(len(code_with_line_numbers)))
+        
+        pseudo_by_line = {}
+        unknown, repeated = [], []
+        for line_num, pseudo_text in self._iter_response_lines(pseudocode_mapping or []):
+            try:
+                line_num = int(line_num)
+            except (TypeError, ValueError):
+                unknown.append(line_num)
+                continue
+            if line_num not in allowed:
+                unknown.append(line_num)
+            elif line_num in pseudo_by_line:
+                repeated.append(line_num)
+            else:
+                pseudo_by_line[line_num] = pseudo_text
+        
+        missing = sorted(required - pseudo_by_line.keys())
+        if unknown or repeated or missing:
+            self.metrics.increment("mapping_mismatches")
+            details = [f"{label} {numbers[:5]}" for label, numbers in
+                       (("unknown lines", unknown), ("repeated lines", repeated), ("missing lines", missing)) if numbers]
+            print(f"  Warning: pseudocode for '{procedure['name']}' does not match its code: {', '.join(details)}")
+        
+        code_to_pseudo_map = []
+        numbered_pseudocode_lines = []
+        for line_num in sorted(pseudo_by_line):
+            pseudo_text = pseudo_by_line[line_num]
+            numbered_pseudocode_lines.append(f"{line_num:>{line_number_width}} | {pseudo_text}")
+            code_to_pseudo_map.append({
+                "lineNumber": line_num,
+                "originalCode": originals[line_num],
+                "pseudoCode": pseudo_text
+            })
+        return code_to_pseudo_map, numbered_pseudocode_lines
+    
+    @staticmethod
+    def _iter_response_lines(pseudocode_mapping: Any):
+        """Yield (line number, pseudocode text) from Pydantic line models or plain dicts."""
+        for line_data in pseudocode_mapping:
+            # Extract data based on whether we have a Pydantic model or dict
+            if isinstance(line_data, (PseudocodeLine, CompactPseudocodeLine)):
+                yield line_data.line, line_data.psuedo
+            else:
+                # Treat as dictionary
+                yield line_data["line"], line_data["psuedo"]
+    
     def generate_pseudocode(self, procedure: Dict) -> Dict:
         """Generate pseudocode for a NetLogo procedure using LLM with structured output.
         
@@ -226,161 +590,306 @@ class LLMPseudocodeGenerator:
         
         Returns:
             Updated procedure dict with 'pseudoCode' and 'codeToPseudoCodeMap' fields.
+        
+        Raises:
+            PseudocodeRetryableError: Generation failed; the procedure is left unchanged
+                so it can be retried later.
         """
         try:
-            # Use the already stored numbered original code or generate it if needed
-            if "numberedOriginalCode" not in procedure or not procedure["numberedOriginalCode"]:
-                procedure["numberedOriginalCode"] = self.format_code_with_line_numbers(procedure["originalCode"])
-            
-            code_with_line_numbers = procedure["numberedOriginalCode"]
-            
-            # Generate the prompt for structured output
-            prompt = self._generate_structured_prompt(code_with_line_numbers)
-            
-            print(f"  Generating pseudocode for procedure '{procedure['name']}'...")
-            
+            self._ensure_numbered_code(procedure)
+            cache_key, hit = self._check_cache(procedure)
+            if hit:
+                return procedure
+            return self._request_pseudocode(procedure, cache_key)
+        except Exception as e:
+            print(f"  Giving up on '{procedure['name']}' for now: {str(e)}")
+            raise PseudocodeRetryableError([procedure], e) from e
+    
+    def _request_pseudocode(self, procedure: Dict, cache_key: Optional[str]) -> Dict:
+        """Call the LLM for a single procedure and store the results. Raises on failure."""
+        code_with_line_numbers = procedure["numberedOriginalCode"]
+        
+        # Generate the prompt for structured output
+        messages = self._build_messages(code_with_line_numbers)
+        
+        print(f"  Generating pseudocode for procedure '{procedure['name']}'...")
+        if self.prompt_mode == "compact":
+            self._estimate_compact_savings(code_with_line_numbers, messages)
+        
+        if self.stream:
+            data = self._stream_with_drift_retries(procedure, messages)
+        else:
             # Call LiteLLM with the configured model and Pydantic model for response format
-            response = litellm.completion(
+            response_format = self._response_format()
+            response = self._complete(messages, response_format)
+            self._record_usage(response, f"'{procedure['name']}'")
+            data = self._response_payload(response, response_format)
+        
+        # Extract pseudocode, summary and variables from response
+        self._apply_pseudocode(procedure, *self._unpack_response_data(data))
+        self._store_in_cache(cache_key, procedure)
+        return procedure
+    
+    def batch_request(self, procedure: Dict, custom_id: str) -> Optional[Dict]:
+        """Build the provider batch-input line for one procedure.
+        
+        The line follows the OpenAI batch format (custom_id, method, url, body),
+        with the response schema of the configured prompt mode as a JSON schema.
+        
+        Returns:
+            The request line, or None if the procedure was answered from the cache.
+        """
+        self._ensure_numbered_code(procedure)
+        _, hit = self._check_cache(procedure)
+        if hit:
+            return None
+        response_format = self._response_format()
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                # Batch endpoints take the provider's model name, without LiteLLM's prefix
+                "model": self.model_name.split('/', 1)[-1],
+                "messages": self._build_messages(procedure["numberedOriginalCode"]),
+                "max_tokens": 4096,
+                "temperature": 0.0,
+                "response_format": {
+                    "type": "json_schema",
+                    "json_schema": {
+                        "name": response_format.__name__,
+                        "schema": response_format.model_json_schema(),
+                    },
+                },
+            },
+        }
+    
+    def apply_batch_result(self, procedure: Dict, result: Dict) -> bool:
+        """Store the pseudocode from one line of a provider batch output file.
+        
+        Returns:
+            True if the procedure was filled in; False if the request failed or the
+            response did not cover every line, leaving the procedure unchanged.
+        """
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            return False
+        body = response.get("body") or {}
+        try:
+            data = json.loads(body["choices"][0]["message"]["content"])
+        except (KeyError, IndexError, TypeError, json.JSONDecodeError):
+            return False
+        lines, summary, variables = self._unpack_response_data(data)
+        if not self._covers_all_lines(procedure, lines):
+            return False
+        
+        usage = body.get("usage") or {}
+        self.metrics.increment("prompt_tokens", usage.get("prompt_tokens") or 0)
+        self.metrics.increment("completion_tokens", usage.get("completion_tokens") or 0)
+        self.metrics.increment("total_tokens", usage.get("total_tokens") or 0)
+        self.metrics.increment("procedures")
+        
+        self._apply_pseudocode(procedure, lines, summary, variables)
+        self._store_in_cache(self._cache_key(procedure), procedure)
+        return True
+    
+    def _stream_with_drift_retries(self, procedure: Dict, messages: List[Dict]) -> Dict:
+        """Stream a procedure's response, retrying responses that drift.
+        
+        Raises:
+            ResponseDriftError: Every attempt drifted.
+        """
+        parser = StreamingResponseParser(procedure["numberedOriginalCode"], echo=self.prompt_mode != "compact")
+        for attempt in range(DRIFT_RETRIES + 1):
+            temperature = 0.0 if attempt == 0 else DRIFT_RETRY_TEMPERATURE
+            try:
+                response = self._complete_streaming(messages, parser, temperature)
+            except ResponseDriftError as e:
+                # Text received so far, at ~4 characters per token
+                self.metrics.increment("stream_aborts")
+                self.metrics.increment("stream_aborted_tokens", len(parser.buffer) // 4)
+                print(f"  Response for '{procedure['name']}' drifted after {len(parser.lines)}/"
+                      f"{len(parser.code_lines)} lines ({str(e)}), aborted")
+                if attempt == DRIFT_RETRIES:
+                    raise
+                continue
+            self._record_usage(response, f"'{procedure['name']}'")
+            return response.data
+    
+    def _complete_streaming(self, messages: List[Dict], parser: StreamingResponseParser, temperature: float) -> Any:
+        """Stream one completion through the scheduler, feeding it to parser as it arrives.
+        
+        Returns:
+            An object with the decoded response as `data` and the usage, if the
+            provider reported it, as `usage`.
+        
+        Raises:
+            ResponseDriftError: The response drifted; the stream was closed early.
+            RetriesExhaustedError: The request kept failing with transient errors.
+        """
+        response_format = self._response_format()
+        
+        def call():
+            parser.reset()
+            stream = litellm.completion(
                 model=self.model_name,
-                messages=[{
-                    "role": "system",
-                    "content": "You are a NetLogo expert who translates NetLogo code into clear pseudocode."
-                }, {
-                    "role": "user",
-                    "content": prompt
-                }],
+                messages=messages,
                 max_tokens=4096,
-                temperature=0.0,
-                response_format=PseudocodeMapping
+                temperature=temperature,
+                response_format=response_format,
+                stream=True,
+                stream_options={"include_usage": True}
             )
-            
-            # Track and print token usage
-            if hasattr(response, 'usage') and response.usage:
-                prompt_tokens = response.usage.prompt_tokens or 0
-                completion_tokens = response.usage.completion_tokens or 0
-                total_tokens = response.usage.total_tokens or 0
-                
-                # Update the class-level counters
-                LLMPseudocodeGenerator.total_prompt_tokens += prompt_tokens
-                LLMPseudocodeGenerator.total_completion_tokens += completion_tokens
-                LLMPseudocodeGenerator.total_tokens_used += total_tokens
-                LLMPseudocodeGenerator.processed_procedures_count += 1
-                
-                print(f"  Token usage for '{procedure['name']}': {prompt_tokens} prompt + {completion_tokens} completion = {total_tokens} total")
-                print(f"  Running total tokens used: {LLMPseudocodeGenerator.total_tokens_used}")
-            
-            # Extract pseudocode, summary and variables from response
-            pseudocode_mapping = None
-            procedure_summary = ""
-            procedure_variables = []
-            
-            if hasattr(response.choices[0].message, 'parsed'):
-                # Using the parsed response directly if available
-                parsed_response = response.choices[0].message.parsed
-                # Access the root attribute if it's a PseudocodeMapping
-                if isinstance(parsed_response, PseudocodeMapping):
-                    response_data = parsed_response.root
-                    pseudocode_mapping = response_data.lines
-                    procedure_summary = response_data.summary
-                    procedure_variables = response_data.variables
-                else:
-                    # Handle other possible parsed response formats
-                    if hasattr(parsed_response, 'lines'):
-                        pseudocode_mapping = parsed_response.lines
-                        procedure_summary = getattr(parsed_response, 'summary', "")
-                        procedure_variables = getattr(parsed_response, 'variables', [])
-                    else:
-                        # Fallback if the structure is different
-                        pseudocode_mapping = parsed_response
-            else:
-                # Fallback to parsing the content manually
-                response_content = response.choices[0].message.content.strip()
+            usage = None
+            try:
+                for chunk in stream:
+                    if getattr(chunk, 'usage', None):
+                        usage = chunk.usage
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parser.feed(chunk.choices[0].delta.content)
+            finally:
+                # Stops the provider from generating the rest of an aborted response
+                self._close_stream(stream)
+            return SimpleNamespace(data=parser.finish(response_format), usage=usage)
+        
+        return self.scheduler.run(call, estimated_tokens=self._estimate_request_tokens(messages))
+    
+    @staticmethod
+    def _close_stream(stream: Any) -> None:
+        """Close a streaming response and its HTTP connection, if the stream supports it."""
+        for target in (getattr(stream, 'completion_stream', None), stream):
+            close = getattr(target, 'close', None)
+            if callable(close):
                 try:
-                    parsed_json = json.loads(response_content)
-                    if isinstance(parsed_json, dict):
-                        if 'lines' in parsed_json:
-                            pseudocode_mapping = parsed_json['lines']
-                        procedure_summary = parsed_json.get('summary', "")
-                        procedure_variables = parsed_json.get('variables', [])
-                    else:
-                        # If it's a direct array without the expected structure
-                        pseudocode_mapping = parsed_json
-                except:
-                    # If JSON parsing fails, use an empty list
-                    pseudocode_mapping = []
-            
-            # Create a mapping between code and pseudocode from the structured response
-            code_to_pseudo_map = []
-            
-            # Also keep track of the numbered pseudocode lines for the old format
-            numbered_pseudocode_lines = []
-            
-            # Get line number width for formatting
-            line_number_width = len(str(len(code_with_line_numbers)))
-            
-            # Process each line from the structured response
-            if pseudocode_mapping:
-                for line_data in pseudocode_mapping:
-                    # Extract data based on whether we have a Pydantic model or dict
-                    if isinstance(line_data, PseudocodeLine):
-                        line_num = line_data.line
-                        pseudo_text = line_data.psuedo
-                    else:
-                        # Treat as dictionary
-                        line_num = line_data["line"]
-                        pseudo_text = line_data["psuedo"]
-                    
-                    # Find the original code line
-                    original_line = ""
-                    for line in code_with_line_numbers:
-                        if line.startswith(f"{line_num:>{line_number_width}} |"):
-                            original_line = line
-                            break
-                    
-                    if original_line:
-                        # Extract original code without line number but preserving indentation
-                        orig_code_without_num = re.sub(r'^\s*\d+\s*\|\s?', '', original_line)
-                        
-                        # Format the pseudocode with the same line number format
-                        formatted_pseudo = f"{line_num:>{line_number_width}} | {pseudo_text}"
-                        numbered_pseudocode_lines.append(formatted_pseudo)
-                        
-                        # Add to the mapping
-                        code_to_pseudo_map.append({
-                            "lineNumber": line_num,
-                            "originalCode": orig_code_without_num,
-                            "pseudoCode": pseudo_text
-                        })
-            
-            # Sort mappings and pseudocode lines by line number
-            code_to_pseudo_map.sort(key=lambda x: x["lineNumber"])
-            numbered_pseudocode_lines.sort(key=lambda x: int(re.match(r'^\s*(\d+)\s*\|', x).group(1)))
-            
-            # Store the results
-            procedure["pseudoCode"] = numbered_pseudocode_lines
-            procedure["codeToPseudoCodeMap"] = code_to_pseudo_map
-            procedure["summary"] = procedure_summary
-            procedure["variables"] = procedure_variables
-            
-            print(f"  Pseudocode generated successfully for '{procedure['name']}'")
-            print(f"  Summary: {procedure_summary[:100]}..." if len(procedure_summary) > 100 else f"  Summary: {procedure_summary}")
-            
-            # Print the number of variables identified
-            var_count = len(procedure_variables)
-            if var_count > 0:
-                print(f"  Identified {var_count} important variables: {', '.join(procedure_variables[:5])}")
-                if var_count > 5:
-                    print(f"    - ... and {var_count - 5} more")
-            else:
-                print("  No custom variables identified")
-                
-            print("----------------------------------------------------------\n")
-            
-            return procedure
-        except Exception as e:
-            print(f"  Error generating pseudocode: {str(e)}")
-            procedure["pseudoCode"] = []
-            procedure["codeToPseudoCodeMap"] = []
-            procedure["summary"] = ""
-            procedure["variables"] = []
-            return procedure 
\ No newline at end of file
+                    close()
+                except Exception:
+                    pass
+    
+    def estimate_tokens(self, procedure: Dict) -> int:
+        """Estimate the prompt tokens a procedure's numbered code takes up."""
+        code = '\n'.join(self._ensure_numbered_code(procedure))
+        try:
+            return litellm.token_counter(model=self.model_name, text=code)
+        except Exception:
+            # Rough fallback of ~4 characters per token
+            return len(code) // 4 + 1
+    
+    def plan_batches(self, procedures: List[Dict], max_batch_tokens: int) -> List[List[int]]:
+        """Greedily pack procedures into batches of at most max_batch_tokens code tokens.
+        
+        Procedures keep their order. A procedure larger than the budget gets a batch
+        of its own, and names are unique within a batch since responses are keyed by name.
+        
+        Returns:
+            Lists of indices into procedures, one list per request.
+        """
+        batches = []
+        current, current_tokens, current_names = [], 0, set()
+        for i, procedure in enumerate(procedures):
+            tokens = self.estimate_tokens(procedure)
+            if current and (current_tokens + tokens > max_batch_tokens or procedure['name'] in current_names):
+                batches.append(current)
+                current, current_tokens, current_names = [], 0, set()
+            current.append(i)
+            current_tokens += tokens
+            current_names.add(procedure['name'])
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _build_batch_messages(self, procedures: List[Dict]) -> List[Dict]:
+        """Build the chat messages for a multi-procedure request."""
+        blocks = []
+        for procedure in procedures:
+            joined_code = '\n'.join(procedure["numberedOriginalCode"])
+            blocks.append(f'<netlogo-code name="{procedure["name"]}">\n{joined_code}\n</netlogo-code>')
+        return [{
+            "role": "system",
+            "content": BATCH_SYSTEM_PROMPT
+        }, {
+            "role": "user",
+            "content": '\n\n'.join(blocks)
+        }]
+    
+    @staticmethod
+    def _covers_all_lines(procedure: Dict, pseudocode_mapping: Any) -> bool:
+        """Return True if a response has a line for every non-blank line of the procedure and no others."""
+        numbered_code = procedure.get("numberedOriginalCode") or format_code_with_line_numbers(procedure["originalCode"])
+        required, allowed = pseudocode_line_numbers(index_numbered_lines(numbered_code))
+        try:
+            returned = {line_num for line_num, _ in LLMPseudocodeGenerator._iter_response_lines(pseudocode_mapping)}
+        except (KeyError, TypeError):
+            return False
+        return required <= returned <= allowed
+    
+    def generate_pseudocode_batch(self, procedures: List[Dict]) -> List[Dict]:
+        """Generate pseudocode for several procedures with a single LLM request.
+        
+        The response is keyed by procedure name and split back into each procedure
+        dict. Procedures missing from the response, or whose lines do not cover the
+        original code, fall back to individual generate_pseudocode-style calls.
+        
+        Args:
+            procedures: Procedure dicts with unique names, typically from plan_batches.
+        
+        Returns:
+            The same procedure dicts, updated in place.
+        
+        Raises:
+            PseudocodeRetryableError: Listing the procedures whose generation failed; they
+                are left unchanged and all other procedures have been processed.
+        """
+        pending = []
+        retry_later = []
+        for procedure in procedures:
+            self._ensure_numbered_code(procedure)
+            # Either prompt's response answers the procedure; the batch prompt's is cached apart
+            single_key, hit = self._check_cache(procedure, (self.prompt_version, BATCH_PROMPT_VERSION))
+            if not hit:
+                pending.append((procedure, single_key))
+        
+        batch_data = {}
+        response = None
+        applied = 0
+        if len(pending) > 1:
+            names = [procedure['name'] for procedure, _ in pending]
+            print(f"  Generating pseudocode for a batch of {len(pending)} procedures: {', '.join(names)}")
+            try:
+                response = self._complete(
+                    self._build_batch_messages([procedure for procedure, _ in pending]),
+                    BatchPseudocodeMapping
+                )
+                payload = self._response_payload(response, BatchPseudocodeMapping)
+                if isinstance(payload, BatchPseudocodeMapping):
+                    batch_data = payload.root.procedures
+                elif isinstance(payload, dict):
+                    batch_data = payload.get('procedures', {}) or {}
+            except Exception as e:
+                print(f"  Batch request failed, falling back to single requests: {str(e)}")
+        
+        for procedure, single_key in pending:
+            data = batch_data.get(procedure['name'])
+            if data is not None:
+                lines, summary, variables = self._unpack_response_data(data)
+                if self._covers_all_lines(procedure, lines):
+                    self._apply_pseudocode(procedure, lines, summary, variables)
+                    self._store_in_cache(self._cache_key(procedure, BATCH_PROMPT_VERSION), procedure)
+                    applied += 1
+                    continue
+                print(f"  Batched result for '{procedure['name']}' failed validation, retrying on its own")
+            elif len(pending) > 1:
+                print(f"  '{procedure['name']}' missing from batched response, retrying on its own")
+            try:
+                # On its own the procedure gets the single-procedure prompt, already looked up above
+                self._request_pseudocode(procedure, single_key)
+            except Exception as e:
+                print(f"  Giving up on '{procedure['name']}' for now: {str(e)}")
+                retry_later.append((procedure, e))
+        
+        # Only procedures the batched response actually answered count towards its usage
+        if response is not None:
+            self._record_usage(response, f"batch of {len(pending)}", procedure_count=applied)
+        
+        if retry_later:
+            raise PseudocodeRetryableError([procedure for procedure, _ in retry_later], retry_later[-1][1])
+        return procedures
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+import litellm
+
+from .metrics import MetricsRegistry
+
+
+def _litellm_errors(*names: str) -> tuple:
+    """Collect the LiteLLM exception classes that exist in the installed version."""
+    return tuple(getattr(litellm, name) for name in names if isinstance(getattr(litellm, name, None), type))
+
+
+# Errors worth retrying: the same request may succeed a little later
+RATE_LIMIT_ERRORS = _litellm_errors("RateLimitError")
+TRANSIENT_ERRORS = RATE_LIMIT_ERRORS + _litellm_errors(
+    "Timeout",
+    "APIConnectionError",
+    "ServiceUnavailableError",
+    "InternalServerError",
+    "BadGatewayError",
+) + (TimeoutError, ConnectionError)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Return True for 429 / rate limit errors."""
+    return isinstance(error, RATE_LIMIT_ERRORS) or getattr(error, "status_code", None) == 429
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Return True for errors that are likely to succeed on retry."""
+    if isinstance(error, TRANSIENT_ERRORS) or is_rate_limit_error(error):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and status_code >= 500
+
+
+class RetriesExhaustedError(Exception):
+    """Raised when a call still fails with a transient error after all retries."""
+
+    def __init__(self, last_error: Exception, attempts: int):
+        super().__init__(f"Gave up after {attempts} attempts: {last_error}")
+        self.last_error = last_error
+        self.attempts = attempts
+
+
+class AdaptiveScheduler:
+    """Rate-limit-aware scheduler for LLM calls.
+
+    Every call goes through run(), which:
+      - waits until the number of in-flight calls is below the current concurrency limit,
+      - waits until the call fits in the requests-per-minute and tokens-per-minute budgets,
+      - retries transient failures with jittered exponential backoff.
+
+    The concurrency limit adapts AIMD-style. It starts at initial_concurrency, grows
+    by one after a run of successful calls whose latency is below target_latency,
+    up to max_concurrency, and is halved on every rate limit error.
+
+    Retries, rate limit errors and per-attempt latencies ("llm_request") are
+    recorded in the scheduler's MetricsRegistry.
+    """
+
+    # Length of the sliding window used for the per-minute limits
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, max_concurrency: int = 1, initial_concurrency: Optional[int] = None,
+                 rpm_limit: Optional[int] = None,
+                 tpm_limit: Optional[int] = None, max_retries: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 60.0, target_latency: float = 30.0,
+                 metrics: Optional[MetricsRegistry] = None):
+        """Create a scheduler.
+
+        Args:
+            max_concurrency: Upper bound for in-flight calls.
+            initial_concurrency: Limit to start from and grow while calls are healthy
+                (default: a quarter of max_concurrency, at least 1).
+            rpm_limit: Maximum requests per minute, or None for no limit.
+            tpm_limit: Maximum tokens per minute, or None for no limit.
+            max_retries: Retries after the first attempt before giving up.
+            base_delay: Backoff delay in seconds before the first retry.
+            max_delay: Cap on a single backoff delay in seconds.
+            target_latency: Calls faster than this (seconds) count as healthy for growth.
+            metrics: Registry to record into; a new one is created if not given.
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.target_latency = target_latency
+
+        if initial_concurrency is None:
+            initial_concurrency = self.max_concurrency // 4
+        self.concurrency_limit = min(self.max_concurrency, max(1, initial_concurrency))
+        self._in_flight = 0
+        self._healthy_streak = 0
+        self._condition = threading.Condition()
+        # (timestamp, tokens) of calls admitted within the last WINDOW_SECONDS
+        self._window = deque()
+
+        self.metrics = metrics or MetricsRegistry()
+
+    def run(self, call: Callable[[], Any], estimated_tokens: int = 0) -> Any:
+        """Run call() under the concurrency and rate limits, retrying transient errors.
+
+        Args:
+            call: Zero-argument function making one LLM request.
+            estimated_tokens: Expected total tokens of the request, for the TPM budget.
+                If the result has usage.total_tokens, the real count replaces the estimate.
+
+        Returns:
+            Whatever call() returns.
+
+        Raises:
+            RetriesExhaustedError: The call kept failing with transient errors.
+            Exception: Any non-transient error from call(), unchanged.
+        """
+        attempt = 0
+        while True:
+            window_entry = self._acquire(estimated_tokens)
+            start = time.monotonic()
+            try:
+                result = call()
+            except Exception as e:
+                self.metrics.observe("llm_request", time.monotonic() - start)
+                self._release(None, rate_limited=is_rate_limit_error(e))
+                if not is_transient_error(e):
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.metrics.increment("llm_gave_up")
+                    raise RetriesExhaustedError(e, attempt) from e
+                delay = self._backoff_delay(attempt)
+                self.metrics.increment("llm_retries")
+                print(f"  Transient LLM error ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            total_tokens = getattr(getattr(result, "usage", None), "total_tokens", None)
+            if total_tokens:
+                window_entry[1] = total_tokens
+            latency = time.monotonic() - start
+            self.metrics.observe("llm_request", latency)
+            self._release(latency, rate_limited=False)
+            return result
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _acquire(self, estimated_tokens: int) -> list:
+        """Block until a call may start; returns its mutable [timestamp, tokens] window entry."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._window and now - self._window[0][0] >= self.WINDOW_SECONDS:
+                    self._window.popleft()
+
+                wait = None
+                if self._in_flight >= self.concurrency_limit:
+                    wait = None  # Woken up by _release
+                elif self.rpm_limit and len(self._window) >= self.rpm_limit:
+                    wait = self.WINDOW_SECONDS - (now - self._window[0][0])
+                elif (self.tpm_limit and self._window
+                      and sum(entry[1] for entry in self._window) + estimated_tokens > self.tpm_limit):
+                    wait = self.WINDOW_SECONDS - (now - self._window[0][0])
+                else:
+                    entry = [now, estimated_tokens]
+                    self._window.append(entry)
+                    self._in_flight += 1
+                    return entry
+
+                self._condition.wait(timeout=wait if wait is None else max(wait, 0.01))
+
+    def _release(self, latency: Optional[float], rate_limited: bool) -> None:
+        """Mark a call finished and adapt the concurrency limit."""
+        with self._condition:
+            self._in_flight -= 1
+            if rate_limited:
+                self.metrics.increment("llm_rate_limit_errors")
+                self._healthy_streak = 0
+                new_limit = max(1, self.concurrency_limit // 2)
+                if new_limit != self.concurrency_limit:
+                    print(f"  Rate limited: reducing concurrency {self.concurrency_limit} -> {new_limit}")
+                self.concurrency_limit = new_limit
+            elif latency is not None and latency <= self.target_latency:
+                self._healthy_streak += 1
+                if self._healthy_streak >= self.concurrency_limit and self.concurrency_limit < self.max_concurrency:
+                    self.concurrency_limit += 1
+                    self._healthy_streak = 0
+            elif latency is not None:
+                self._healthy_streak = 0
+            self._condition.notify_all()
+
+    def print_summary(self) -> None:
+        """Print retry and rate limit statistics."""
+        print("\n===== LLM SCHEDULER SUMMARY =====")
+        print(f"Concurrency limit: {self.concurrency_limit} (max {self.max_concurrency})")
+        print(f"Retries: {self.metrics.get('llm_retries')}, "
+              f"rate limit errors: {self.metrics.get('llm_rate_limit_errors')}, "
+              f"gave up: {self.metrics.get('llm_gave_up')}")
+        print("=================================\n")
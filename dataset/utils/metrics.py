@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+class LatencyHistogram:
+    """Latency samples of one kind of operation, with percentile queries.
+
+    Samples are kept as-is: a run makes at most tens of thousands of calls, so
+    exact percentiles are cheap enough to compute on demand.
+    """
+
+    def __init__(self):
+        self._samples: List[float] = []
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        """Return count, total, mean, p50/p95/p99 and max in seconds."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "total": sum(samples),
+            "mean": sum(samples) / len(samples),
+            "p50": self._percentile(samples, 50),
+            "p95": self._percentile(samples, 95),
+            "p99": self._percentile(samples, 99),
+            "max": samples[-1],
+        }
+
+    @staticmethod
+    def _percentile(sorted_samples: List[float], percent: float) -> float:
+        """Nearest-rank percentile of already sorted samples."""
+        rank = max(1, math.ceil(percent / 100 * len(sorted_samples)))
+        return sorted_samples[rank - 1]
+
+
+class MetricsRegistry:
+    """Thread-safe counters and latency histograms for one run.
+
+    Counters are created on first use by increment(), latencies by observe() or
+    the timer() context manager. snapshot() derives procedures and tokens per
+    second from the "procedures" and "total_tokens" counters.
+
+    With start_snapshots(), a background thread rewrites a JSON snapshot file at
+    a fixed interval so a long run can be watched while it is going.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._latencies: Dict[str, LatencyHistogram] = {}
+        self._started = time.monotonic()
+        self._snapshot_path = None
+        self._snapshot_thread = None
+        self._stop_snapshots = threading.Event()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add value to the named counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get(self, name: str) -> float:
+        """Return the current value of a counter, 0 if it was never incremented."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one latency sample for the named operation."""
+        with self._lock:
+            self._latencies.setdefault(name, LatencyHistogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the body of a with block as one sample of the named operation."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def latency(self, name: str) -> Dict[str, float]:
+        """Return the summary of one latency histogram (see LatencyHistogram.summary)."""
+        with self._lock:
+            histogram = self._latencies.get(name)
+            return histogram.summary() if histogram else {"count": 0}
+
+    def reset(self) -> None:
+        """Clear all counters and latencies and restart the run clock."""
+        with self._lock:
+            self._counters = {}
+            self._latencies = {}
+            self._started = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        """Return all metrics as a JSON-serializable dict."""
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            counters = dict(self._counters)
+            latencies = {name: histogram.summary() for name, histogram in self._latencies.items()}
+        return {
+            "timestamp": time.time(),
+            "elapsedSeconds": elapsed,
+            "counters": counters,
+            "latencies": latencies,
+            "throughput": {
+                "proceduresPerSecond": counters.get("procedures", 0) / elapsed if elapsed else 0.0,
+                "tokensPerSecond": counters.get("total_tokens", 0) / elapsed if elapsed else 0.0,
+            },
+        }
+
+    def write_snapshot(self, path: Optional[str] = None) -> None:
+        """Write a snapshot to path (default: the periodic snapshot path) atomically."""
+        path = path or self._snapshot_path
+        if not path:
+            return
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(temp_path, path)
+
+    def start_snapshots(self, path: str, interval: float = 30.0) -> None:
+        """Write a snapshot to path every interval seconds until stop_snapshots()."""
+        self._snapshot_path = path
+        self._stop_snapshots.clear()
+
+        def loop():
+            while not self._stop_snapshots.wait(interval):
+                try:
+                    self.write_snapshot()
+                except OSError as e:
+                    print(f"Warning: could not write metrics snapshot: {str(e)}")
+
+        self._snapshot_thread = threading.Thread(target=loop, name="metrics-snapshots", daemon=True)
+        self._snapshot_thread.start()
+
+    def stop_snapshots(self) -> None:
+        """Stop the periodic snapshots and write a final one."""
+        if self._snapshot_thread is None:
+            return
+        self._stop_snapshots.set()
+        self._snapshot_thread.join()
+        self._snapshot_thread = None
+        self.write_snapshot()
+
+    def print_latency_summary(self) -> None:
+        """Print throughput and the percentiles of every latency histogram."""
+        snapshot = self.snapshot()
+        throughput = snapshot["throughput"]
+        print(f"Elapsed: {snapshot['elapsedSeconds']:.1f}s, "
+              f"{throughput['proceduresPerSecond']:.2f} procedures/s, {throughput['tokensPerSecond']:.0f} tokens/s")
+        for name, summary in sorted(snapshot["latencies"].items()):
+            if summary["count"]:
+                print(f"  {name}: {summary['count']} calls, p50 {summary['p50'] * 1000:.0f}ms, "
+                      f"p95 {summary['p95'] * 1000:.0f}ms, p99 {summary['p99'] * 1000:.0f}ms, "
+                      f"max {summary['max'] * 1000:.0f}ms")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import litellm
+
+from .llm_pseudocode_generator import (
+    BatchPseudocodeMapping,
+    BatchPseudocodeResponse,
+    CompactPseudocodeMapping,
+    CompactPseudocodeResponse,
+    PseudocodeResponse,
+)
+
+# A block of numbered code in a prompt; batched requests name each block
+_CODE_BLOCK = re.compile(r'<netlogo-code(?: name="([^"]*)")?>\n(.*?)\n\s*</netlogo-code>', re.DOTALL)
+# One numbered line, as written by format_code_with_line_numbers
+_NUMBERED_LINE = re.compile(r'^\s*(\d+) \|(?: (.*))?$')
+
+
+class MockCompletion:
+    """Local stand-in for litellm.completion returning schema-valid pseudocode.
+
+    Each call reads the numbered code out of the prompt and answers with one
+    pseudocode line per non-blank code line, a summary and no variables, in the
+    schema requested by response_format (full, compact or batched), given as a
+    Pydantic class or as the json_schema dict of a batch request. Responses
+    carry usage figures of roughly 4 characters per token, so token metrics
+    behave as in a real run.
+
+    Calls sleep for latency seconds plus up to jitter seconds, and fail with a
+    litellm.RateLimitError with probability rate_limit_rate or a
+    litellm.ServiceUnavailableError with probability error_rate, which the
+    scheduler retries like real provider errors. With probability drift_rate
+    the line numbers of the second half of the response are shifted by one.
+
+    With stream=True the response comes as chunks of about chunk_chars
+    characters, with the latency spread over them; the usage is sent in a
+    final chunk without choices.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, drift_rate: float = 0.0, chunk_chars: int = 40,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.drift_rate = drift_rate
+        self.chunk_chars = max(1, chunk_chars)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def __call__(self, model: str, messages: List[Dict], response_format: Any = None, stream: bool = False,
+                 **kwargs) -> Any:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+            drift = self._random.random() < self.drift_rate
+        if not stream:
+            time.sleep(delay)
+
+        if roll < self.rate_limit_rate:
+            self._count_error()
+            raise litellm.RateLimitError("Mock rate limit", llm_provider="mock", model=model)
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._count_error()
+            raise litellm.ServiceUnavailableError("Mock service unavailable", llm_provider="mock", model=model)
+
+        prompt = '\n'.join(message["content"] for message in messages)
+        blocks = [(name, self._numbered_lines(code)) for name, code in _CODE_BLOCK.findall(prompt)]
+        format_name = self._format_name(response_format)
+        if format_name == BatchPseudocodeMapping.__name__:
+            payload = BatchPseudocodeResponse(procedures={
+                name: self._response(lines, compact=True, drift=drift) for name, lines in blocks
+            })
+        else:
+            payload = self._response(blocks[0][1] if blocks else [],
+                                     compact=format_name == CompactPseudocodeMapping.__name__, drift=drift)
+        content = payload.model_dump_json()
+
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                total_tokens=prompt_tokens + completion_tokens)
+        if stream:
+            return self._stream(content, usage, delay)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=usage,
+        )
+
+    def _stream(self, content: str, usage: Any, delay: float) -> Iterator[Any]:
+        """Yield content in chunks like a litellm stream, then the usage."""
+        pieces = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)]
+        for piece in pieces:
+            time.sleep(delay / len(pieces))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+    @staticmethod
+    def _format_name(response_format: Any) -> Optional[str]:
+        """Name of the requested schema: a Pydantic class, or a json_schema dict as in batch requests."""
+        if isinstance(response_format, dict):
+            return response_format.get("json_schema", {}).get("name")
+        return getattr(response_format, "__name__", None)
+
+    def _count_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    @staticmethod
+    def _numbered_lines(code: str) -> List[tuple]:
+        """Return (line number, code) for the non-blank numbered lines of a code block."""
+        lines = []
+        for line in code.split('\n'):
+            match = _NUMBERED_LINE.match(line)
+            if match and match.group(2) and match.group(2).strip():
+                lines.append((int(match.group(1)), match.group(2)))
+        return lines
+
+    @staticmethod
+    def _response(lines: List[tuple], compact: bool, drift: bool = False) -> Any:
+        """Build a response in the full or compact schema for the given code lines."""
+        pseudo_lines = []
+        for i, (number, code) in enumerate(lines):
+            if drift and i >= len(lines) // 2:
+                number += 1
+            indent = code[:len(code) - len(code.lstrip())]
+            pseudo = f"{indent}Perform {code.strip()}"
+            pseudo_lines.append({"line": number, "psuedo": pseudo} if compact
+                                else {"line": number, "orig": code, "psuedo": pseudo})
+        response_class = CompactPseudocodeResponse if compact else PseudocodeResponse
+        return response_class(
+            variables=[],
+            lines=pseudo_lines,
+            summary=f"Carry out the {len(lines)} steps of this procedure in order.",
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors}
+
+
+@contextmanager
+def mock_completion(mock: Optional[MockCompletion] = None, **options) -> Iterator[MockCompletion]:
+    """Replace litellm.completion with a MockCompletion for the duration of the block.
+
+    Args:
+        mock: The stand-in to install; otherwise one is built from options.
+        options: MockCompletion arguments (latency, jitter, error_rate, ...).
+
+    Yields:
+        The installed MockCompletion, whose stats() count calls and injected errors.
+    """
+    mock = mock or MockCompletion(**options)
+    original = litellm.completion
+    litellm.completion = mock
+    try:
+        yield mock
+    finally:
+        litellm.completion = original
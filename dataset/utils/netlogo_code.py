@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from .hashing import content_hash
+
+# Runs of spaces and tabs, collapsed to a single space when normalizing
+_WHITESPACE_RUN = re.compile(r'[ \t]+')
+
+
+def strip_line_comment(line: str) -> str:
+    """Remove a trailing NetLogo comment from a single line.
+
+    Semicolons inside string literals do not start a comment.
+
+    Args:
+        line: A single line of NetLogo code.
+
+    Returns:
+        The line up to (not including) the comment marker.
+    """
+    if ';' not in line:
+        return line
+    in_string = False
+    escaped = False
+    for i, char in enumerate(line):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ';':
+            return line[:i]
+    return line
+
+
+def format_code_with_line_numbers(code: str) -> List[str]:
+    """Format NetLogo code with line numbers while preserving indentation.
+
+    Args:
+        code: The NetLogo code to format.
+
+    Returns:
+        A list of formatted lines with line numbers.
+    """
+    lines = code.split('\n')
+    formatted_lines = []
+
+    # Calculate the width needed for line numbers (depends on number of lines)
+    line_number_width = len(str(len(lines)))
+
+    for i, line in enumerate(lines, 1):
+        if line.strip():  # Skip empty lines
+            # Format: {line_number} | {code with preserved indentation}
+            formatted_lines.append(f"{i:>{line_number_width}} | {line}")
+        else:
+            formatted_lines.append(f"{i:>{line_number_width}} |")
+
+    return formatted_lines
+
+
+def index_numbered_lines(numbered_code: List[str]) -> List[Optional[str]]:
+    """Index the lines of format_code_with_line_numbers output by line number.
+
+    Each line is split once, without regular expressions, so looking up the
+    original code of a line number is a list access.
+
+    Args:
+        numbered_code: Lines of the form "{number} | {code}" (or "{number} |").
+
+    Returns:
+        A list where entry n is the code of line n without its number prefix,
+        and None for numbers missing from numbered_code. Entry 0 is unused.
+    """
+    by_number = {}
+    for line in numbered_code:
+        number, separator, code = line.partition('|')
+        if separator and number.strip().isdigit():
+            # The prefix is "{number} |" plus one space when the line has code
+            by_number[int(number)] = code[1:] if code[:1].isspace() else code
+    index = [None] * (max(by_number, default=0) + 1)
+    for number, code in by_number.items():
+        index[number] = code
+    return index
+
+
+def pseudocode_line_numbers(originals: List[Optional[str]]) -> Tuple[Set[int], Set[int]]:
+    """Decide which lines of a procedure need pseudocode and which may have it.
+
+    Every check of a response or a stored result against the code (batch,
+    stream, line join and quality report) uses these rules.
+
+    Args:
+        originals: The index built by index_numbered_lines.
+
+    Returns:
+        Tuple of (required, allowed) line numbers: required are the non-blank
+        code lines, allowed are all lines of the procedure, blank ones included.
+    """
+    required = {n for n, code in enumerate(originals) if code and code.strip()}
+    allowed = {n for n, code in enumerate(originals) if n > 0 and code is not None}
+    return required, allowed
+
+
+def normalize_code_lines(code: str) -> List[str]:
+    """Normalize NetLogo code line by line for comparison.
+
+    Comments are stripped and whitespace runs are collapsed. Lines that become
+    empty are kept as empty strings so the result stays aligned 1:1 with the
+    original line numbers.
+
+    Args:
+        code: The NetLogo code to normalize.
+
+    Returns:
+        One normalized string per original line.
+    """
+    return [_WHITESPACE_RUN.sub(' ', strip_line_comment(line)).strip() for line in code.split('\n')]
+
+
+def procedure_fingerprint(code: str) -> str:
+    """Fingerprint a procedure body so that copies differing only in comments or
+    whitespace (but with the same line layout) share the same fingerprint.
+
+    Args:
+        code: The procedure's original code.
+
+    Returns:
+        A hex digest of the normalized code.
+    """
+    return content_hash('\n'.join(normalize_code_lines(code)))
+
+
+def copy_generated_fields(source: Dict, target: Dict) -> None:
+    """Fan out LLM results from one procedure to another with the same fingerprint.
+
+    Pseudocode, summary and variables are copied as-is. The code-to-pseudocode
+    mapping is rebuilt against the target's own original lines, since the two
+    bodies may differ in comments or spacing.
+
+    Args:
+        source: A procedure dict that already has pseudocode.
+        target: A procedure dict with the same fingerprint to fill in.
+    """
+    target_lines = target['originalCode'].split('\n')
+    mapping = []
+    for entry in source['codeToPseudoCodeMap']:
+        line_index = entry['lineNumber'] - 1
+        original = target_lines[line_index] if 0 <= line_index < len(target_lines) else entry['originalCode']
+        mapping.append(dict(entry, originalCode=original))
+
+    target['pseudoCode'] = list(source['pseudoCode'])
+    target['codeToPseudoCodeMap'] = mapping
+    target['summary'] = source['summary']
+    target['variables'] = list(source['variables'])
+
+
+def strip_netlogo_comments(code: str) -> str:
+    """
+    Remove comments from NetLogo code.
+    Comments start with a semicolon outside string literals (see strip_line_comment).
+    
+    Args:
+        code: Original NetLogo code with comments
+        
+    Returns:
+        Code with comments removed and lines left empty dropped
+    """
+    return '\n'.join(line for line in map(strip_line_comment, code.split('\n')) if line.strip())
+
+
+def clean_comment_text(line: str) -> str:
+    """
+    Remove comment markers from one line of generated text (summary or pseudocode).
+    
+    Args:
+        line: A single line of text
+        
+    Returns:
+        The line up to any semicolon or "Comment:" marker, or an empty string for
+        comment-only lines
+    """
+    # Skip entirely comment-only lines
+    if line.strip().startswith(";"):
+        return ""
+    
+    # Remove any comments from the middle or end of the line
+    comment_pos = line.find(';')
+    if comment_pos >= 0:
+        line = line[:comment_pos]
+    
+    # Check for "Comment:" text and remove it
+    comment_text_pos = line.lower().find('comment:')
+    if comment_text_pos >= 0:
+        line = line[:comment_text_pos]
+    return line
+
+
+def clean_summary(summary: str) -> str:
+    """
+    Clean summary text by removing any comment markers.
+    
+    Args:
+        summary: Original summary text
+        
+    Returns:
+        Cleaned summary text without comment markers
+    """
+    cleaned_lines = [clean_comment_text(line) for line in summary.split('\n')]
+    # Only include non-empty lines
+    return '\n'.join(line for line in cleaned_lines if line.strip())
+
+
+# Line number prefix of a numbered pseudocode line, e.g. " 12 | "
+_LINE_NUMBER_PREFIX = re.compile(r'^\s*\d+\s*\|\s?(.*)')
+
+
+def strip_line_numbers_and_comments_from_pseudocode(pseudocode: List[str]) -> str:
+    """
+    Remove line numbers and comments from pseudocode while preserving spacing.
+    
+    Args:
+        pseudocode: List of pseudocode lines with line numbers
+    
+    Returns:
+        Pseudocode as a string without line numbers or comments but with preserved spacing
+    """
+    processed_lines = []
+    for line in pseudocode:
+        # Skip entirely comment-only lines
+        if line.strip().startswith(";"):
+            continue
+        
+        # Match the line number pattern (digits followed by |)
+        match = _LINE_NUMBER_PREFIX.match(line)
+        if match:
+            # Extract the content after the line number, without comments
+            content = clean_comment_text(match.group(1))
+            
+            # Add the line if it's not empty after processing
+            if content.strip():
+                processed_lines.append(content)
+    
+    # Join the processed lines
+    return '\n'.join(processed_lines)
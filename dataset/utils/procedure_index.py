@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+import json
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from .hashing import content_hash
+from .netlogo_code import strip_line_comment
+
+# Kinds of terms in the inverted index
+TERM_KINDS = ("name", "variable", "primitive", "summary")
+
+# NetLogo identifiers: letters, digits and the punctuation NetLogo allows in names
+_IDENTIFIER = re.compile(r"[A-Za-z_?!<>=*/+\-.:%^][A-Za-z0-9_?!<>=*/+\-.:%^]*")
+_STRING_LITERAL = re.compile(r'"(?:[^"\\]|\\.)*"')
+_PROCEDURE_HEADER = re.compile(r'^\s*to(?:-report)?\s+\S+\s*(?:\[([^\]]*)\])?', re.IGNORECASE)
+_WORD = re.compile(r"[a-z][a-z0-9'-]*")
+
+# Keywords of the procedure syntax itself, never indexed as primitives
+_SYNTAX_KEYWORDS = {"to", "to-report", "end"}
+
+# Words too common in summaries to be useful query terms
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "each", "for", "from", "if", "in", "into", "is",
+    "it", "its", "of", "on", "or", "the", "then", "this", "to", "with",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    model_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS procedures (
+    id INTEGER PRIMARY KEY,
+    model_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    title TEXT NOT NULL,
+    source_type TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    UNIQUE (model_id, idx)
+);
+CREATE INDEX IF NOT EXISTS procedures_source_type ON procedures (source_type);
+CREATE TABLE IF NOT EXISTS terms (
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    procedure_id INTEGER NOT NULL,
+    PRIMARY KEY (kind, term, procedure_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS terms_procedure ON terms (procedure_id);
+"""
+
+
+def code_identifiers(code: str) -> List[str]:
+    """Return the lowercased identifiers used in NetLogo code, ignoring comments, strings and numbers."""
+    identifiers = []
+    for line in code.split('\n'):
+        line = _STRING_LITERAL.sub(' ', strip_line_comment(line))
+        for token in _IDENTIFIER.findall(line):
+            token = token.lower()
+            # Skip numbers such as -1.5 and bare operators glued to nothing
+            if not re.match(r'^[-+]?\.?\d', token):
+                identifiers.append(token)
+    return identifiers
+
+
+def procedure_terms(procedure: Dict, defined_procedures: Set[str]) -> Dict[str, Set[str]]:
+    """Extract the index terms of one procedure, by kind.
+
+    Primitives are approximated as the identifiers in the code that are not
+    procedures defined in the same model, parameters, or the procedure's
+    LLM-identified variables; globals and breed names not flagged as variables
+    may still show up.
+
+    Args:
+        procedure: Procedure dict from the parser output.
+        defined_procedures: Lowercased names of all procedures of the model.
+
+    Returns:
+        Dict mapping each of TERM_KINDS to a set of lowercased terms.
+    """
+    code = procedure.get('originalCode', '')
+    variables = {variable.lower() for variable in procedure.get('variables') or []}
+
+    header = _PROCEDURE_HEADER.match(code)
+    parameters = set(header.group(1).lower().split()) if header and header.group(1) else set()
+
+    excluded = defined_procedures | variables | parameters | _SYNTAX_KEYWORDS
+    primitives = {token for token in code_identifiers(code) if token not in excluded}
+
+    summary_words = {word.strip("'-") for word in _WORD.findall(procedure.get('summary', '').lower())}
+    return {
+        "name": {procedure.get('name', '').lower()},
+        "variable": variables,
+        "primitive": primitives,
+        "summary": {word for word in summary_words if len(word) > 1 and word not in _STOPWORDS},
+    }
+
+
+def model_fingerprint(model: Dict) -> str:
+    """Hash the indexed content of a model, to skip unchanged models on update."""
+    return content_hash(
+        json.dumps([model.get('title'), model.get('sourceType')]),
+        *(json.dumps([p.get('name'), p.get('originalCode'), p.get('variables'), p.get('summary')])
+          for p in model.get('procedures', [])))
+
+
+class ProcedureIndex:
+    """SQLite inverted index over the procedures of the parser output.
+
+    Procedures are indexed by name, LLM-identified variables, NetLogo
+    primitives used and summary words, and can be filtered by model and
+    source type. update() is incremental: models whose procedures did not
+    change since they were indexed are skipped, changed models are reindexed.
+    """
+
+    def __init__(self, path: str):
+        """Open (or create) the index database at path."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def update(self, models: Iterable[Dict]) -> Dict[str, int]:
+        """Index new and changed models.
+
+        Args:
+            models: Model records from the parser output.
+
+        Returns:
+            Counts of "indexed" and "unchanged" models.
+        """
+        counts = {"indexed": 0, "unchanged": 0}
+        with self._lock, self._conn:
+            for model in models:
+                fingerprint = model_fingerprint(model)
+                row = self._conn.execute("SELECT fingerprint FROM models WHERE model_id = ?",
+                                         (model['modelId'],)).fetchone()
+                if row and row[0] == fingerprint:
+                    counts["unchanged"] += 1
+                    continue
+                self._delete_model(model['modelId'])
+                self._insert_model(model, fingerprint)
+                counts["indexed"] += 1
+        return counts
+
+    def remove_models(self, model_ids: Iterable[str]) -> None:
+        """Drop models (and their procedures) from the index."""
+        with self._lock, self._conn:
+            for model_id in model_ids:
+                self._delete_model(model_id)
+
+    def sync(self, models: Iterable[Dict]) -> Dict[str, int]:
+        """Make the index match exactly the given models: update them and drop all others."""
+        current = set()
+
+        def seen(models: Iterable[Dict]) -> Iterable[Dict]:
+            for model in models:
+                current.add(model['modelId'])
+                yield model
+
+        counts = self.update(seen(models))
+        stale = [model_id for model_id in self.model_ids() if model_id not in current]
+        self.remove_models(stale)
+        counts["removed"] = len(stale)
+        return counts
+
+    def model_ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT model_id FROM models")]
+
+    def _delete_model(self, model_id: str) -> None:
+        self._conn.execute("DELETE FROM terms WHERE procedure_id IN (SELECT id FROM procedures WHERE model_id = ?)",
+                           (model_id,))
+        self._conn.execute("DELETE FROM procedures WHERE model_id = ?", (model_id,))
+        self._conn.execute("DELETE FROM models WHERE model_id = ?", (model_id,))
+
+    def _insert_model(self, model: Dict, fingerprint: str) -> None:
+        procedures = model.get('procedures', [])
+        defined = {procedure.get('name', '').lower() for procedure in procedures}
+        self._conn.execute("INSERT INTO models (model_id, fingerprint) VALUES (?, ?)", (model['modelId'], fingerprint))
+        for idx, procedure in enumerate(procedures):
+            cursor = self._conn.execute(
+                "INSERT INTO procedures (model_id, idx, name, title, source_type, summary) VALUES (?, ?, ?, ?, ?, ?)",
+                (model['modelId'], idx, procedure.get('name', ''), model.get('title', ''),
+                 model.get('sourceType', ''), procedure.get('summary', '')))
+            procedure_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO terms (kind, term, procedure_id) VALUES (?, ?, ?)",
+                [(kind, term, procedure_id)
+                 for kind, terms in procedure_terms(procedure, defined).items() for term in terms if term])
+
+    def search(self, name: Optional[str] = None, variables: Iterable[str] = (), primitives: Iterable[str] = (),
+               text: Optional[str] = None, model: Optional[str] = None, source_type: Optional[str] = None,
+               limit: Optional[int] = None) -> List[Dict]:
+        """Find procedures matching all the given criteria.
+
+        Args:
+            name: Procedure name, case-insensitive; a trailing * matches a prefix.
+            variables: Variables the procedure must use (all of them).
+            primitives: Primitives the procedure must use (all of them).
+            text: Words that must all appear in the summary.
+            model: modelId, or a substring of it.
+            source_type: Exact source type, e.g. "Models Library".
+            limit: Maximum number of results.
+
+        Returns:
+            Dicts with modelId, index, name, title, sourceType and summary, ordered
+            by modelId and procedure index.
+        """
+        clauses = []
+        params = []
+
+        def require_term(kind: str, term: str, prefix: bool = False) -> None:
+            if prefix:
+                clauses.append("p.id IN (SELECT procedure_id FROM terms WHERE kind = ? AND term >= ? AND term < ?)")
+                params.extend([kind, term, term + '\uffff'])
+            else:
+                clauses.append("p.id IN (SELECT procedure_id FROM terms WHERE kind = ? AND term = ?)")
+                params.extend([kind, term])
+
+        if name:
+            name = name.lower()
+            if name.endswith('*'):
+                require_term("name", name[:-1], prefix=True)
+            else:
+                require_term("name", name)
+        for variable in variables:
+            require_term("variable", variable.lower())
+        for primitive in primitives:
+            require_term("primitive", primitive.lower())
+        if text:
+            for word in _WORD.findall(text.lower()):
+                word = word.strip("'-")
+                if len(word) > 1 and word not in _STOPWORDS:
+                    require_term("summary", word)
+        if model:
+            clauses.append("p.model_id LIKE ?")
+            params.append(f"%{model}%")
+        if source_type:
+            clauses.append("p.source_type = ?")
+            params.append(source_type)
+
+        query = "SELECT p.model_id, p.idx, p.name, p.title, p.source_type, p.summary FROM procedures p"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY p.model_id, p.idx"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"modelId": model_id, "index": idx, "name": proc_name, "title": title, "sourceType": source,
+             "summary": summary}
+            for model_id, idx, proc_name, title, source, summary in rows
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of indexed models, procedures and distinct terms per kind."""
+        with self._lock:
+            stats = {
+                "models": self._conn.execute("SELECT COUNT(*) FROM models").fetchone()[0],
+                "procedures": self._conn.execute("SELECT COUNT(*) FROM procedures").fetchone()[0],
+            }
+            for kind, count in self._conn.execute(
+                    "SELECT kind, COUNT(DISTINCT term) FROM terms GROUP BY kind"):
+                stats[f"{kind}Terms"] = count
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
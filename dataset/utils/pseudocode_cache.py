@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .hashing import content_hash
+
+
+class PseudocodeCache:
+    """Persistent, content-addressed cache of LLM pseudocode responses.
+
+    Entries are keyed by a hash of the LLM model name, the prompt template version
+    and the numbered procedure code, so identical procedures (across models and
+    across rebuilds) only ever hit the network once. Entries live in a local SQLite
+    file; when the stored size exceeds max_bytes the least recently used entries
+    are evicted.
+    """
+
+    # Fields of a procedure dict that are produced by the LLM and get cached
+    CACHED_FIELDS = ("pseudoCode", "codeToPseudoCodeMap", "summary", "variables")
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        """Open (or create) the cache database.
+
+        Args:
+            path: Path to the SQLite cache file.
+            max_bytes: Maximum total size of cached responses before eviction.
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, prompt_version: str, numbered_code: List[str]) -> str:
+        """Build the cache key for a procedure.
+
+        Args:
+            model_name: The LLM model the response was generated with.
+            prompt_version: Version of the prompt template used.
+            numbered_code: The procedure's numberedOriginalCode lines.
+
+        Returns:
+            A hex digest identifying the request.
+        """
+        return content_hash(model_name, prompt_version, '\n'.join(numbered_code))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached fields for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, procedure: Dict) -> None:
+        """Store the LLM-generated fields of a procedure under key."""
+        value = json.dumps({field: procedure[field] for field in self.CACHED_FIELDS})
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str) -> bool:
+        """Drop the entry for key, e.g. a response found to be defective. Returns True if it existed."""
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old is None:
+                return False
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= old[0]
+            self._conn.commit()
+        return True
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is back under 90% of max_bytes.
+
+        Must be called with the lock held.
+        """
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                if self._total_bytes <= target:
+                    break
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
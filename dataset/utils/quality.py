@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from .netlogo_code import (format_code_with_line_numbers, index_numbered_lines, normalize_code_lines,
+                           pseudocode_line_numbers)
+
+# Separators between NetLogo identifiers; anything else (including - ? ! .) can be part of a name
+_TOKEN_SEPARATORS = re.compile(r'[\s\[\]\(\)\{\}"]+')
+
+# Weights of the checks in a procedure's score
+COVERAGE_WEIGHT = 0.6
+SUMMARY_WEIGHT = 0.2
+VARIABLES_WEIGHT = 0.2
+
+
+def check_procedure(procedure: Dict) -> Dict:
+    """Score the generated fields of one procedure against its code, without an LLM.
+
+    Checks:
+      - every non-blank line of numberedOriginalCode has pseudocode, and no
+        pseudocode refers to a line the procedure does not have (blank lines
+        may have pseudocode, as the generator accepts),
+      - the summary is not empty,
+      - every entry of variables appears in originalCode (comments excluded).
+
+    Returns:
+        {"score": float in [0, 1], "issues": [...]}. Issues are short strings such
+        as "missing-lines:3,7", "empty-summary" or "unknown-variables:foo"; an
+        empty list means the procedure passes.
+    """
+    issues = []
+    numbered_code = procedure.get("numberedOriginalCode") or format_code_with_line_numbers(procedure["originalCode"])
+    expected, allowed = pseudocode_line_numbers(index_numbered_lines(numbered_code))
+    mapped = {entry.get("lineNumber") for entry in procedure.get("codeToPseudoCodeMap") or []}
+
+    if not procedure.get("pseudoCode"):
+        issues.append("missing-pseudocode")
+    missing = sorted(expected - mapped)
+    if missing:
+        issues.append("missing-lines:" + ",".join(map(str, missing)))
+    unknown_lines = sorted((n for n in mapped if not isinstance(n, int) or n not in allowed),
+                           key=lambda n: (0, n, "") if isinstance(n, int) else (1, 0, str(n)))
+    if unknown_lines:
+        issues.append("unknown-lines:" + ",".join(map(str, unknown_lines)))
+
+    summary_ok = bool((procedure.get("summary") or "").strip())
+    if not summary_ok:
+        issues.append("empty-summary")
+
+    variables = procedure.get("variables") or []
+    tokens = set(_TOKEN_SEPARATORS.split(' '.join(normalize_code_lines(procedure["originalCode"])).lower()))
+    unknown_variables = [name for name in variables if str(name).strip().lower() not in tokens]
+    if unknown_variables:
+        issues.append("unknown-variables:" + ",".join(map(str, unknown_variables)))
+
+    coverage = (len(expected & mapped) / len(expected)) if expected else 1.0
+    if unknown_lines:
+        coverage *= len(expected & mapped) / (len(expected & mapped) + len(unknown_lines))
+    variable_precision = 1.0 - len(unknown_variables) / len(variables) if variables else 1.0
+    score = COVERAGE_WEIGHT * coverage + SUMMARY_WEIGHT * summary_ok + VARIABLES_WEIGHT * variable_precision
+    return {"score": round(score, 4), "issues": issues}
+
+
+def quality_work_list(models: List[Dict]) -> List[Dict]:
+    """Check every procedure of the models and list the ones that fail.
+
+    Returns:
+        One entry per flagged procedure: {"modelId", "index", "name", "score", "issues"},
+        in dataset order.
+    """
+    work_list = []
+    for model in models:
+        for index, procedure in enumerate(model.get("procedures", [])):
+            result = check_procedure(procedure)
+            if result["issues"]:
+                work_list.append({
+                    "modelId": model["modelId"],
+                    "index": index,
+                    "name": procedure["name"],
+                    **result
+                })
+    return work_list
+
+
+def summarize_work_list(work_list: List[Dict], total_procedures: int) -> str:
+    """Describe a work list in one line: flagged count and how often each issue occurs."""
+    counts = Counter(issue.split(':', 1)[0] for entry in work_list for issue in entry["issues"])
+    details = ", ".join(f"{count} {issue}" for issue, count in counts.most_common())
+    return f"{len(work_list)} of {total_procedures} procedures flagged" + (f" ({details})" if details else "")
+
+
+def save_work_list(path: str, work_list: List[Dict]) -> None:
+    """Write a work list as JSONL, one flagged procedure per line."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in work_list:
+            f.write(json.dumps(entry) + '\n')
+
+
+def load_work_list(path: str) -> List[Dict]:
+    """Read a work list written by save_work_list."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .netlogo_code import format_code_with_line_numbers
+
+# File extensions that select the SQLite model store instead of JSON
+STORE_EXTENSIONS = ('.sqlite', '.db')
+
+# Procedure fields with their own columns; anything else goes to the extra column
+_PROCEDURE_FIELDS = ('name', 'documentation', 'originalCode', 'numberedOriginalCode', 'pseudoCode',
+                     'codeToPseudoCodeMap', 'summary', 'variables')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS models (
+    model_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS procedures (
+    model_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    documentation TEXT NOT NULL,
+    original_code TEXT NOT NULL,
+    line_map TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    variables TEXT NOT NULL,
+    numbered_code TEXT,
+    pseudo_code TEXT,
+    extra TEXT,
+    PRIMARY KEY (model_id, idx)
+) WITHOUT ROWID;
+"""
+
+
+def is_store_path(path: str) -> bool:
+    """Return True if path names a SQLite model store rather than a JSON file."""
+    return str(path).endswith(STORE_EXTENSIONS)
+
+
+def numbered_pseudocode(line_count: int, line_map: List[Dict]) -> List[str]:
+    """Rebuild the numbered pseudoCode list from codeToPseudoCodeMap entries.
+
+    Args:
+        line_count: Number of lines of the procedure's original code.
+        line_map: The procedure's codeToPseudoCodeMap, sorted by line number.
+
+    Returns:
+        Lines formatted like numberedOriginalCode, e.g. " 3 | pseudocode".
+    """
+    width = len(str(line_count))
+    return [f"{entry['lineNumber']:>{width}} | {entry['pseudoCode']}" for entry in line_map]
+
+
+def _encode_procedure(procedure: Dict) -> Tuple:
+    """Split a procedure into column values, storing its code only once.
+
+    The numbered code, numbered pseudocode and the originalCode of each map entry
+    are left out when they can be derived from the code on read; older records
+    whose copies differ are stored as-is so loading stays lossless.
+    """
+    code = procedure.get('originalCode', '')
+    lines = code.split('\n')
+
+    line_map = []
+    for entry in procedure.get('codeToPseudoCodeMap') or []:
+        line_index = entry['lineNumber'] - 1
+        derived = lines[line_index] if 0 <= line_index < len(lines) else None
+        if entry.get('originalCode') == derived and set(entry) == {'lineNumber', 'originalCode', 'pseudoCode'}:
+            line_map.append([entry['lineNumber'], entry['pseudoCode']])
+        else:
+            line_map.append(entry)
+
+    numbered_code = procedure.get('numberedOriginalCode')
+    if numbered_code == format_code_with_line_numbers(code):
+        numbered_code = None
+
+    pseudo_code = procedure.get('pseudoCode') or []
+    if pseudo_code == numbered_pseudocode(len(lines), procedure.get('codeToPseudoCodeMap') or []):
+        pseudo_code = None
+
+    extra = {key: value for key, value in procedure.items() if key not in _PROCEDURE_FIELDS}
+    return (
+        procedure.get('name', ''),
+        procedure.get('documentation', ''),
+        code,
+        json.dumps(line_map),
+        procedure.get('summary', ''),
+        json.dumps(procedure.get('variables') or []),
+        None if numbered_code is None else json.dumps(numbered_code),
+        None if pseudo_code is None else json.dumps(pseudo_code),
+        json.dumps(extra) if extra else None,
+    )
+
+
+def _decode_procedure(name: str, documentation: str, code: str, line_map_json: str, summary: str,
+                      variables_json: str, numbered_code_json: Optional[str], pseudo_code_json: Optional[str],
+                      extra_json: Optional[str]) -> Dict:
+    """Rebuild a procedure dict from its columns, deriving the numbered views."""
+    lines = code.split('\n')
+    line_map = []
+    for entry in json.loads(line_map_json):
+        if isinstance(entry, list):
+            line_number, pseudo_text = entry
+            entry = {"lineNumber": line_number, "originalCode": lines[line_number - 1], "pseudoCode": pseudo_text}
+        line_map.append(entry)
+
+    procedure = {
+        "name": name,
+        "documentation": documentation,
+        "originalCode": code,
+        "numberedOriginalCode": (json.loads(numbered_code_json) if numbered_code_json is not None
+                                 else format_code_with_line_numbers(code)),
+        "pseudoCode": (json.loads(pseudo_code_json) if pseudo_code_json is not None
+                       else numbered_pseudocode(len(lines), line_map)),
+        "codeToPseudoCodeMap": line_map,
+        "summary": summary,
+        "variables": json.loads(variables_json),
+    }
+    if extra_json:
+        procedure.update(json.loads(extra_json))
+    return procedure
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def save_models(path: str, models: List[Dict], metadata: Optional[Dict] = None) -> None:
+    """Write models to a SQLite model store, replacing its previous contents.
+
+    The store is written to a temporary file and moved into place, so readers
+    never see a half-written store.
+
+    Args:
+        path: Path of the store (.sqlite or .db).
+        models: Model records as produced by the parsers.
+        metadata: Extra top-level fields to keep, e.g. generatedAt.
+    """
+    temp_path = f"{path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = _connect(temp_path)
+    try:
+        with conn:
+            conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                             [(key, json.dumps(value)) for key, value in (metadata or {}).items()])
+            conn.executemany(
+                "INSERT INTO models (model_id, position, data) VALUES (?, ?, ?)",
+                ((model['modelId'], position, json.dumps({k: v for k, v in model.items() if k != 'procedures'}))
+                 for position, model in enumerate(models)))
+            conn.executemany(
+                "INSERT INTO procedures (model_id, idx, name, documentation, original_code, line_map, summary, "
+                "variables, numbered_code, pseudo_code, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((model['modelId'], idx) + _encode_procedure(procedure)
+                 for model in models for idx, procedure in enumerate(model.get('procedures', []))))
+    finally:
+        conn.close()
+    os.replace(temp_path, path)
+
+
+def iter_models(path: str) -> Iterator[Dict]:
+    """Yield the models of a SQLite model store in their saved order, one at a time."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        model_rows = conn.execute("SELECT model_id, data FROM models ORDER BY position")
+        procedure_rows = conn.cursor().execute(
+            "SELECT p.model_id, p.name, p.documentation, p.original_code, p.line_map, p.summary, p.variables, "
+            "p.numbered_code, p.pseudo_code, p.extra FROM procedures p JOIN models m USING (model_id) "
+            "ORDER BY m.position, p.idx")
+        pending = procedure_rows.fetchone()
+        for model_id, data in model_rows:
+            procedures = []
+            while pending is not None and pending[0] == model_id:
+                procedures.append(_decode_procedure(*pending[1:]))
+                pending = procedure_rows.fetchone()
+            model = json.loads(data)
+            model['procedures'] = procedures
+            yield model
+    finally:
+        conn.close()
+
+
+def load_model(path: str, model_id: str) -> Optional[Dict]:
+    """Load a single model by modelId without reading the rest of the store.
+
+    Returns:
+        The model dict, or None if the store has no such model.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT data FROM models WHERE model_id = ?", (model_id,)).fetchone()
+        if row is None:
+            return None
+        model = json.loads(row[0])
+        model['procedures'] = [
+            _decode_procedure(*columns) for columns in conn.execute(
+                "SELECT name, documentation, original_code, line_map, summary, variables, numbered_code, "
+                "pseudo_code, extra FROM procedures WHERE model_id = ? ORDER BY idx", (model_id,))
+        ]
+        return model
+    finally:
+        conn.close()
+
+
+def load_models(path: str) -> Tuple[List[Dict], Dict]:
+    """Load all models and the top-level metadata from a SQLite model store."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        metadata = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+    finally:
+        conn.close()
+    return list(iter_models(path)), metadata
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import json
+import re
+from typing import Dict, List, Optional
+
+from pydantic import ValidationError
+
+from .netlogo_code import index_numbered_lines, pseudocode_line_numbers
+
+# Start of the "lines" array in a pseudocode response
+_LINES_KEY = re.compile(r'"lines"\s*:\s*\[')
+# Longest unfinished "lines" entry tolerated before the response counts as broken
+MAX_ENTRY_CHARS = 4000
+# Longest text tolerated before the "lines" array starts
+MAX_PREAMBLE_CHARS = 8000
+
+
+class ResponseDriftError(Exception):
+    """Raised when a streamed response stops matching the procedure or the schema."""
+
+
+class StreamingResponseParser:
+    """Incremental parser for a streamed pseudocode response.
+
+    Text is fed in as it arrives. Entries of the "lines" array are decoded as
+    soon as each one is complete and checked against the procedure's numbered
+    code: line numbers must exist and increase, no non-blank code line may be
+    skipped, and in echo mode "orig" must repeat the code line. The first
+    mismatch raises ResponseDriftError, so the caller can abort the request
+    instead of paying for the rest of it.
+
+    Attributes:
+        lines: Validated line entries received so far, in order.
+    """
+
+    def __init__(self, numbered_code: List[str], echo: bool):
+        """Create a parser for one procedure.
+
+        Args:
+            numbered_code: The procedure's numberedOriginalCode.
+            echo: Whether entries carry an "orig" echo of the code line (full prompt mode).
+        """
+        self.code_lines = index_numbered_lines(numbered_code)
+        self.required_lines, self.allowed_lines = pseudocode_line_numbers(self.code_lines)
+        self.echo = echo
+        self._decoder = json.JSONDecoder()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything received, for a new attempt."""
+        self.buffer = ""
+        self.lines: List[Dict] = []
+        self._pos: Optional[int] = None
+        self._expect_entry = True
+        self._lines_done = False
+
+    def feed(self, text: str) -> List[Dict]:
+        """Add streamed text and return the line entries it completed.
+
+        Raises:
+            ResponseDriftError: The response broke the schema or drifted from the code.
+        """
+        self.buffer += text
+        if self._pos is None:
+            if self.buffer.lstrip()[:1] not in ('', '{'):
+                raise ResponseDriftError("response is not a JSON object")
+            match = _LINES_KEY.search(self.buffer)
+            if not match:
+                if len(self.buffer) > MAX_PREAMBLE_CHARS:
+                    raise ResponseDriftError("no lines array in the response")
+                return []
+            self._pos = match.end()
+
+        completed = []
+        while not self._lines_done:
+            pos = self._skip_whitespace(self._pos)
+            if pos >= len(self.buffer):
+                break
+            char = self.buffer[pos]
+            if char == ']':
+                self._lines_done = True
+                self._pos = pos + 1
+                break
+            if not self._expect_entry:
+                if char != ',':
+                    raise ResponseDriftError(f"unexpected {char!r} between line entries")
+                self._pos = pos + 1
+                self._expect_entry = True
+                continue
+            if char != '{':
+                raise ResponseDriftError(f"unexpected {char!r} instead of a line entry")
+            try:
+                entry, end = self._decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError:
+                # Most likely incomplete; wait for more text unless it is already too long
+                if len(self.buffer) - pos > MAX_ENTRY_CHARS:
+                    raise ResponseDriftError("line entry does not parse")
+                break
+            self._check_entry(entry)
+            self.lines.append(entry)
+            completed.append(entry)
+            self._pos = end
+            self._expect_entry = False
+        return completed
+
+    def _skip_whitespace(self, pos: int) -> int:
+        while pos < len(self.buffer) and self.buffer[pos].isspace():
+            pos += 1
+        return pos
+
+    def _check_entry(self, entry: Dict) -> None:
+        """Check one decoded line entry against the schema and the procedure's code."""
+        if not isinstance(entry, dict) or not isinstance(entry.get("line"), int) \
+                or not isinstance(entry.get("psuedo"), str):
+            raise ResponseDriftError(f"malformed line entry {str(entry)[:80]}")
+        line_num = entry["line"]
+        if line_num not in self.allowed_lines:
+            raise ResponseDriftError(f"line {line_num} is not in the procedure")
+        previous = self.lines[-1]["line"] if self.lines else 0
+        if line_num <= previous:
+            raise ResponseDriftError(f"line {line_num} after line {previous}")
+        skipped = [n for n in range(previous + 1, line_num) if n in self.required_lines]
+        if skipped:
+            raise ResponseDriftError(f"line {skipped[0]} skipped")
+        if self.echo and "".join(str(entry.get("orig", "")).split()) != "".join(self.code_lines[line_num].split()):
+            raise ResponseDriftError(f"line {line_num} does not echo the original code")
+
+    def finish(self, response_model: type) -> Dict:
+        """Validate the complete response once the stream has ended.
+
+        Args:
+            response_model: Pydantic model of the expected response, e.g. PseudocodeMapping.
+
+        Returns:
+            The decoded response.
+
+        Raises:
+            ResponseDriftError: The response is incomplete or does not match the schema.
+        """
+        self.feed("")
+        if not self._lines_done:
+            raise ResponseDriftError("response ended before the lines array was complete")
+        last = self.lines[-1]["line"] if self.lines else 0
+        missing = sorted(n for n in self.required_lines if n > last)
+        if missing:
+            raise ResponseDriftError(f"response ended before line {missing[0]}")
+        try:
+            data = json.loads(self.buffer)
+            response_model.model_validate(data)
+        except (json.JSONDecodeError, ValidationError) as e:
+            raise ResponseDriftError(f"response does not match the schema: {str(e)[:200]}") from e
+        return data